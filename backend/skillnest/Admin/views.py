@@ -15,6 +15,9 @@ from .models import ContactUs
 from rest_framework import generics
 from creator.models import Community,ReportPost,Post
 from creator.serializers import CommunitySerializer ,ReportPostSerializer,PostSerializer
+from creator.serializers import CommunityListSerializer, listing_options
+from django.db.models import Prefetch
+from rest_framework.pagination import LimitOffsetPagination
 from django.shortcuts import get_object_or_404
 from .serializers import DashboardStatsSerializer
 from django.utils import timezone
@@ -119,7 +122,13 @@ class CommunityListView(generics.ListAPIView):
     permission_classes = [IsAuthenticated, IsAdminUser]
 
     def get(self, request):
-        communities = Community.objects.all().prefetch_related('members', 'creator')
+        lean, members_limit = listing_options(request)
+        if lean:
+            communities = Community.objects.order_by('-created_at').for_listing(request.user, members_limit)
+            return Response(CommunityListSerializer(communities, many=True).data)
+        communities = Community.objects.select_related('creator', 'chat_room').prefetch_related(
+            Prefetch('members', queryset=User.objects.only('id'))
+        )
         serializer = CommunitySerializer(communities, many=True)
         return Response(serializer.data)
 
@@ -136,7 +145,11 @@ class CommunityMembersView(APIView):
     permission_classes = [IsAuthenticated, IsAdminUser]
     def get(self, request, pk):
         community = get_object_or_404(Community, pk=pk)
-        members = community.members.all().values("id", "username", "email")
+        members = community.members.order_by("id").values("id", "username", "email")
+        if "limit" in request.query_params:
+            # Paged: {"count", "next", "previous", "results"}
+            paginator = LimitOffsetPagination()
+            return paginator.get_paginated_response(paginator.paginate_queryset(members, request, view=self))
         return Response(list(members))
 
 class ReportPostView(APIView):
@@ -213,10 +226,10 @@ class LatestPostsView(APIView):
     def get(self, request):
         posts = (
             Post.objects
-            .select_related('user')  
+            .for_feed(request.user)
             .order_by('-created_at')[:9]
         )
-        serializer = PostSerializer(posts, many=True)
+        serializer = PostSerializer(posts, many=True, context={'request': request})
         return Response(serializer.data)
 
 class ContactReplyView(APIView):
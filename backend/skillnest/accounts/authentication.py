@@ -1,7 +1,9 @@
+from rest_framework.exceptions import AuthenticationFailed
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from django.contrib.auth.backends import ModelBackend
 from django.contrib.auth import get_user_model
 from django.conf import settings 
+from .user_cache import get_user_snapshot
 import logging
 logger = logging.getLogger(__name__)
 
@@ -17,12 +19,27 @@ class JWTCookieAuthentication(JWTAuthentication):
         validated_token = self.get_validated_token(raw_token)
         return self.get_user(validated_token), validated_token
 
+    def get_user(self, validated_token):
+        """
+        Resolve the user from the per-token snapshot cache instead of
+        querying the users table on every request.
+        """
+        user = get_user_snapshot(validated_token)
+        if user is None:
+            raise AuthenticationFailed("User not found", code="user_not_found")
+        if not user.is_active:
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+        if user.is_block:
+            raise AuthenticationFailed("You are blocked-contact admin", code="user_blocked")
+        return user
+
 
 class EmailBackend(ModelBackend):
     def authenticate(self, request, username=None, password=None, **kwargs):
         email = kwargs.get('email', username)  # support both
         try:
-            user = User.objects.get(email=email)
+            # Login checks creator approval; load the profile in the same query.
+            user = User.objects.select_related('creator_profile').get(email=email)
             if user.check_password(password):
                 return user
         except User.DoesNotExist:
@@ -0,0 +1,182 @@
+# accounts/directory.py
+"""
+Finding users by username or email: prefix typeahead and bulk resolution.
+
+The typeahead index is one Redis sorted set, ``typeahead:users``, with
+every member at score 0 so ZRANGEBYLEX walks it in lexical order. Each
+active user has a member per lowercased username and email,
+``<term>\\0<id>\\0<username>\\0<email>``, so a completion is a single
+range read with nothing left to load. ``typeahead:entries`` remembers the
+members of each user so ``index_user`` can replace them, in one Lua
+script, once a save that touches them commits (see ``accounts.signals``).
+Until ``rebuild_index`` has run (``typeahead:ready``), lookups are
+answered from the database and a rebuild is queued.
+
+A rebuild fills scratch keys and swaps them in. While it runs
+(``typeahead:rebuilding``) ``index_user`` writes to the scratch keys as
+well, and the rebuild leaves alone any user written there, so changes
+made during a rebuild survive the swap.
+"""
+import json
+
+from django.contrib.auth import get_user_model
+from django.db.models import Q
+from django_redis import get_redis_connection
+
+User = get_user_model()
+
+INDEX_KEY = "typeahead:users"
+ENTRIES_KEY = "typeahead:entries"
+INDEX_TMP_KEY = f"{INDEX_KEY}:tmp"
+ENTRIES_TMP_KEY = f"{ENTRIES_KEY}:tmp"
+READY_KEY = "typeahead:ready"
+REBUILD_LOCK_KEY = "typeahead:rebuilding"
+REBUILD_LOCK_TTL = 10 * 60
+REBUILD_CHUNK_SIZE = 2000
+
+# Fields whose change can alter a user's typeahead entries.
+INDEXED_FIELDS = frozenset({"username", "email", "is_active", "is_block", "is_delete"})
+
+SEP = "\0"
+
+# KEYS: index, entries, scratch index, scratch entries, rebuild flag.
+# ARGV: user id, the user's members as a JSON list.
+# During a rebuild the scratch entry is kept even when empty, so the
+# rebuild knows not to write the user back from an older read.
+_REPLACE = """
+local function replace(index, entries, keep_empty)
+    local old = redis.call('hget', entries, ARGV[1])
+    local new = cjson.decode(ARGV[2])
+    local wanted = {}
+    for _, member in ipairs(new) do wanted[member] = true end
+    if old then
+        for _, member in ipairs(cjson.decode(old)) do
+            if not wanted[member] then redis.call('zrem', index, member) end
+        end
+    end
+    for _, member in ipairs(new) do redis.call('zadd', index, 0, member) end
+    if #new > 0 or keep_empty then
+        redis.call('hset', entries, ARGV[1], ARGV[2])
+    else
+        redis.call('hdel', entries, ARGV[1])
+    end
+end
+replace(KEYS[1], KEYS[2], false)
+if redis.call('exists', KEYS[5]) == 1 then
+    replace(KEYS[3], KEYS[4], true)
+end
+"""
+
+# KEYS: scratch index, scratch entries. ARGV: user id, members as JSON, members...
+_FILL = """
+if redis.call('hexists', KEYS[2], ARGV[1]) == 1 then return 0 end
+for i = 3, #ARGV do redis.call('zadd', KEYS[1], 0, ARGV[i]) end
+redis.call('hset', KEYS[2], ARGV[1], ARGV[2])
+return 1
+"""
+
+# KEYS: index, entries, scratch index, scratch entries, ready, rebuild flag.
+_SWAP = """
+redis.call('del', KEYS[1], KEYS[2])
+if redis.call('exists', KEYS[3]) == 1 then redis.call('rename', KEYS[3], KEYS[1]) end
+if redis.call('exists', KEYS[4]) == 1 then redis.call('rename', KEYS[4], KEYS[2]) end
+redis.call('set', KEYS[5], 1)
+redis.call('del', KEYS[6])
+"""
+
+
+def _is_listed(user):
+    return user.is_active and not user.is_block and not user.is_delete
+
+
+def _members(user):
+    if not _is_listed(user):
+        return []
+    terms = {user.username.lower(), user.email.lower()} - {""}
+    return [SEP.join((term, str(user.id), user.username, user.email)) for term in sorted(terms)]
+
+
+def _replace(user_id, members, redis):
+    redis.register_script(_REPLACE)(
+        keys=[INDEX_KEY, ENTRIES_KEY, INDEX_TMP_KEY, ENTRIES_TMP_KEY, REBUILD_LOCK_KEY],
+        args=[user_id, json.dumps(members)],
+    )
+
+
+def index_user(user, redis=None):
+    """Add, refresh or (for blocked/deleted/inactive users) drop the user's entries."""
+    _replace(user.id, _members(user), redis or get_redis_connection("default"))
+
+
+def unindex_user(user_id, redis=None):
+    _replace(user_id, [], redis or get_redis_connection("default"))
+
+
+def rebuild_index(redis=None):
+    """Build the whole index into scratch keys and swap it in."""
+    redis = redis or get_redis_connection("default")
+    redis.delete(INDEX_TMP_KEY, ENTRIES_TMP_KEY)
+    # From here on index_user writes to the scratch keys too.
+    redis.set(REBUILD_LOCK_KEY, 1, ex=REBUILD_LOCK_TTL)
+    fill = redis.register_script(_FILL)
+    users = User.objects.only("id", "username", "email", "is_active", "is_block", "is_delete")
+    pipe = redis.pipeline(transaction=False)
+    for count, user in enumerate(users.iterator(chunk_size=REBUILD_CHUNK_SIZE), 1):
+        members = _members(user)
+        if members:
+            fill(keys=[INDEX_TMP_KEY, ENTRIES_TMP_KEY], args=[user.id, json.dumps(members), *members], client=pipe)
+        if count % REBUILD_CHUNK_SIZE == 0:
+            pipe.expire(REBUILD_LOCK_KEY, REBUILD_LOCK_TTL)
+            pipe.execute()
+    pipe.execute()
+
+    redis.register_script(_SWAP)(
+        keys=[INDEX_KEY, ENTRIES_KEY, INDEX_TMP_KEY, ENTRIES_TMP_KEY, READY_KEY, REBUILD_LOCK_KEY],
+    )
+
+
+def complete(prefix, limit=10):
+    """Users whose username or email starts with ``prefix``, as ``[{"id", "username", "email"}]``."""
+    prefix = prefix.strip().lower()
+    if not prefix:
+        return []
+    redis = get_redis_connection("default")
+    if not redis.exists(READY_KEY):
+        if redis.set(REBUILD_LOCK_KEY, 1, nx=True, ex=REBUILD_LOCK_TTL):
+            from .tasks import rebuild_typeahead_index
+            rebuild_typeahead_index.delay()
+        return _complete_from_db(prefix, limit)
+
+    start = b"[" + prefix.encode()
+    # A user matching on both username and email shows up twice; read extra.
+    members = redis.zrangebylex(INDEX_KEY, start, start + b"\xff", start=0, num=limit * 2)
+    results = {}
+    for member in members:
+        _, user_id, username, email = member.decode().split(SEP)
+        results.setdefault(int(user_id), {"id": int(user_id), "username": username, "email": email})
+    return list(results.values())[:limit]
+
+
+def _complete_from_db(prefix, limit):
+    users = User.objects.filter(
+        Q(username__istartswith=prefix) | Q(email__istartswith=prefix),
+        is_active=True, is_block=False, is_delete=False,
+    ).order_by("username").values("id", "username", "email")
+    return list(users[:limit])
+
+
+def resolve_identifiers(identifiers):
+    """
+    Map each identifier (a username, or an email if it contains "@") to its
+    user with one query. Unknown identifiers are left out.
+    """
+    usernames = {i for i in identifiers if "@" not in i}
+    emails = {i for i in identifiers if "@" in i}
+    users = User.objects.filter(Q(username__in=usernames) | Q(email__in=emails))
+    found = {}
+    for user in users:
+        if user.username in usernames:
+            found[user.username] = user
+        if user.email in emails:
+            found[user.email] = user
+    return found
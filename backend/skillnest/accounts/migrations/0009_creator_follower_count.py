@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-18 13:12
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_follower_count(apps, schema_editor):
+    Creator = apps.get_model('accounts', 'Creator')
+    through = Creator.followers.through
+    Creator.objects.update(follower_count=Coalesce(
+        Subquery(
+            through.objects.filter(creator_id=OuterRef('pk')).order_by()
+            .values('creator_id').annotate(total=Count('*')).values('total')
+        ),
+        0,
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0008_payment'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='creator',
+            name='follower_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_follower_count, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,8 @@
 from django.utils import timezone
 from django.contrib.auth.models import AbstractUser
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.db import models
+from django.db.models.functions import Upper
 
 class User(AbstractUser):
     email = models.EmailField(unique=True)
@@ -16,6 +18,16 @@ class User(AbstractUser):
     )
     user_type = models.CharField(max_length=10, choices=USER_TYPE_CHOICES)
     created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Trigram indexes over the expressions ``icontains`` compares
+            # (UPPER(column)), so user search is an index scan.
+            GinIndex(OpClass(Upper('username'), name='gin_trgm_ops'), name='user_username_trgm_idx'),
+            GinIndex(OpClass(Upper('fullname'), name='gin_trgm_ops'), name='user_fullname_trgm_idx'),
+            GinIndex(OpClass(Upper('email'), name='gin_trgm_ops'), name='user_email_trgm_idx'),
+        ]
+
     def __str__(self):
         return self.email
 
@@ -28,6 +40,7 @@ class Creator(models.Model):
     publicProfile2 = models.URLField(blank=True, null=True)
     background = models.URLField(blank=True, null=True)
     followers = models.ManyToManyField('User', symmetrical=False, blank=True, related_name='following')
+    follower_count = models.PositiveIntegerField(default=0)  # kept in sync by creator.signals
     APPROVE_CHOICES = [
         ('pending', 'Pending'),
         ('accept', 'Accepted'),
@@ -35,9 +48,6 @@ class Creator(models.Model):
     ]
     approve = models.CharField(max_length=20, choices=APPROVE_CHOICES, default='pending')
     
-    def follower_count(self):
-        return self.followers.count()
-
     def __str__(self):
         return f"Creator: {self.user.username}"
 
@@ -98,7 +98,8 @@ class LoginSerializer(serializers.Serializer):
             },
             'refresh': str(refresh),
             'access': str(refresh.access_token),
-            'status': user.status  # 👈 Optionally expose it directly
+            'status': user.status,  # 👈 Optionally expose it directly
+            'instance': user,  # for LoginView's approval check, not serialized
         }
 
 class CreatorSerializer(serializers.ModelSerializer):
@@ -161,7 +162,7 @@ class CombinedCreatorUserSerializer(serializers.ModelSerializer):
 
     def get_follower_count(self, obj):
         if hasattr(obj, "creator_profile"):
-            return obj.creator_profile.followers.count()
+            return obj.creator_profile.follower_count
         return 0
     
     def get_has_paid(self, obj):
@@ -200,7 +201,7 @@ class CombinedCreatorUserSerializer(serializers.ModelSerializer):
         return instance
 
 class CreatorDetailSerializer(serializers.ModelSerializer):
-    follower_count = serializers.SerializerMethodField()
+    follower_count = serializers.IntegerField(read_only=True)
     is_following = serializers.SerializerMethodField()
 
     class Meta:
@@ -208,9 +209,6 @@ class CreatorDetailSerializer(serializers.ModelSerializer):
         fields = ['id', 'category', 'description', 'background', 'approve',
                   'follower_count', 'is_following']
 
-    def get_follower_count(self, obj):
-        return obj.followers.count()
-
     def get_is_following(self, obj):
         request = self.context.get('request')
         if request and request.user.is_authenticated:
@@ -0,0 +1,41 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import User, Creator
+from .user_cache import invalidate_user_snapshot
+from . import directory
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def drop_user_snapshot(sender, instance, **kwargs):
+    """Blocks, deletes and profile edits must not be served from a cached snapshot."""
+    _drop_snapshot(instance.pk)
+
+
+@receiver(post_save, sender=User)
+def refresh_typeahead_entries(sender, instance, update_fields=None, **kwargs):
+    # Saves such as the last_login update can't change the entries.
+    if update_fields is not None and not directory.INDEXED_FIELDS & set(update_fields):
+        return
+    transaction.on_commit(lambda: directory.index_user(instance))
+
+
+@receiver(post_delete, sender=User)
+def drop_typeahead_entries(sender, instance, **kwargs):
+    user_id = instance.pk
+    transaction.on_commit(lambda: directory.unindex_user(user_id))
+
+
+@receiver(post_save, sender=Creator)
+@receiver(post_delete, sender=Creator)
+def drop_creator_snapshot(sender, instance, **kwargs):
+    _drop_snapshot(instance.user_id)
+
+
+def _drop_snapshot(user_id):
+    invalidate_user_snapshot(user_id)
+    # Again once committed: a request may read the old row until then and
+    # would store it under the version bumped just now.
+    transaction.on_commit(lambda: invalidate_user_snapshot(user_id))
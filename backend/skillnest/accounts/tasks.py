@@ -94,3 +94,10 @@ Best,
 The SkillNest Support Team
 """
     send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [user_email])
+
+
+@shared_task
+def rebuild_typeahead_index():
+    """Rebuild the username/email typeahead index (accounts.directory) from the users table."""
+    from .directory import rebuild_index
+    rebuild_index()
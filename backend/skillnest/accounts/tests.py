@@ -1,3 +1,116 @@
+import time
+from unittest import mock
+
 from django.test import TestCase
+from django_redis import get_redis_connection
+
+from . import directory
+from .models import User
+from .user_cache import get_user_snapshot, invalidate_user_snapshot, snapshot_key, version_key
+
+
+class UserSnapshotTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="user", email="user@example.com", password="pass12345")
+
+    def setUp(self):
+        self.redis = get_redis_connection("default")
+        self.redis.delete(snapshot_key(self.user.id), version_key(self.user.id))
+        self.addCleanup(self.redis.delete, snapshot_key(self.user.id), version_key(self.user.id))
+        self.token = {"user_id": self.user.id, "jti": "jti-1", "exp": time.time() + 600}
+
+    def test_snapshot_is_served_from_redis(self):
+        self.assertEqual(get_user_snapshot(self.token).username, "user")
+        with self.assertNumQueries(0):
+            self.assertEqual(get_user_snapshot(self.token).username, "user")
+
+    def test_save_drops_the_snapshot(self):
+        get_user_snapshot(self.token)
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.filter(pk=self.user.pk).update(is_block=True)
+            User.objects.get(pk=self.user.pk).save()
+        self.assertTrue(get_user_snapshot(self.token).is_block)
+
+    def test_fill_racing_an_invalidation_is_not_stored(self):
+        real_filter = User.objects.filter
+
+        def filter_then_invalidate(*args, **kwargs):
+            invalidate_user_snapshot(self.user.id)
+            return real_filter(*args, **kwargs)
+
+        with mock.patch.object(User.objects, "filter", side_effect=filter_then_invalidate):
+            self.assertEqual(get_user_snapshot(self.token).username, "user")
+        self.assertFalse(self.redis.exists(snapshot_key(self.user.id)))
+
+        get_user_snapshot(self.token)
+        self.assertTrue(self.redis.hexists(snapshot_key(self.user.id), "jti-1"))
+
+    def test_missing_user(self):
+        self.assertIsNone(get_user_snapshot({**self.token, "user_id": self.user.id + 1000}))
+
+
+class TypeaheadIndexTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = User.objects.create_user(username="alice", email="alice@example.com", password="pass12345")
+        cls.albert = User.objects.create_user(username="Albert", email="bert@example.com", password="pass12345")
+
+    def setUp(self):
+        self.redis = get_redis_connection("default")
+        self._clear_redis()
+        self.addCleanup(self._clear_redis)
+
+    def _clear_redis(self):
+        self.redis.delete(
+            directory.INDEX_KEY, directory.ENTRIES_KEY, directory.INDEX_TMP_KEY, directory.ENTRIES_TMP_KEY,
+            directory.READY_KEY, directory.REBUILD_LOCK_KEY,
+        )
+
+    def _usernames(self, prefix):
+        return [user["username"] for user in directory.complete(prefix)]
+
+    def test_rebuild_swaps_in_a_complete_index(self):
+        self.redis.zadd(directory.INDEX_KEY, {"stale\0999\0stale\0stale@example.com": 0})
+
+        directory.rebuild_index(self.redis)
+
+        self.assertTrue(self.redis.exists(directory.READY_KEY))
+        self.assertFalse(self.redis.exists(directory.REBUILD_LOCK_KEY, directory.INDEX_TMP_KEY))
+        self.assertEqual(self._usernames("al"), ["Albert", "alice"])
+        self.assertEqual(self._usernames("bert@"), ["Albert"])
+        self.assertEqual(self._usernames("stale"), [])
+
+    def test_each_user_is_listed_once(self):
+        directory.rebuild_index(self.redis)
+        self.assertEqual(self._usernames("alice"), ["alice"])
+
+    def test_changes_replace_the_users_entries(self):
+        directory.rebuild_index(self.redis)
+        self.alice.username = "alicia"
+        directory.index_user(self.alice, self.redis)
+        self.assertEqual(self._usernames("alic"), ["alicia"])
+        self.assertEqual(self._usernames("alice@"), ["alicia"])
+
+        self.alice.is_block = True
+        directory.index_user(self.alice, self.redis)
+        self.assertEqual(self._usernames("alic"), [])
+        self.assertFalse(self.redis.hexists(directory.ENTRIES_KEY, self.alice.id))
+
+    def test_changes_during_a_rebuild_survive_the_swap(self):
+        def read_then_change(chunk_size):
+            read = list(User.objects.order_by("id"))
+            # Albert is renamed and Alice unlisted after the rebuild read them.
+            renamed = User.objects.get(pk=self.albert.pk)
+            renamed.username = "bertie"
+            directory.index_user(renamed, self.redis)
+            directory.unindex_user(self.alice.id, self.redis)
+            yield from read
+
+        with mock.patch.object(User.objects, "only", return_value=mock.Mock(iterator=read_then_change)):
+            directory.rebuild_index(self.redis)
 
-# Create your tests here.
+        self.assertEqual(self._usernames("bert"), ["bertie"])
+        self.assertEqual(self._usernames("al"), [])
@@ -0,0 +1,100 @@
+# accounts/user_cache.py
+"""
+Short-lived user snapshots for token authentication.
+
+A validated access token is resolved to a user once per token: the
+snapshot (the columns auth and permission checks read) is stored in the
+Redis hash ``auth:user:<id>`` under the token's ``jti`` and expires with
+the token. ``accounts.signals`` deletes the hash whenever the user is
+saved or deleted (or their creator profile changes), so blocks, deletes,
+approvals and profile edits apply on the next request. Other columns stay
+deferred and load on first access.
+
+Invalidation also bumps ``auth:user:<id>:version``. A fill notes the
+version before reading the database and only stores its snapshot if the
+version is unchanged, so a request that read the row before a change
+can't write the old snapshot back after the hash was deleted.
+"""
+import json
+
+from django.contrib.auth import get_user_model
+from django.db import router
+from django.db.models import F
+from django.utils import timezone
+from django_redis import get_redis_connection
+
+User = get_user_model()
+
+SNAPSHOT_FIELDS = (
+    "id", "username", "email", "fullname", "status", "profile",
+    "is_block", "is_delete", "user_type", "is_active", "is_staff", "is_superuser",
+)
+
+# Outlives any fill in progress; a version that expired and restarted
+# can only make a fill skip storing.
+VERSION_TTL = 24 * 60 * 60
+
+# KEYS: hash, version. ARGV: version seen before the fill, jti, snapshot, ttl.
+_STORE_IF_CURRENT = """
+if (redis.call('get', KEYS[2]) or '') ~= ARGV[1] then
+    return 0
+end
+redis.call('hset', KEYS[1], ARGV[2], ARGV[3])
+redis.call('expire', KEYS[1], ARGV[4])
+return 1
+"""
+
+
+def snapshot_key(user_id):
+    return f"auth:user:{user_id}"
+
+
+def version_key(user_id):
+    return f"auth:user:{user_id}:version"
+
+
+def _to_user(snapshot):
+    # from_db expects values in concrete-field order; missing fields are deferred.
+    field_names = [f.attname for f in User._meta.concrete_fields if f.attname in snapshot]
+    user = User.from_db(router.db_for_read(User), field_names, [snapshot[name] for name in field_names])
+    # Creator approval state ('pending'/'accept'/'reject'), None for learners.
+    user.creator_approve = snapshot["creator_approve"]
+    return user
+
+
+def get_user_snapshot(token):
+    """
+    Return the user for a validated access token, or None if the user no
+    longer exists. At most one query per token for the token's lifetime.
+    """
+    user_id = token["user_id"]
+    jti = token["jti"]
+    redis = get_redis_connection("default")
+    pipe = redis.pipeline(transaction=False)
+    pipe.hget(snapshot_key(user_id), jti)
+    pipe.get(version_key(user_id))
+    cached, version = pipe.execute()
+    if cached is not None:
+        return _to_user(json.loads(cached))
+
+    snapshot = (
+        User.objects.filter(id=user_id)
+        .values(*SNAPSHOT_FIELDS, creator_approve=F("creator_profile__approve"))
+        .first()
+    )
+    if snapshot is None:
+        return None
+    ttl = max(int(token["exp"] - timezone.now().timestamp()), 1)
+    redis.register_script(_STORE_IF_CURRENT)(
+        keys=[snapshot_key(user_id), version_key(user_id)],
+        args=[version or b"", jti, json.dumps(snapshot), ttl],
+    )
+    return _to_user(snapshot)
+
+
+def invalidate_user_snapshot(user_id):
+    pipe = get_redis_connection("default").pipeline()
+    pipe.incr(version_key(user_id))
+    pipe.expire(version_key(user_id), VERSION_TTL)
+    pipe.delete(snapshot_key(user_id))
+    pipe.execute()
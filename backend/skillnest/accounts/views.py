@@ -45,6 +45,7 @@ logger = logging.getLogger(__name__)
 
 User = get_user_model()
 from .models import User,Payment
+from .directory import complete
 
 class RegisterView(APIView):
     permission_classes = [AllowAny]
@@ -67,9 +68,9 @@ class LoginView(APIView):
             user = data['user']
             #  # Check user status & approval conditions
             if user['user_type'] == 'creator':
-                user_instance = User.objects.get(id=user['id'])
                 # Creator must be approved and active
-                creator_profile = Creator.objects.filter(user=user_instance).first() # Access related Creator profile, if not exists, None
+                # Profile was select_related by EmailBackend; None if it doesn't exist
+                creator_profile = getattr(data['instance'], 'creator_profile', None)
                 if not creator_profile or creator_profile.approve != 'accept':
                     return Response(
                         {'success': False, 'error': 'Creator account is not approved yet.'},
@@ -355,9 +356,8 @@ class CreatorCreateView(generics.CreateAPIView):
 @api_view(["get"])
 def search_users(request):
     q = request.query_params.get("q", "")
-    users = User.objects.filter(username__icontains=q) | User.objects.filter(email__icontains=q)
-    data = [{"id": u.id, "username": u.username, "email": u.email} for u in users[:10]]
-    return Response(data)
+    # Prefix typeahead over usernames and emails, served from Redis (accounts.directory).
+    return Response(complete(q, limit=10))
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
@@ -0,0 +1,104 @@
+# api/search.py
+"""
+Search over users, posts, courses and communities.
+
+Posts (courses are posts with ``is_course``) and communities are matched
+against their generated, GIN-indexed ``search_vector`` columns with a
+web-search style query and ranked by ``ts_rank``. Users are matched by
+substring on username, full name or email, served by the trigram indexes
+on ``accounts.User``, and ranked by trigram similarity. ``search`` merges
+the requested kinds into one ranked UNION of ``(kind, id, score)`` rows, so
+a page is cut in SQL; ``hydrate`` then loads the rows of one page.
+"""
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramSimilarity
+from django.db.models import CharField, F, Q, Value
+from django.db.models.functions import Greatest
+
+from accounts.models import User
+from creator.models import Community, Post
+
+TYPES = ("users", "posts", "courses", "communities")
+
+
+def user_matches(q):
+    """Users whose username, full name or email contains ``q``, with a ``rank``."""
+    return User.objects.filter(
+        Q(username__icontains=q) | Q(fullname__icontains=q) | Q(email__icontains=q)
+    ).annotate(
+        rank=Greatest(TrigramSimilarity("username", q), TrigramSimilarity("fullname", q)),
+    )
+
+
+def _text_matches(queryset, q):
+    query = SearchQuery(q, search_type="websearch", config="english")
+    return queryset.filter(search_vector=query).annotate(
+        rank=SearchRank(F("search_vector"), query),
+    )
+
+
+def _ranked(queryset, kind):
+    return queryset.annotate(
+        kind=Value(kind, output_field=CharField()),
+        score=F("rank"),
+    ).values_list("kind", "id", "score")
+
+
+def search(q, types=TYPES):
+    """Matches of the given kinds as ``(kind, id, score)`` rows, best first."""
+    parts = []
+    if "users" in types:
+        parts.append(_ranked(user_matches(q).filter(is_active=True, is_block=False, is_delete=False), "users"))
+    if "posts" in types:
+        parts.append(_ranked(_text_matches(Post.objects.filter(is_course=False), q), "posts"))
+    if "courses" in types:
+        parts.append(_ranked(_text_matches(Post.objects.filter(is_course=True), q), "courses"))
+    if "communities" in types:
+        parts.append(_ranked(_text_matches(Community.objects.all(), q), "communities"))
+    results = parts[0].union(*parts[1:], all=True) if len(parts) > 1 else parts[0]
+    return results.order_by("-score", "kind", "id")
+
+
+def _user(user):
+    return {"id": user.id, "username": user.username, "fullname": user.fullname, "profile": user.profile}
+
+
+def _post(post):
+    return {
+        "id": post.id,
+        "caption": post.caption,
+        "image": post.image,
+        "created_at": post.created_at,
+        "user": {"id": post.user.id, "username": post.user.username},
+    }
+
+
+def _community(community):
+    return {
+        "id": community.id,
+        "name": community.name,
+        "description": community.description,
+        "creator": {"id": community.creator.id, "username": community.creator.username},
+    }
+
+
+def hydrate(rows):
+    """Turn ``(kind, id, score)`` rows into result dicts, one query per kind."""
+    ids = {}
+    for kind, pk, _ in rows:
+        ids.setdefault(kind, []).append(pk)
+    loaded = {}
+    if "users" in ids:
+        users = User.objects.filter(id__in=ids["users"]).only("id", "username", "fullname", "profile")
+        loaded.update({("users", u.id): _user(u) for u in users})
+    for kind in ("posts", "courses"):
+        if kind in ids:
+            posts = Post.objects.filter(id__in=ids[kind]).select_related("user")
+            loaded.update({(kind, p.id): _post(p) for p in posts})
+    if "communities" in ids:
+        communities = Community.objects.filter(id__in=ids["communities"]).select_related("creator")
+        loaded.update({("communities", c.id): _community(c) for c in communities})
+    return [
+        {"type": kind, "score": score, **loaded[kind, pk]}
+        for kind, pk, score in rows
+        if (kind, pk) in loaded
+    ]
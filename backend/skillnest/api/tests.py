@@ -1,3 +1,63 @@
 from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from accounts.models import User
+from creator.models import Community, Post
+from . import search
+
+
+class SearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.creator = User.objects.create_user(
+            username="pythonista", email="creator@example.com", password="pass12345", user_type="creator",
+        )
+        User.objects.create_user(
+            username="pythonblocked", email="blocked@example.com", password="pass12345", is_block=True,
+        )
+        cls.often = Post.objects.create(user=cls.creator, caption="Python tips: python, python and more python")
+        cls.once = Post.objects.create(user=cls.creator, caption="A note that mentions python once among many words")
+        cls.course = Post.objects.create(user=cls.creator, caption="Python course", is_course=True)
+        Post.objects.create(user=cls.creator, caption="Nothing relevant here")
+        cls.community = Community.objects.create(creator=cls.creator, name="Python learners")
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.creator)
+
+    def test_union_is_ordered_by_score_then_kind_and_id(self):
+        rows = list(search.search("python"))
+
+        self.assertEqual(rows, sorted(rows, key=lambda row: (-row[2], row[0], row[1])))
+        self.assertCountEqual(
+            [(kind, pk) for kind, pk, _ in rows],
+            [
+                ("users", self.creator.id), ("posts", self.often.id), ("posts", self.once.id),
+                ("courses", self.course.id), ("communities", self.community.id),
+            ],
+        )
+
+    def test_more_relevant_posts_rank_higher(self):
+        posts = [pk for _, pk, _ in search.search("python", types=("posts",))]
+        self.assertEqual(posts, [self.often.id, self.once.id])
+
+    def test_pages_follow_the_union_order(self):
+        expected = [(kind, pk) for kind, pk, _ in search.search("python")]
+
+        seen, url, params = [], reverse("search"), {"q": "python", "page_size": 2}
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            seen += [(result["type"], result["id"]) for result in response.data["results"]]
+            url, params = response.data["next"], None
+
+        self.assertEqual(seen, expected)
+
+    def test_kinds_can_be_filtered(self):
+        kinds = {kind for kind, _, _ in search.search("python", types=("courses", "communities"))}
+        self.assertEqual(kinds, {"courses", "communities"})
+
+        response = self.client.get(reverse("search"), {"q": "python", "type": "videos"})
+        self.assertEqual(response.status_code, 400)
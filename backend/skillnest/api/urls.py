@@ -3,6 +3,7 @@ from accounts.views import LoginView, RegisterView,ProtectedView, RefreshTokenVi
 from accounts.views import CreateOrderView,ProfileView,CreatorCreateView,search_users,upload_image,VerifyPaymentView
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from creator.views import PostView
+from .views import SearchView
 
 urlpatterns = [
     path('register/', RegisterView.as_view(), name='register'),
@@ -19,6 +20,7 @@ urlpatterns = [
     path('reset_password/', reset_password_view, name='reset_password'),
     path('create-creator/', CreatorCreateView.as_view(), name='create-creator'),
     path('search-users/', search_users, name='search-users'),
+    path('search/', SearchView.as_view(), name='search'),
     path('upload-image/', upload_image, name='upload_image'),
     path('payment/create-order/', CreateOrderView.as_view(), name='create-order'),
     path('payment/verify/', VerifyPaymentView.as_view(), name='verify-payment'),
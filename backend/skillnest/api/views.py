@@ -1 +1,36 @@
+from rest_framework import status
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
+from . import search
+
+
+class SearchPagination(PageNumberPagination):
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 50
+
+
+class SearchView(APIView):
+    """
+    ``GET /search/?q=<text>&type=users,posts,courses,communities`` -- ranked,
+    paginated results across the requested kinds (all of them by default).
+    """
+
+    def get(self, request):
+        q = request.query_params.get("q", "").strip()
+        if not q:
+            return Response({"error": "q is required"}, status=status.HTTP_400_BAD_REQUEST)
+        types = request.query_params.get("type")
+        types = [t.strip() for t in types.split(",") if t.strip()] if types else search.TYPES
+        unknown = set(types) - set(search.TYPES)
+        if unknown or not types:
+            return Response(
+                {"error": f"type must be any of {', '.join(search.TYPES)}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        paginator = SearchPagination()
+        page = paginator.paginate_queryset(search.search(q, types), request, view=self)
+        return paginator.get_paginated_response(search.hydrate(page))
@@ -4,6 +4,3 @@ from django.apps import AppConfig
 class ChatConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'chat'
-        
-    def ready(self):
-        import chat.signals  # registers signal to create rooms
@@ -1,19 +1,46 @@
 # chat/consumers.py
 
 import json
+from urllib.parse import parse_qs
 from channels.generic.websocket import AsyncWebsocketConsumer
+from asgiref.sync import sync_to_async
 from channels.db import database_sync_to_async
-from django.utils import timezone
+from django.conf import settings
+from django.core.exceptions import ValidationError
 from accounts.models import User
-from .models import CommunityChatRoom, CommunityMessage,UserPresence
+from .models import CommunityChatRoom, CommunityMessage
+from creator import membership
 from .utils.translate import translate_text
+from . import unread as unread_counters
+from . import write_behind
+from . import presence
+from . import typing
+from . import sync as delta_sync
+from .serializers import serialize_delta
+from skillnest.frames import FramedConsumerMixin, preencode
 import asyncio
+import contextlib
 import datetime
+import uuid
 
 import logging
 logger = logging.getLogger(__name__)
 
-class CommunityChatConsumer(AsyncWebsocketConsumer):
+# Message types a client may send; "system" messages are server-made.
+CLIENT_MESSAGE_TYPES = ("text", "image", "video", "file")
+
+
+def _valid_media_url(url):
+    if url is None:
+        return True
+    try:
+        CommunityMessage._meta.get_field("media_url").clean(url, None)
+    except ValidationError:
+        return False
+    return True
+
+
+class CommunityChatConsumer(FramedConsumerMixin, AsyncWebsocketConsumer):
     async def connect(self):
         self.user = self.scope["user"]
         if self.user.is_anonymous:
@@ -39,37 +66,75 @@ class CommunityChatConsumer(AsyncWebsocketConsumer):
             self.room_group_name,
             self.channel_name
         )
-        await self.accept()
+        await self.accept_framed()
+        # Mark user as online in this community; the heartbeat keeps it so
+        self.heartbeat_task = asyncio.create_task(self.heartbeat())
 
-        # Mark user as online in this community
-        await self.update_user_presence(True)
+        # Channel messages are not dispatched until connect returns, so the
+        # replay reaches the client before any live event.
+        await self.replay_delta()
 
         # Notify others
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                "type": "user_status_update",
-                "user_id": self.user.id,
-                "username": self.user.username,
-                "status": "online",
-                "status": "online"
-            }
-        )
+        await self.broadcast({
+            "type": "user_status_update",
+            "user_id": self.user.id,
+            "username": self.user.username,
+            "status": "online",
+        })
+
+    async def replay_delta(self):
+        """
+        Resume handshake: ``?cursor=`` (from the sync endpoint or a previous
+        ``sync`` frame) or ``?after=<message id>`` on connect sends what the
+        client missed as one ``sync`` frame. Messages broadcast while it is
+        built may arrive twice; clients dedupe by id.
+        """
+        query = parse_qs(self.scope.get("query_string", b"").decode())
+        cursor = query.get("cursor", [None])[0]
+        after = query.get("after", [None])[0]
+        if not cursor and not after:
+            return
+        changes = await self.load_delta(cursor, after)
+        if changes is None:
+            await self.send_event({"type": "sync_error", "message": "Invalid cursor"})
+            return
+        await self.send_event({"type": "sync", **changes})
+
+    @database_sync_to_async
+    def load_delta(self, cursor, after):
+        try:
+            if not cursor:
+                cursor = delta_sync.cursor_after(self.room, uuid.UUID(after))
+            if cursor is None:
+                return None
+            return serialize_delta(delta_sync.delta(self.room, cursor, settings.CHAT_SYNC_LIMIT))
+        except ValueError:
+            return None
 
     async def disconnect(self, close_code):
         if hasattr(self, "room_group_name"):
-            await self.update_user_presence(False)
-
-            await self.channel_layer.group_send(
-                self.room_group_name,
-                {
+            # connect may have failed before starting the heartbeat.
+            if getattr(self, "heartbeat_task", None):
+                self.heartbeat_task.cancel()
+            if getattr(self, "typing_flush_task", None):
+                self.typing_flush_task.cancel()
+                # Let it release the flush lock first, or update() below
+                # would find the lock still held and nobody would flush.
+                with contextlib.suppress(asyncio.CancelledError):
+                    await self.typing_flush_task
+            if await sync_to_async(typing.update)(self.room.id, self.user, False):
+                # Nobody else is flushing the room: send the final list ourselves.
+                users = await sync_to_async(typing.active)(self.room.id)
+                await self.broadcast({"type": "typing_indicator", "users": users})
+                await sync_to_async(typing.release)(self.room.id, keep_if_typing=False)
+            # Another tab may still be connected to the room.
+            if await sync_to_async(presence.leave)(self.user.id, self.room.id, self.channel_name):
+                await self.broadcast({
                     "type": "user_status_update",
                     "user_id": self.user.id,
                     "username": self.user.username,
                     "status": "offline",
-                    "message": f"{self.user.username} left the community chat"
-                }
-            )
+                })
 
             await self.channel_layer.group_discard(
                 self.room_group_name,
@@ -78,16 +143,15 @@ class CommunityChatConsumer(AsyncWebsocketConsumer):
 
 # inside CommunityChatConsumer
 
-    async def receive(self, text_data):
+    async def receive(self, text_data=None, bytes_data=None):
         """
-        Accept either:
+        Accept either (as JSON text, or MessagePack when negotiated):
         - envelope style: { type: "chat_message", message_type: "image", content: "", media_url: "..." }
         - short style:    { type: "image", content: "", media_url: "..." }
         - or:             { action: "send", message_type: "...", ... }
         """
-        try:
-            data = json.loads(text_data)
-        except Exception as e:
+        data = self.decode_frame(text_data, bytes_data)
+        if not isinstance(data, dict):
             return
 
         # Look for various possible envelope keys
@@ -96,111 +160,157 @@ class CommunityChatConsumer(AsyncWebsocketConsumer):
             await self.handle_typing(data)
         else:
             # message_type is explicit OR fallback to envelope when envelope is a known message type
-            message_type = data.get("message_type") or (envelope if envelope in ("text", "image", "video", "file") else None) or "text"
+            message_type = data.get("message_type") or (envelope if envelope in CLIENT_MESSAGE_TYPES else None) or "text"
             # If it's a chat message (either explicit envelope or a known message_type), handle it
-            if envelope == "chat_message" or message_type in ("text", "image", "video", "file"):
+            if envelope == "chat_message" or message_type in CLIENT_MESSAGE_TYPES:
                 await self.handle_chat_message(data, message_type=message_type)
 
     async def handle_typing(self, data):
-        is_typing = data.get("is_typing", False)
+        is_typing = bool(data.get("is_typing", False))
+        if is_typing:
+            # Per-connection throttle first; it costs no Redis round trip.
+            now = asyncio.get_running_loop().time()
+            if now - getattr(self, "last_typing_at", float("-inf")) < settings.TYPING_MIN_INTERVAL:
+                return
+            self.last_typing_at = now
+        else:
+            self.last_typing_at = float("-inf")
+
+        if await sync_to_async(typing.update)(self.room.id, self.user, is_typing):
+            self.typing_flush_task = asyncio.create_task(self.flush_typing())
+
+    async def flush_typing(self):
+        """Broadcast the room's typing users, coalesced, while this connection holds the flush lock."""
+        last_sent = None
+        try:
+            while True:
+                await asyncio.sleep(settings.TYPING_FLUSH_INTERVAL)
+                users = await sync_to_async(typing.active)(self.room.id)
+                if users != last_sent:
+                    await self.broadcast({"type": "typing_indicator", "users": users})
+                    last_sent = users
+                if not users and await sync_to_async(typing.release)(self.room.id):
+                    return
+        except asyncio.CancelledError:
+            await sync_to_async(typing.release)(self.room.id, keep_if_typing=False)
+            raise
+
+    async def broadcast(self, event):
+        """
+        group_send ``event`` to the room. It is encoded here, once, in every
+        frame encoding; the handlers below only pick their consumer's one.
+        """
         await self.channel_layer.group_send(
             self.room_group_name,
-            {
-                "type": "user_status_update",  # reuse user_status_update
-                "user_id": self.user.id,
-                "username": self.user.username,
-                "is_typing": is_typing,
-            }
+            {"type": event["type"], "frames": preencode(event)},
         )
 
+    async def typing_indicator(self, event):
+        await self.send_preencoded(event["frames"])
+
     async def chat_message(self, event):
-        """
-        Called by group_send; event['message'] already contains the serialized message dict.
-        """
-        await self.send(text_data=json.dumps({
-            "type": "chat_message",
-            "message": event["message"],
-        }))
+        await self.send_preencoded(event["frames"])
+
+    async def message_edited(self, event):
+        # Sent by chat.views.edit_community_message.
+        await self.send_preencoded(event["frames"])
 
     async def handle_chat_message(self, data, message_type="text"):
         """
         Save the message (text/media) and broadcast it to the group.
         Accepts either content (text) and/or media_url.
         """
-        content = (data.get("content") or "").strip()
+        content = data.get("content") or ""
         media_url = data.get("media_url") or None
+        # Checked here, before the row is broadcast or queued for write-behind.
+        if message_type not in CLIENT_MESSAGE_TYPES or not isinstance(content, str) or not _valid_media_url(media_url):
+            return
+        content = content.strip()
 
         # If both text and media are missing, ignore
         if not content and not media_url:
             return
 
-        # persist
-        message = await self.save_message(content=content, message_type=message_type, media_url=media_url)
+        if settings.CHAT_WRITE_BEHIND:
+            # Broadcast first; the row reaches the database through chat.tasks.persist_chat_messages.
+            message = CommunityMessage(
+                id=uuid.uuid4(),
+                room=self.room,
+                sender=self.user,
+                content=content,
+                message_type=message_type,
+                media_url=media_url,
+            )
+            await self.enqueue_message(message)
+        else:
+            # persist
+            message = await self.save_message(content=content, message_type=message_type, media_url=media_url)
 
         # broadcast (note "type": "chat_message" here -> calls chat_message)
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                "type": "chat_message",
-                "message": {
-                    "id": str(message.id),
-                    "content": message.content,
-                    "message_type": message.message_type,
-                    "media_url": message.media_url,
-                    "sender": {
-                        "id": message.sender.id,
-                        "username": message.sender.username,
-                    },
-                    "timestamp": message.timestamp.isoformat(),
-                }
+        await self.broadcast({
+            "type": "chat_message",
+            "message": {
+                "id": str(message.id),
+                "content": message.content,
+                "message_type": message.message_type,
+                "media_url": message.media_url,
+                "sender": {
+                    "id": self.user.id,
+                    "username": self.user.username,
+                },
+                "timestamp": message.timestamp.isoformat(),
             }
-        )
+        })
 
     @database_sync_to_async
     def save_message(self, content="", message_type="text", media_url=None):
         """
         Persist CommunityMessage including media_url and message_type.
         """
-        return CommunityMessage.objects.create(
+        message = CommunityMessage.objects.create(
             room=self.room,
             sender=self.user,
             content=content or "",
             message_type=message_type,
             media_url=media_url
         )
+        unread_counters.record_message(self.room.id, self.user.id)
+        return message
+
+    @sync_to_async
+    def enqueue_message(self, message):
+        write_behind.enqueue_message({
+            "id": str(message.id),
+            "room_id": message.room_id,
+            "sender_id": message.sender_id,
+            "content": message.content,
+            "media_url": message.media_url,
+            "message_type": message.message_type,
+            "timestamp": message.timestamp.isoformat(),
+        })
+        unread_counters.record_message(message.room_id, message.sender_id)
 
     @database_sync_to_async
     def get_room_if_allowed(self):
         try:
-            room = CommunityChatRoom.objects.select_related("community").get(uuid=self.room_uuid)
-            community = room.community
-            if community.creator == self.user or community.members.filter(id=self.user.id).exists():
+            room = CommunityChatRoom.objects.get(uuid=self.room_uuid)
+            if membership.is_member(room.community_id, self.user.id):
                 return room
         except CommunityChatRoom.DoesNotExist:
             return None
         return None
 
 
-    @database_sync_to_async
-    def update_user_presence(self, is_online):
-        presence, created = UserPresence.objects.get_or_create(user=self.user)
-        presence.is_online = is_online
-        presence.current_room = self.room if is_online else None
-        presence.last_seen = timezone.now()
-        presence.save()
+    async def heartbeat(self):
+        while True:
+            try:
+                await sync_to_async(presence.heartbeat)(self.user.id, self.room.id, self.channel_name)
+            except Exception:
+                logger.exception("Presence heartbeat failed")
+            await asyncio.sleep(settings.PRESENCE_HEARTBEAT_INTERVAL)
     
     async def user_status_update(self, event):
-        payload = {
-        "type": "user_status_update",
-        "user_id": event["user_id"],
-        "username": event["username"],
-        }
-        if "status" in event:
-            payload["status"] = event["status"]
-        if "is_typing" in event:
-            payload["is_typing"] = event["is_typing"]
-
-        await self.send(text_data=json.dumps(payload))
+        await self.send_preencoded(event["frames"])
 
 class CommunityMeetConsumer(AsyncWebsocketConsumer):
     async def connect(self):
@@ -1,26 +1,41 @@
 import logging
-import jwt
 from django.conf import settings
-from django.contrib.auth import get_user_model
 from django.contrib.auth.models import AnonymousUser
 from channels.middleware import BaseMiddleware
 from channels.db import database_sync_to_async
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import AccessToken
+from accounts.user_cache import get_user_snapshot
 
 logger = logging.getLogger(__name__)
-User = get_user_model()
+
 
 @database_sync_to_async
 def get_user_from_token(token: str):
     """
-    Decode the JWT access token and return the matching user,
-    or None if token is invalid/expired.
+    Validate the JWT access token (signature, expiry, token type) and return
+    the matching user from the per-token snapshot cache, or None if the
+    token is invalid or the user is gone, blocked or deleted.
     """
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
-        data=User.objects.get(id=payload["user_id"])
-        return User.objects.get(id=payload["user_id"])
-    except Exception as e:
+        validated = AccessToken(token)
+    except TokenError:
+        return None
+    user = get_user_snapshot(validated)
+    if user is None or user.is_block or user.is_delete or not user.is_active:
         return None
+    return user
+
+
+def get_cookie(headers, name):
+    """Read one cookie from the raw ASGI headers without building the whole jar."""
+    for key, value in headers:
+        if key == b"cookie":
+            for pair in value.decode().split(";"):
+                cookie_name, sep, cookie_value = pair.strip().partition("=")
+                if sep and cookie_name == name:
+                    return cookie_value
+    return None
 
 
 class JWTAuthMiddleware(BaseMiddleware):
@@ -31,22 +46,11 @@ class JWTAuthMiddleware(BaseMiddleware):
 
     async def __call__(self, scope, receive, send):
         try:
-            # Headers arrive as a list of [key, value] byte pairs
-            headers = dict(scope.get("headers", []))
-            cookies = {}
-            # Grab the Cookie header if present
-            if b"cookie" in headers:
-                cookie_header = headers[b"cookie"].decode()
-                for pair in cookie_header.split(";"):
-                    if "=" in pair:
-                        name, value = pair.strip().split("=", 1)
-                        cookies[name] = value
-
-
-            token = cookies.get("access_token")
+            token = get_cookie(scope.get("headers", []), settings.SIMPLE_JWT["AUTH_COOKIE_ACCESS"])
             user = await get_user_from_token(token) if token else None
             scope["user"] = user or AnonymousUser()   # <-- always set a user
-        except Exception as e:
+        except Exception:
+            logger.exception("WebSocket authentication failed")
             scope["user"] = AnonymousUser()
 
         return await super().__call__(scope, receive, send)
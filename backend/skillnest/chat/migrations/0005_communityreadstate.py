@@ -0,0 +1,58 @@
+# Generated by Django 5.2.4 on 2026-10-18 13:21
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def collapse_message_reads(apps, schema_editor):
+    """One read mark per (room, user): the newest message they had read."""
+    CommunityMessageRead = apps.get_model('chat', 'CommunityMessageRead')
+    CommunityReadState = apps.get_model('chat', 'CommunityReadState')
+    marks = (
+        CommunityMessageRead.objects.order_by()
+        .values('message__room_id', 'user_id')
+        .annotate(last_read_at=Max('message__timestamp'))
+        .iterator(chunk_size=2000)
+    )
+    batch = []
+    for mark in marks:
+        batch.append(CommunityReadState(
+            room_id=mark['message__room_id'], user_id=mark['user_id'], last_read_at=mark['last_read_at'],
+        ))
+        if len(batch) >= 2000:
+            CommunityReadState.objects.bulk_create(batch)
+            batch = []
+    CommunityReadState.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0004_communitymessageread'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CommunityReadState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_read_at', models.DateTimeField()),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='read_states', to='chat.communitychatroom')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chat_read_states', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('room', 'user'), name='unique_chat_read_state')],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='communitymessage',
+            index=models.Index(fields=['room', 'timestamp'], name='chat_msg_room_ts_idx'),
+        ),
+        migrations.RunPython(collapse_message_reads, migrations.RunPython.noop),
+        migrations.DeleteModel(
+            name='CommunityMessageRead',
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-18 13:26
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0005_communityreadstate'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='userpresence',
+            name='last_seen',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
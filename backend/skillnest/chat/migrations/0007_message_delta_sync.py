@@ -0,0 +1,36 @@
+# Generated by Django 5.2.4 on 2026-10-18 13:32
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0006_userpresence_last_seen'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='communitymessage',
+            name='chat_msg_room_ts_idx',
+        ),
+        migrations.AddField(
+            model_name='communitymessage',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='communitymessage',
+            index=models.Index(fields=['room', 'timestamp', 'id'], name='chat_msg_room_ts_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='communitymessage',
+            index=models.Index(condition=models.Q(('edited_at__isnull', False)), fields=['room', 'edited_at'], name='chat_msg_room_edited_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='communitymessage',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', False)), fields=['room', 'deleted_at'], name='chat_msg_room_deleted_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.4 on 2026-10-18 13:44
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0007_message_delta_sync'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='communitychatroom',
+            name='members',
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-18 13:57
+
+import django.db.models.functions.datetime
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_inserted_at(apps, schema_editor):
+    # Existing rows were inserted when they were sent; this also keeps
+    # cursors handed out before the upgrade (keyed on timestamp) valid.
+    CommunityMessage = apps.get_model('chat', 'CommunityMessage')
+    CommunityMessage.objects.update(inserted_at=models.F('timestamp'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0008_remove_communitychatroom_members'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='communitymessage',
+            name='inserted_at',
+            field=models.DateTimeField(db_default=django.db.models.functions.datetime.Now(), editable=False),
+        ),
+        migrations.RunPython(backfill_inserted_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='communitymessage',
+            index=models.Index(fields=['room', 'inserted_at', 'id'], name='chat_msg_room_ins_id_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.4 on 2026-10-18 14:15
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0009_message_inserted_at'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='communitymessage',
+            name='chat_msg_room_deleted_idx',
+        ),
+        migrations.RemoveField(
+            model_name='communitymessage',
+            name='deleted_at',
+        ),
+    ]
@@ -1,7 +1,9 @@
 from django.db import models
 from accounts.models import User
 from creator.models import Community  
+from django.db.models.functions import Now
 from django.utils import timezone
+import datetime
 import uuid
 
 
@@ -23,11 +25,8 @@ class CommunityChatRoom(models.Model):
         on_delete=models.CASCADE,
         related_name="community_chat_rooms"
     )
-    members = models.ManyToManyField(
-        User,
-        related_name="community_chats",
-        blank=True
-    )
+    # No members of its own: the room is open to its community's creator
+    # and members (creator.membership).
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
     is_active = models.BooleanField(default=True)
@@ -40,7 +39,8 @@ class CommunityChatRoom(models.Model):
 
     @property
     def member_count(self):
-        return self.members.count()
+        # The creator counts once whether or not they are also a member.
+        return self.community.members.exclude(id=self.community.creator_id).count() + 1
 
     @property
     def last_message(self):
@@ -76,22 +76,37 @@ class CommunityMessage(models.Model):
     timestamp = models.DateTimeField(default=timezone.now)
     edited_at = models.DateTimeField(null=True, blank=True)
     is_edited = models.BooleanField(default=False)
+    # Set by the database when the row is inserted, which is later than
+    # ``timestamp`` for write-behind messages; delta sync pages on it.
+    inserted_at = models.DateTimeField(db_default=Now(), editable=False)
 
 
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            # Unread counts: range scan of a room's messages after a read mark.
+            models.Index(fields=['room', 'timestamp', 'id'], name='chat_msg_room_ts_id_idx'),
+            # Delta sync: a room's messages after an (inserted_at, id) cursor.
+            models.Index(fields=['room', 'inserted_at', 'id'], name='chat_msg_room_ins_id_idx'),
+            # Delta sync: the few messages edited since a cursor.
+            models.Index(
+                fields=['room', 'edited_at'], name='chat_msg_room_edited_idx',
+                condition=models.Q(edited_at__isnull=False),
+            ),
+        ]
 
     def __str__(self):
         return f"[{self.room.community.name}] {self.sender.username}: {self.content[:40]}"
 
 
 class UserPresence(models.Model):
+    """Periodic snapshot of the Redis presence in chat.presence."""
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="presence")
     is_online = models.BooleanField(default=False)
     current_room = models.ForeignKey(
         CommunityChatRoom, null=True, blank=True, on_delete=models.SET_NULL
     )
-    last_seen = models.DateTimeField(auto_now=True)
+    last_seen = models.DateTimeField(default=timezone.now)  # last heartbeat, see chat.presence
 
 
 class Meeting(models.Model):
@@ -168,10 +183,22 @@ class MeetingParticipant(models.Model):
     def __str__(self):
         return f"{self.user} in {self.meeting.room_name}"
 
-class CommunityMessageRead(models.Model):
-    message = models.ForeignKey(CommunityMessage, on_delete=models.CASCADE, related_name="reads")
-    user = models.ForeignKey(User, on_delete=models.CASCADE)
-    read_at = models.DateTimeField(auto_now_add=True)
+class CommunityReadState(models.Model):
+    """
+    Per-(room, user) read high-water mark: every message in ``room`` with a
+    timestamp up to ``last_read_at`` is read by ``user``.
+    """
+    # Stand-in mark for rooms the user has never opened.
+    NEVER_READ = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+    room = models.ForeignKey(CommunityChatRoom, on_delete=models.CASCADE, related_name="read_states")
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="chat_read_states")
+    last_read_at = models.DateTimeField()
 
     class Meta:
-        unique_together = ('message', 'user')
+        constraints = [
+            models.UniqueConstraint(fields=['room', 'user'], name='unique_chat_read_state'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} read {self.room} up to {self.last_read_at}"
@@ -0,0 +1,89 @@
+# chat/presence.py
+"""
+Chat presence in Redis.
+
+While a chat socket is open its consumer heartbeats every
+``PRESENCE_HEARTBEAT_INTERVAL`` seconds, which bumps the connection's
+``<user_id>:<connection_id>`` score in the room's sorted set
+``presence:room:<room_id>`` and the user's in the global
+``presence:users`` set, and records the room in ``presence:rooms``. A
+user is in a room while any of their connections' last heartbeat is
+younger than ``PRESENCE_TTL``, so closing one of several tabs keeps them
+there and sockets on a worker that died drop out on their own.
+``UserPresence`` rows are only written by ``chat.tasks.snapshot_presence``.
+"""
+import time
+
+from django.conf import settings
+from django_redis import get_redis_connection
+
+USERS_KEY = "presence:users"
+ROOMS_KEY = "presence:rooms"
+
+
+def room_key(room_id):
+    return f"presence:room:{room_id}"
+
+
+def _connection(user_id, connection_id):
+    return f"{user_id}:{connection_id}"
+
+
+def _user_ids(members):
+    return {int(member.split(b":", 1)[0]) for member in members}
+
+
+def heartbeat(user_id, room_id, connection_id, redis=None):
+    redis = redis or get_redis_connection("default")
+    now = time.time()
+    pipe = redis.pipeline(transaction=False)
+    pipe.zadd(room_key(room_id), {_connection(user_id, connection_id): now})
+    pipe.zremrangebyscore(room_key(room_id), "-inf", now - settings.PRESENCE_TTL)
+    pipe.expire(room_key(room_id), settings.PRESENCE_TTL)
+    pipe.zadd(USERS_KEY, {user_id: now})
+    pipe.hset(ROOMS_KEY, user_id, room_id)
+    pipe.execute()
+
+
+def leave(user_id, room_id, connection_id, redis=None):
+    """
+    Drop the connection from the room right away instead of waiting for the
+    TTL. Returns True if the user has no other live connection in the room.
+    """
+    redis = redis or get_redis_connection("default")
+    pipe = redis.pipeline(transaction=False)
+    pipe.zrem(room_key(room_id), _connection(user_id, connection_id))
+    pipe.zrangebyscore(room_key(room_id), time.time() - settings.PRESENCE_TTL, "+inf")
+    _, members = pipe.execute()
+    return user_id not in _user_ids(members)
+
+
+def online_user_ids(room_id):
+    cutoff = time.time() - settings.PRESENCE_TTL
+    return list(_user_ids(get_redis_connection("default").zrangebyscore(room_key(room_id), cutoff, "+inf")))
+
+
+def snapshot(redis=None):
+    """
+    Return ``(online, offline)`` for the snapshot task: ``online`` maps user
+    id -> (room id, last heartbeat), ``offline`` is ``{user_id: last heartbeat}``
+    for users whose heartbeat lapsed since the previous snapshot. Lapsed users
+    are forgotten once returned.
+    """
+    redis = redis or get_redis_connection("default")
+    cutoff = time.time() - settings.PRESENCE_TTL
+    pipe = redis.pipeline()
+    pipe.zrangebyscore(USERS_KEY, cutoff, "+inf", withscores=True)
+    pipe.zrangebyscore(USERS_KEY, "-inf", f"({cutoff}", withscores=True)
+    pipe.hgetall(ROOMS_KEY)
+    alive, lapsed, rooms = pipe.execute()
+
+    online = {int(user_id): (int(rooms[user_id]) if user_id in rooms else None, seen) for user_id, seen in alive}
+    offline = {int(user_id): seen for user_id, seen in lapsed}
+    if lapsed:
+        pipe = redis.pipeline()
+        # By score, so a user who heartbeated again meanwhile is kept.
+        pipe.zremrangebyscore(USERS_KEY, "-inf", f"({cutoff}")
+        pipe.hdel(ROOMS_KEY, *(user_id for user_id, _ in lapsed))
+        pipe.execute()
+    return online, offline
@@ -54,5 +54,21 @@ class CommunityMessageSerializer(serializers.ModelSerializer):
             "username": obj.sender.username,
     }
 
+
+class CommunityMessageSyncSerializer(CommunityMessageSerializer):
+
+    class Meta(CommunityMessageSerializer.Meta):
+        fields = CommunityMessageSerializer.Meta.fields + ["is_edited", "edited_at"]
+
+
+def serialize_delta(changes):
+    """JSON-ready form of a ``chat.sync.delta`` result."""
+    return {
+        "messages": CommunityMessageSyncSerializer(changes["messages"], many=True).data,
+        "edited": CommunityMessageSyncSerializer(changes["edited"], many=True).data,
+        "cursor": changes["cursor"],
+        "has_more": changes["has_more"],
+    }
+
 class CreateRoomSerializer(serializers.Serializer):
     community_id = serializers.IntegerField(required=True)
\ No newline at end of file
@@ -0,0 +1,127 @@
+# chat/sync.py
+"""
+Delta sync of a room's history for reconnecting clients.
+
+A cursor stands for "every message inserted up to (inserted_at, id), and
+every edit up to ``synced_at``". ``delta`` answers with the
+messages after it, in insert order, the already-held messages edited
+since, and the cursor to send next time. Cursors are opaque to
+clients; one can also be started from the id of the last message a client
+holds.
+
+The cursor follows ``inserted_at``, which the database sets, rather than
+``timestamp``: a write-behind message is broadcast with its timestamp and
+only inserted up to a flush window later. The cursor never moves past rows
+younger than ``CHAT_SYNC_SETTLE`` seconds, so a transaction still in
+flight can't commit a row behind a cursor already handed out. Those rows,
+and write-behind messages still waiting in the stream, are sent anyway as
+the unsettled tail of ``messages``, and again with the next sync; clients
+dedupe by id.
+"""
+import base64
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from accounts.models import User
+from .models import CommunityMessage
+from . import write_behind
+
+
+def encode_cursor(inserted_at, message_id, synced_at):
+    raw = f"{inserted_at.isoformat()}|{message_id}|{synced_at.isoformat()}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """``(inserted_at, message_id, synced_at)``; raises ValueError if malformed."""
+    try:
+        inserted_at, message_id, synced_at = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        parsed = parse_datetime(inserted_at), uuid.UUID(message_id), parse_datetime(synced_at)
+    except (TypeError, ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
+    if None in parsed:
+        raise ValueError("Invalid cursor")
+    return parsed
+
+
+def cursor_after(room, message_id):
+    """
+    Cursor right after one of the room's messages, for a client that only
+    knows its last message. Returns None if the room has no such message.
+    """
+    message = CommunityMessage.objects.filter(room=room, id=message_id).values("id", "inserted_at").first()
+    if message is None:
+        return None
+    return encode_cursor(message["inserted_at"], message["id"], message["inserted_at"])
+
+
+def _unsettled(room, held, settled, limit):
+    """
+    Messages after the cursor too young to move it past: rows inserted
+    since ``settled``, then write-behind messages still in the stream.
+    """
+    messages = list(
+        CommunityMessage.objects.filter(room=room, inserted_at__gte=settled)
+        .exclude(held)
+        .select_related("sender")
+        .order_by("inserted_at", "id")[:limit]
+    )
+    if not settings.CHAT_WRITE_BEHIND:
+        return messages
+    seen = {str(message.id) for message in messages}
+    buffered = [data for data in write_behind.buffered_messages(room.id) if data["id"] not in seen]
+    senders = User.objects.in_bulk({data["sender_id"] for data in buffered})
+    messages += [
+        CommunityMessage(
+            id=uuid.UUID(data["id"]),
+            room=room,
+            sender=senders[data["sender_id"]],
+            content=data["content"],
+            media_url=data["media_url"],
+            message_type=data["message_type"],
+            timestamp=parse_datetime(data["timestamp"]),
+        )
+        for data in buffered
+        if data["sender_id"] in senders
+    ]
+    return messages[:limit]
+
+
+def delta(room, cursor, limit):
+    """
+    Changes in ``room`` after ``cursor``: a dict of ``messages`` (at most
+    ``limit`` settled ones in insert order, then the unsettled tail),
+    ``edited`` messages, the next ``cursor`` and ``has_more`` when the
+    settled messages were cut short.
+    """
+    inserted_at, message_id, synced_at = decode_cursor(cursor)
+    settled = timezone.now() - timedelta(seconds=settings.CHAT_SYNC_SETTLE)
+    in_room = CommunityMessage.objects.filter(room=room).select_related("sender")
+    held = Q(inserted_at__lt=inserted_at) | Q(inserted_at=inserted_at, id__lte=message_id)
+
+    messages = list(
+        in_room.filter(inserted_at__lt=settled)
+        .exclude(held)
+        .order_by("inserted_at", "id")[:limit + 1]
+    )
+    has_more = len(messages) > limit
+    messages = messages[:limit]
+    # Changes after ``settled`` are sent again next time rather than missed.
+    edited = list(in_room.filter(held, edited_at__gt=synced_at).order_by("inserted_at", "id"))
+
+    if messages:
+        inserted_at, message_id = messages[-1].inserted_at, messages[-1].id
+    if not has_more:
+        # Delivered now, but the cursor stays put so they come again next time.
+        messages += _unsettled(room, held, settled, limit)
+    return {
+        "messages": messages,
+        "edited": edited,
+        "cursor": encode_cursor(inserted_at, message_id, max(settled, synced_at)),
+        "has_more": has_more,
+    }
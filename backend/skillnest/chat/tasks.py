@@ -0,0 +1,180 @@
+# chat/tasks.py
+import json
+import socket
+import uuid
+from datetime import datetime, timezone as dt_timezone
+
+from celery import shared_task
+from celery.signals import worker_shutdown
+from django.conf import settings
+from django.db import DataError, IntegrityError, transaction
+from django.utils.dateparse import parse_datetime
+from django_redis import get_redis_connection
+from redis.exceptions import ResponseError
+
+from accounts.models import User
+from .models import CommunityChatRoom, CommunityMessage, UserPresence
+from . import presence
+from .write_behind import STREAM_KEY, GROUP, FLUSH_SCHEDULED_KEY, DEAD_LETTER_KEY, DEAD_LETTER_MAXLEN
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+def _ensure_group(redis):
+    try:
+        redis.xgroup_create(STREAM_KEY, GROUP, id="0", mkstream=True)
+    except ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+
+def _claim_stale(redis, consumer, size):
+    """Entries delivered to a writer that died before acknowledging them."""
+    _, entries, *_ = redis.xautoclaim(
+        STREAM_KEY, GROUP, consumer,
+        min_idle_time=settings.CHAT_WRITE_BEHIND_CLAIM_IDLE_MS, start_id="0-0", count=size,
+    )
+    return entries
+
+
+def _read_new(redis, consumer, size):
+    response = redis.xreadgroup(GROUP, consumer, {STREAM_KEY: ">"}, count=size)
+    return response[0][1] if response else []
+
+
+def _persist(redis, entries):
+    messages, dead = [], []
+    for entry_id, fields in entries:
+        try:
+            messages.append((entry_id, _to_message(json.loads(fields[b"data"]))))
+        except (KeyError, TypeError, ValueError) as e:
+            dead.append((entry_id, fields, e))
+    dead += _insert(messages, {entry_id: fields for entry_id, fields in entries})
+
+    entry_ids = [entry_id for entry_id, _ in entries]
+    pipe = redis.pipeline(transaction=False)
+    for entry_id, fields, error in dead:
+        logger.warning("Dead-lettered chat stream entry %s: %s", entry_id, error)
+        pipe.xadd(
+            DEAD_LETTER_KEY,
+            {"data": fields.get(b"data", b""), "error": str(error)},
+            maxlen=DEAD_LETTER_MAXLEN, approximate=True,
+        )
+    pipe.xack(STREAM_KEY, GROUP, *entry_ids)
+    pipe.xdel(STREAM_KEY, *entry_ids)
+    pipe.execute()
+
+
+def _to_message(data):
+    timestamp = parse_datetime(data["timestamp"])
+    if timestamp is None:
+        raise ValueError("Invalid timestamp")
+    return CommunityMessage(
+        id=uuid.UUID(data["id"]),
+        room_id=data["room_id"],
+        sender_id=data["sender_id"],
+        content=data["content"],
+        media_url=data["media_url"],
+        message_type=data["message_type"],
+        timestamp=timestamp,
+    )
+
+
+def _insert(messages, fields):
+    """
+    Insert ``(entry_id, message)`` pairs. Returns ``(entry_id, fields,
+    error)`` for the rows the database rejected; anything else (e.g. the
+    database being down) propagates and leaves the batch pending.
+    """
+    # ignore_conflicts: a redelivered entry that was already inserted is a no-op.
+    try:
+        with transaction.atomic():
+            CommunityMessage.objects.bulk_create([m for _, m in messages], ignore_conflicts=True)
+        return []
+    except (IntegrityError, DataError):
+        pass
+    # A row whose room or sender was deleted meanwhile, or with a value the
+    # column rejects, must not block the rest of the batch forever; insert
+    # one by one and set the failures aside.
+    rejected = []
+    for entry_id, message in messages:
+        try:
+            with transaction.atomic():
+                CommunityMessage.objects.bulk_create([message], ignore_conflicts=True)
+        except (IntegrityError, DataError) as e:
+            rejected.append((entry_id, fields[entry_id], e))
+    return rejected
+
+
+@shared_task
+def persist_chat_messages():
+    """
+    Drain the chat write-behind stream: bulk-insert each batch, then XACK
+    and trim it. Returns the number of entries written.
+    """
+    redis = get_redis_connection("default")
+    redis.delete(FLUSH_SCHEDULED_KEY)
+    _ensure_group(redis)
+    consumer = socket.gethostname()
+    batch_size = settings.CHAT_WRITE_BEHIND_BATCH_SIZE
+    written = 0
+
+    stale = _claim_stale(redis, consumer, batch_size)
+    if stale:
+        _persist(redis, stale)
+        written += len(stale)
+
+    while True:
+        entries = _read_new(redis, consumer, batch_size)
+        if not entries:
+            break
+        _persist(redis, entries)
+        written += len(entries)
+        if len(entries) < batch_size:
+            break
+    return written
+
+
+@worker_shutdown.connect
+def flush_chat_messages_on_shutdown(**kwargs):
+    """Persist whatever is buffered before a worker goes away."""
+    if not settings.CHAT_WRITE_BEHIND:
+        return
+    try:
+        persist_chat_messages()
+    except Exception:
+        logger.exception("Could not flush chat messages on shutdown")
+
+
+@shared_task
+def snapshot_presence():
+    """
+    Persist Redis presence into ``UserPresence`` with one upsert, so
+    connects and disconnects never write to Postgres themselves.
+    """
+    online, offline = presence.snapshot()
+    seen = {**offline, **{user_id: last_seen for user_id, (_, last_seen) in online.items()}}
+    if not seen:
+        return 0
+    user_ids = set(User.objects.filter(id__in=seen).values_list("id", flat=True))
+    room_ids = set(CommunityChatRoom.objects.filter(
+        id__in={room_id for room_id, _ in online.values() if room_id}
+    ).values_list("id", flat=True))
+
+    rows = []
+    for user_id in user_ids:
+        room_id = online[user_id][0] if user_id in online else None
+        rows.append(UserPresence(
+            user_id=user_id,
+            is_online=user_id in online,
+            current_room_id=room_id if room_id in room_ids else None,
+            last_seen=datetime.fromtimestamp(seen[user_id], tz=dt_timezone.utc),
+        ))
+    UserPresence.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=["user"],
+        update_fields=["is_online", "current_room", "last_seen"],
+    )
+    return len(rows)
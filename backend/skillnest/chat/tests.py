@@ -1,3 +1,316 @@
-from django.test import TestCase
+import json
+import uuid
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django_redis import get_redis_connection
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from creator.models import Community
+from skillnest import frames
+from . import sync, unread, write_behind
+from .tasks import persist_chat_messages
+from .models import CommunityMessage, CommunityReadState
+
+
+class DeltaSyncTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.creator = User.objects.create_user(
+            username="creator", email="creator@example.com", password="pass12345", user_type="creator",
+        )
+        community = Community.objects.create(creator=cls.creator, name="Community")
+        cls.room = community.chat_room
+
+    def setUp(self):
+        self.redis = get_redis_connection("default")
+        self.redis.delete(write_behind.STREAM_KEY)
+        self.addCleanup(self.redis.delete, write_behind.STREAM_KEY)
+
+    def _message(self, content, age):
+        """A message inserted ``age`` seconds ago."""
+        at = timezone.now() - timedelta(seconds=age)
+        return CommunityMessage.objects.create(
+            room=self.room, sender=self.creator, content=content, timestamp=at, inserted_at=at,
+        )
+
+    def _start(self):
+        epoch = timezone.now() - timedelta(days=1)
+        return sync.encode_cursor(epoch, "00000000-0000-0000-0000-000000000000", epoch)
+
+    def test_cursor_round_trip(self):
+        at = timezone.now()
+        cursor = sync.encode_cursor(at, "7f0c5f4e-2f1a-4d8e-9d5e-0d9a4c1b2e3f", at)
+        inserted_at, message_id, synced_at = sync.decode_cursor(cursor)
+        self.assertEqual((inserted_at, str(message_id), synced_at), (at, "7f0c5f4e-2f1a-4d8e-9d5e-0d9a4c1b2e3f", at))
+        with self.assertRaises(ValueError):
+            sync.decode_cursor("not a cursor")
+
+    def test_pages_resume_from_the_cursor(self):
+        messages = [self._message(f"m{i}", 60 - i) for i in range(3)]
+
+        first = sync.delta(self.room, self._start(), 2)
+        self.assertEqual(first["messages"], messages[:2])
+        self.assertTrue(first["has_more"])
+
+        second = sync.delta(self.room, first["cursor"], 2)
+        self.assertEqual(second["messages"], messages[2:])
+        self.assertFalse(second["has_more"])
+        self.assertEqual(sync.delta(self.room, second["cursor"], 2)["messages"], [])
+
+    def test_edits_since_the_cursor_are_sent(self):
+        message = self._message("before", 60)
+        cursor = sync.delta(self.room, self._start(), 10)["cursor"]
+        CommunityMessage.objects.filter(pk=message.pk).update(
+            content="after", is_edited=True, edited_at=timezone.now(),
+        )
+
+        result = sync.delta(self.room, cursor, 10)
+        self.assertEqual([m.content for m in result["edited"]], ["after"])
+
+    def test_unsettled_tail_is_sent_without_moving_the_cursor(self):
+        settled = self._message("settled", 60)
+        fresh = self._message("fresh", 0)
+
+        result = sync.delta(self.room, self._start(), 10)
+        self.assertEqual(result["messages"], [settled, fresh])
+        inserted_at, message_id, _ = sync.decode_cursor(result["cursor"])
+        self.assertEqual(message_id, settled.id)
+
+        self.assertEqual(sync.delta(self.room, result["cursor"], 10)["messages"], [fresh])
+
+    @override_settings(CHAT_WRITE_BEHIND=True)
+    def test_buffered_messages_are_in_the_tail(self):
+        settled = self._message("settled", 60)
+        buffered = CommunityMessage(room=self.room, sender=self.creator, content="buffered")
+        self.redis.xadd(write_behind.STREAM_KEY, {"data": _serialize(buffered)})
+
+        result = sync.delta(self.room, self._start(), 10)
+        self.assertEqual([m.id for m in result["messages"]], [settled.id, buffered.id])
+
+
+@override_settings(CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}})
+class MessageEditTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.creator = User.objects.create_user(
+            username="creator", email="creator@example.com", password="pass12345", user_type="creator",
+        )
+        cls.member = User.objects.create_user(username="member", email="member@example.com", password="pass12345")
+        cls.community = Community.objects.create(creator=cls.creator, name="Community")
+        cls.community.members.add(cls.member)
+        cls.message = CommunityMessage.objects.create(
+            room=cls.community.chat_room, sender=cls.member, content="helo",
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse("chat:edit-community-message", args=[self.community.id, self.message.id])
+
+    def test_sender_edits_and_room_is_told(self):
+        layer = get_channel_layer()
+        channel = async_to_sync(layer.new_channel)()
+        async_to_sync(layer.group_add)(f"community_{self.community.chat_room.uuid}", channel)
+        self.client.force_authenticate(self.member)
+
+        response = self.client.patch(self.url, {"content": "hello"}, format="json")
+
+        self.assertEqual(response.status_code, 200)
+        self.message.refresh_from_db()
+        self.assertEqual((self.message.content, self.message.is_edited), ("hello", True))
+        self.assertIsNotNone(self.message.edited_at)
+        event = async_to_sync(layer.receive)(channel)
+        self.assertEqual(event["type"], "message_edited")
+
+    def test_only_the_sender_may_edit(self):
+        self.client.force_authenticate(self.creator)
+        response = self.client.patch(self.url, {"content": "hijacked"}, format="json")
+        self.assertEqual(response.status_code, 404)
+
+    def test_empty_edit_is_rejected(self):
+        self.client.force_authenticate(self.member)
+        response = self.client.patch(self.url, {"content": "  "}, format="json")
+        self.assertEqual(response.status_code, 400)
+
+
+class MarkAsReadTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.creator = User.objects.create_user(
+            username="creator", email="creator@example.com", password="pass12345", user_type="creator",
+        )
+        cls.member = User.objects.create_user(username="member", email="member@example.com", password="pass12345")
+        community = Community.objects.create(creator=cls.creator, name="Community")
+        community.members.add(cls.member)
+        cls.room = community.chat_room
+        now = timezone.now()
+        cls.messages = [
+            CommunityMessage.objects.create(
+                room=cls.room, sender=cls.creator, content=f"m{i}", timestamp=now - timedelta(minutes=3 - i),
+            )
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        self.redis = get_redis_connection("default")
+        self.redis.delete(unread.ROOM_TOTALS_KEY, unread.read_marks_key(self.member.id), write_behind.STREAM_KEY)
+        self.addCleanup(
+            self.redis.delete, unread.ROOM_TOTALS_KEY, unread.read_marks_key(self.member.id), write_behind.STREAM_KEY,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.member)
+        self.url = reverse("chat:mark-as-read", args=[self.room.uuid])
+
+    def _unread(self):
+        return unread.unread_counts(self.member, [self.room.id])[self.room.id]
+
+    def test_marks_up_to_the_last_shown_message(self):
+        response = self.client.post(self.url, {"last_message_id": str(self.messages[0].id)}, format="json")
+
+        self.assertEqual(response.status_code, 200)
+        state = CommunityReadState.objects.get(room=self.room, user=self.member)
+        self.assertEqual(state.last_read_at, self.messages[0].timestamp)
+        self.assertEqual(self._unread(), 2)
+        # The Redis counters and a recount from the database agree.
+        self.assertEqual(unread._count_from_db(self.member, [self.room.id])[self.room.id][1], 2)
+
+    def test_without_a_message_everything_is_read(self):
+        self.client.post(self.url, {}, format="json")
+        self.assertEqual(self._unread(), 0)
+
+    def test_unknown_message_is_rejected(self):
+        response = self.client.post(self.url, {"last_message_id": "not-a-uuid"}, format="json")
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(
+            self.url, {"last_message_id": "00000000-0000-0000-0000-000000000000"}, format="json",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(CommunityReadState.objects.exists())
+
+    @override_settings(CHAT_WRITE_BEHIND=True)
+    def test_buffered_message_can_be_the_last_shown(self):
+        buffered = CommunityMessage(room=self.room, sender=self.creator, content="buffered")
+        self.redis.xadd(write_behind.STREAM_KEY, {"data": _serialize(buffered)})
+
+        response = self.client.post(self.url, {"last_message_id": str(buffered.id)}, format="json")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(CommunityReadState.objects.get(user=self.member).last_read_at, buffered.timestamp)
+
+
+class WriteBehindTests(TransactionTestCase):
+    """Foreign keys are only checked on commit, so these need real transactions."""
+
+    def setUp(self):
+        self.redis = get_redis_connection("default")
+        self._clear_redis()
+        self.addCleanup(self._clear_redis)
+        patcher = mock.patch("chat.write_behind.schedule_flush")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.creator = User.objects.create_user(
+            username="creator", email="creator@example.com", password="pass12345", user_type="creator",
+        )
+        self.room = Community.objects.create(creator=self.creator, name="Community").chat_room
+
+    def _clear_redis(self):
+        self.redis.delete(write_behind.STREAM_KEY, write_behind.DEAD_LETTER_KEY, write_behind.FLUSH_SCHEDULED_KEY)
+
+    def _enqueue(self, content, **overrides):
+        message = CommunityMessage(id=uuid.uuid4(), room=self.room, sender=self.creator, content=content)
+        data = {**json.loads(_serialize(message)), **overrides}
+        write_behind.enqueue_message(data, redis=self.redis)
+        return message.id
+
+    def test_batch_is_inserted_and_drained(self):
+        ids = [self._enqueue(f"m{i}") for i in range(3)]
+
+        self.assertEqual(persist_chat_messages(), 3)
+
+        self.assertCountEqual(CommunityMessage.objects.values_list("id", flat=True), ids)
+        self.assertEqual(self.redis.xlen(write_behind.STREAM_KEY), 0)
+        self.assertEqual(self.redis.xlen(write_behind.DEAD_LETTER_KEY), 0)
+
+    def test_rejected_and_malformed_entries_are_dead_lettered(self):
+        kept = self._enqueue("kept")
+        self._enqueue("orphan", room_id=self.room.id + 1000)
+        self._enqueue("undated", timestamp="yesterday")
+        self.redis.xadd(write_behind.STREAM_KEY, {"data": "not json"})
+
+        persist_chat_messages()
+
+        self.assertEqual(list(CommunityMessage.objects.values_list("id", flat=True)), [kept])
+        self.assertEqual(self.redis.xlen(write_behind.DEAD_LETTER_KEY), 3)
+        self.assertEqual(self.redis.xlen(write_behind.STREAM_KEY), 0)
+
+    def test_redelivered_entries_are_inserted_once(self):
+        message_id = self._enqueue("once")
+        # Inserted, then the writer died before acknowledging.
+        with mock.patch("chat.tasks._persist", side_effect=RuntimeError), self.assertRaises(RuntimeError):
+            persist_chat_messages()
+        CommunityMessage.objects.create(id=message_id, room=self.room, sender=self.creator, content="once")
+
+        with self.settings(CHAT_WRITE_BEHIND_CLAIM_IDLE_MS=0):
+            persist_chat_messages()
+
+        self.assertEqual(CommunityMessage.objects.count(), 1)
+        self.assertEqual(self.redis.xlen(write_behind.DEAD_LETTER_KEY), 0)
+        self.assertEqual(self.redis.xlen(write_behind.STREAM_KEY), 0)
+
+
+class FrameEncodingTests(SimpleTestCase):
+    event = {
+        "type": "chat_message",
+        "message": {"id": "m1", "content": "hi", "sender": {"id": 1, "username": "ann"}, "extra": [{"status": "x"}]},
+    }
+    compacted = {"t": "chat_message", "m": {"i": "m1", "c": "hi", "s": {"i": 1, "n": "ann"}, "extra": [{"st": "x"}]}}
+
+    def _decode(self, text_data=None, bytes_data=None):
+        return frames.FramedConsumerMixin().decode_frame(text_data, bytes_data)
+
+    def test_legacy_json_keeps_verbose_keys(self):
+        self.assertEqual(json.loads(frames.encode(self.event, None)), self.event)
+
+    def test_compact_encodings_shorten_keys_at_any_depth(self):
+        self.assertEqual(json.loads(frames.encode(self.event, frames.COMPACT_JSON)), self.compacted)
+        self.assertNotIn(" ", frames.encode(self.event, frames.COMPACT_JSON))
+        self.assertEqual(self._decode(bytes_data=frames.encode(self.event, frames.MSGPACK)), self.compacted)
+
+    def test_compact_keys_are_unambiguous(self):
+        self.assertEqual(len(set(frames.COMPACT_KEYS.values())), len(frames.COMPACT_KEYS))
+
+    def test_preencoded_pieces_join_into_array_frames(self):
+        pieces = frames.preencode(self.event)
+        self.assertEqual(set(pieces), {frames.LEGACY, *frames.SUBPROTOCOLS})
+
+        _, bytes_data = frames.join([pieces[frames.MSGPACK]] * 2, frames.MSGPACK)
+        self.assertEqual(self._decode(bytes_data=bytes_data), [self.compacted] * 2)
+        text_data, _ = frames.join([pieces[frames.COMPACT_JSON]] * 2, frames.COMPACT_JSON)
+        self.assertEqual(self._decode(text_data=text_data), [self.compacted] * 2)
+
+    def test_undecodable_frames_are_none(self):
+        self.assertIsNone(self._decode(text_data="{not json"))
+        self.assertIsNone(self._decode(bytes_data=b"\xc1"))
+        self.assertIsNone(self._decode(bytes_data=frames.encode(self.event, frames.MSGPACK) + b"\x00"))
+
+
+def _serialize(message):
+    """A message as ``ChatConsumer.enqueue_message`` puts it in the stream."""
+    return json.dumps({
+        "id": str(message.id),
+        "room_id": message.room_id,
+        "sender_id": message.sender_id,
+        "content": message.content,
+        "media_url": message.media_url,
+        "message_type": message.message_type,
+        "timestamp": message.timestamp.isoformat(),
+    })
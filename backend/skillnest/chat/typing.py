@@ -0,0 +1,92 @@
+# chat/typing.py
+"""
+Throttled, coalesced typing indicators.
+
+Typing events are not forwarded one by one. Each accepted event refreshes
+the user's entry in the room's sorted set ``typing:room:<room_id>``
+(scored by when it lapses), and at most one consumer per room, the holder
+of ``typing:flush:<room_id>``, broadcasts the whole list of typing users
+every ``TYPING_FLUSH_INTERVAL`` while it changes. Users drop off the list
+``TYPING_TIMEOUT`` seconds after their last event, without a stop event.
+"""
+import time
+
+from django.conf import settings
+from django_redis import get_redis_connection
+
+
+def room_key(room_id):
+    return f"typing:room:{room_id}"
+
+
+def lock_key(room_id):
+    return f"typing:flush:{room_id}"
+
+
+def throttle_key(room_id, user_id):
+    return f"typing:throttle:{room_id}:{user_id}"
+
+
+def _member(user):
+    return f"{user.id}:{user.username}"
+
+
+def _lock_ms():
+    # Outlives a few flush ticks, so a flusher that died frees the room quickly.
+    return int(settings.TYPING_FLUSH_INTERVAL * 4000)
+
+
+def update(room_id, user, is_typing, redis=None):
+    """
+    Record a typing event. Returns True when the caller has become the
+    room's flusher and must run the flush loop. Start events beyond one per
+    ``TYPING_MIN_INTERVAL`` per user are dropped.
+    """
+    redis = redis or get_redis_connection("default")
+    if is_typing:
+        interval_ms = int(settings.TYPING_MIN_INTERVAL * 1000)
+        if not redis.set(throttle_key(room_id, user.id), 1, nx=True, px=interval_ms):
+            return False
+    pipe = redis.pipeline(transaction=False)
+    if is_typing:
+        pipe.zadd(room_key(room_id), {_member(user): time.time() + settings.TYPING_TIMEOUT})
+        pipe.expire(room_key(room_id), int(settings.TYPING_TIMEOUT) + 1)
+    else:
+        pipe.zrem(room_key(room_id), _member(user))
+        pipe.delete(throttle_key(room_id, user.id))
+    pipe.set(lock_key(room_id), 1, nx=True, px=_lock_ms())
+    return bool(pipe.execute()[-1])
+
+
+def active(room_id, redis=None):
+    """Users typing in the room right now, as ``[{"id", "username"}]``; keeps the flush lock."""
+    redis = redis or get_redis_connection("default")
+    pipe = redis.pipeline(transaction=False)
+    pipe.zremrangebyscore(room_key(room_id), "-inf", time.time())
+    pipe.zrange(room_key(room_id), 0, -1)
+    pipe.pexpire(lock_key(room_id), _lock_ms())
+    _, members, _ = pipe.execute()
+    users = []
+    for member in members:
+        user_id, username = member.decode().split(":", 1)
+        users.append({"id": int(user_id), "username": username})
+    return sorted(users, key=lambda u: u["id"])
+
+
+def release(room_id, keep_if_typing=True, redis=None):
+    """
+    Give up flushing the room. Unless the caller is going away
+    (``keep_if_typing=False``), returns False if someone started typing in
+    the meantime and the lock was taken back, so the caller keeps flushing.
+    """
+    redis = redis or get_redis_connection("default")
+    if not keep_if_typing:
+        redis.delete(lock_key(room_id))
+        return True
+    pipe = redis.pipeline(transaction=False)
+    pipe.delete(lock_key(room_id))
+    pipe.zcard(room_key(room_id))
+    _, typing_count = pipe.execute()
+    if typing_count and redis.set(lock_key(room_id), 1, nx=True, px=_lock_ms()):
+        return False
+    return True
@@ -0,0 +1,140 @@
+# chat/unread.py
+"""
+Unread chat counters in Redis.
+
+``chat:room_totals`` maps room id -> number of messages ever sent in the
+room; each message is one HINCRBY. ``chat:read_marks:<user_id>`` maps
+room id -> the room total when the user last read it, so a room's unread
+count is ``total - mark`` and a sidebar load is two HMGETs whatever the
+number of rooms. Senders' own marks move with their messages, so a user's
+own messages never count as unread.
+
+Both hashes are caches of ``CommunityReadState`` and the message table:
+counters that are missing (new deploy, eviction) are recomputed in one
+grouped query and re-seeded.
+"""
+from django.db.models import Count, DateTimeField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django_redis import get_redis_connection
+
+from .models import CommunityMessage, CommunityReadState
+
+import logging
+logger = logging.getLogger(__name__)
+
+ROOM_TOTALS_KEY = "chat:room_totals"
+READ_MARKS_TTL = 7 * 24 * 60 * 60
+
+# HINCRBY only a field that is already cached; a missing field is
+# recomputed from the database instead of starting from 1.
+_HINCRBY_IF_EXISTS = """
+if redis.call('hexists', KEYS[1], ARGV[1]) == 1 then
+    return redis.call('hincrby', KEYS[1], ARGV[1], ARGV[2])
+end
+return nil
+"""
+
+
+def read_marks_key(user_id):
+    return f"chat:read_marks:{user_id}"
+
+
+def record_message(room_id, sender_id, redis=None):
+    """Count a new message in ``room_id`` and keep it read for its sender."""
+    redis = redis or get_redis_connection("default")
+    script = redis.register_script(_HINCRBY_IF_EXISTS)
+    pipe = redis.pipeline(transaction=False)
+    script(keys=[ROOM_TOTALS_KEY], args=[room_id, 1], client=pipe)
+    script(keys=[read_marks_key(sender_id)], args=[room_id, 1], client=pipe)
+    pipe.execute()
+
+
+def _room_total(room_id, redis):
+    total = redis.hget(ROOM_TOTALS_KEY, room_id)
+    if total is not None:
+        return int(total)
+    total = CommunityMessage.objects.filter(room_id=room_id).count()
+    if not redis.hsetnx(ROOM_TOTALS_KEY, room_id, total):
+        total = int(redis.hget(ROOM_TOTALS_KEY, room_id))
+    return total
+
+
+def mark_room_read(room_id, user_id, read_at=None, redis=None):
+    """
+    Reset the user's unread counter for ``room_id`` to zero, or, given
+    ``read_at``, to the other members' messages sent after it.
+    """
+    redis = redis or get_redis_connection("default")
+    mark = _room_total(room_id, redis)
+    if read_at is not None:
+        mark -= (
+            CommunityMessage.objects.filter(room_id=room_id, timestamp__gt=read_at)
+            .exclude(sender_id=user_id)
+            .count()
+        )
+    pipe = redis.pipeline(transaction=False)
+    pipe.hset(read_marks_key(user_id), room_id, max(mark, 0))
+    pipe.expire(read_marks_key(user_id), READ_MARKS_TTL)
+    pipe.execute()
+
+
+def _count_from_db(user, room_ids):
+    """``{room_id: (total, unread)}`` for ``room_ids`` in one grouped query."""
+    last_read_at = Coalesce(
+        Subquery(
+            CommunityReadState.objects
+            .filter(room_id=OuterRef("room_id"), user=user)
+            .values("last_read_at")[:1]
+        ),
+        Value(CommunityReadState.NEVER_READ, output_field=DateTimeField()),
+    )
+    rows = (
+        CommunityMessage.objects
+        .filter(room_id__in=room_ids)
+        .order_by()
+        .values("room_id")
+        .annotate(
+            total=Count("id"),
+            unread=Count("id", filter=Q(timestamp__gt=last_read_at) & ~Q(sender=user)),
+        )
+    )
+    counts = dict.fromkeys(room_ids, (0, 0))
+    counts.update((row["room_id"], (row["total"], row["unread"])) for row in rows)
+    return counts
+
+
+def unread_counts(user, room_ids):
+    """Return ``{room_id: unread}`` for ``user``, served from Redis where cached."""
+    room_ids = list(room_ids)
+    if not room_ids:
+        return {}
+    redis = get_redis_connection("default")
+    pipe = redis.pipeline(transaction=False)
+    pipe.hmget(ROOM_TOTALS_KEY, room_ids)
+    pipe.hmget(read_marks_key(user.id), room_ids)
+    totals, marks = pipe.execute()
+
+    counts, missing = {}, {}
+    for room_id, total, mark in zip(room_ids, totals, marks):
+        if total is None or mark is None:
+            missing[room_id] = total
+        else:
+            counts[room_id] = max(int(total) - int(mark), 0)
+    if not missing:
+        return counts
+
+    # Recount the rooms Redis doesn't know and re-seed both hashes, so the
+    # next load of these rooms is served from Redis.
+    seeds = {}
+    pipe = redis.pipeline(transaction=False)
+    for room_id, (total, unread) in _count_from_db(user, list(missing)).items():
+        counts[room_id] = unread
+        if missing[room_id] is None:
+            pipe.hsetnx(ROOM_TOTALS_KEY, room_id, total)
+        else:
+            total = int(missing[room_id])
+        seeds[room_id] = max(total - unread, 0)
+    pipe.hset(read_marks_key(user.id), mapping=seeds)
+    pipe.expire(read_marks_key(user.id), READ_MARKS_TTL)
+    pipe.execute()
+    return counts
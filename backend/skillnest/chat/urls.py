@@ -1,17 +1,21 @@
 from django.urls import path
-from . views import CommunityChatRoomDetailView, CommunityMessagesView, send_community_message, CommunityChatMembersView, CreateMeetingRoomView,ActiveMeetingView     
-from .views import translate_text,unread_message_count,mark_as_read
+from . views import CommunityChatRoomDetailView, CommunityMessagesView, CommunityMessagesSyncView, send_community_message, CommunityChatMembersView, CommunityOnlineMembersView, CreateMeetingRoomView,ActiveMeetingView     
+from .views import translate_text,unread_message_count,unread_message_counts,mark_as_read,edit_community_message
 app_name = "chat"
 
 urlpatterns = [
     path("communities/<int:community_id>/chat-room/", CommunityChatRoomDetailView.as_view(), name="community-chat-room"),
     path("communities/<int:community_id>/messages/", CommunityMessagesView.as_view(), name="community-messages"),
+    path("communities/<int:community_id>/messages/sync/", CommunityMessagesSyncView.as_view(), name="community-messages-sync"),
     path("communities/<int:community_id>/messages/send/", send_community_message, name="send-community-message"),
+    path("communities/<int:community_id>/messages/<uuid:message_id>/", edit_community_message, name="edit-community-message"),
     # path("communities/<int:community_id>/messages/<int:message_id>/read/", mark_message_read, name="mark-community-message-read"),
     path("communities/<int:community_id>/members/", CommunityChatMembersView.as_view(), name="community-chat-members"),
+    path("communities/<int:community_id>/members/online/", CommunityOnlineMembersView.as_view(), name="community-chat-online-members"),
     path("create/meet-room/", CreateMeetingRoomView.as_view(), name="create-room"),
     path("active-meeting/<int:community_id>/", ActiveMeetingView.as_view(), name="active-meeting"),
     path("translate/", translate_text,name="translate-text"), 
+    path("community/unread_counts/", unread_message_counts,name="unread-message-counts"),
     path("community/<uuid:room_uuid>/unread_count", unread_message_count,name="unread-message-count"), 
     path("community/<uuid:room_uuid>/mark_as_read/", mark_as_read,name="mark-as-read"), 
 ]
\ No newline at end of file
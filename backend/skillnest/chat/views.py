@@ -6,12 +6,15 @@ from django.shortcuts import get_object_or_404
 from django.db.models import Q
 from accounts.models import User
 from creator.models import Community
-from .models import CommunityChatRoom, CommunityMessage, CommunityMessageRead
+from creator import membership
+from .models import CommunityChatRoom, CommunityMessage, CommunityReadState
 from .serializers import (
     CommunityChatRoomSerializer,
     CommunityMessageSerializer,
+    CommunityMessageSyncSerializer,
     UserSerializer,
     CreateRoomSerializer,
+    serialize_delta,
 )
 from rest_framework.pagination import CursorPagination
 import uuid
@@ -19,12 +22,18 @@ import jwt
 from datetime import datetime, timedelta
 from django.conf import settings
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from . models import Meeting
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
 from .utils.zego_token import generate_zego_token
+from skillnest.frames import preencode
+from . import unread as unread_counters
+from . import presence
+from . import sync as delta_sync
+from . import write_behind
 import uuid
 import json
 import hmac
@@ -66,7 +75,7 @@ class CommunityChatRoomDetailView(generics.RetrieveAPIView):
         community = get_object_or_404(Community, id=community_id)
 
         user = self.request.user
-        if not (community.creator == user or community.members.filter(id=user.id).exists()):
+        if not membership.is_member(community.id, user.id):
             self.permission_denied(self.request, message="Not a member of this community")
 
         return get_or_create_chat_room(community, user)
@@ -90,7 +99,7 @@ class CommunityMessagesView(generics.ListAPIView):
 
         room = get_or_create_chat_room(community, user)
 
-        if not (community.creator == user or community.members.filter(id=user.id).exists()):
+        if not membership.is_member(community.id, user.id):
             return CommunityMessage.objects.none()
 
         return (
@@ -100,6 +109,40 @@ class CommunityMessagesView(generics.ListAPIView):
         )
 
 
+class CommunityMessagesSyncView(APIView):
+    """
+    Everything that changed in a community chat since a client last synced:
+    ``?cursor=`` from the previous response, or ``?after=<message id>`` to
+    start from the last message the client holds. Call again with the new
+    cursor while ``has_more`` is true.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, community_id):
+        community = get_object_or_404(Community, id=community_id)
+        if not membership.is_member(community.id, request.user.id):
+            return Response({"error": "Not a member of this community"}, status=status.HTTP_403_FORBIDDEN)
+        room = get_or_create_chat_room(community, request.user)
+
+        cursor = request.query_params.get("cursor")
+        after = request.query_params.get("after")
+        if not cursor and after:
+            try:
+                cursor = delta_sync.cursor_after(room, uuid.UUID(after))
+            except ValueError:
+                cursor = None
+            if cursor is None:
+                return Response({"error": "Unknown message"}, status=status.HTTP_400_BAD_REQUEST)
+        if not cursor:
+            return Response({"error": "cursor or after is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            changes = delta_sync.delta(room, cursor, settings.CHAT_SYNC_LIMIT)
+        except ValueError:
+            return Response({"error": "Invalid cursor"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(serialize_delta(changes))
+
+
 #  3. Send a message to a community chat
 @api_view(["POST"])
 @permission_classes([permissions.IsAuthenticated])
@@ -108,7 +151,7 @@ def send_community_message(request, community_id):
     room = community.chat_room
 
     user = request.user
-    if not (community.creator == user or community.members.filter(id=user.id).exists()):
+    if not membership.is_member(community.id, user.id):
         return Response(
             {"error": "Not a member of this community"},
             status=status.HTTP_403_FORBIDDEN,
@@ -135,11 +178,45 @@ def send_community_message(request, community_id):
         media_url=media_url,
         message_type=message_type,
     )
+    unread_counters.record_message(room.id, user.id)
 
     serializer = CommunityMessageSerializer(message)
     return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
+@api_view(["PATCH"])
+@permission_classes([permissions.IsAuthenticated])
+def edit_community_message(request, community_id, message_id):
+    """
+    Edit the text of one of the user's own messages. Connected clients get a
+    ``message_edited`` event; reconnecting ones get it from delta sync.
+    """
+    community = get_object_or_404(Community, id=community_id)
+    if not membership.is_member(community.id, request.user.id):
+        return Response({"error": "Not a member of this community"}, status=status.HTTP_403_FORBIDDEN)
+    message = get_object_or_404(
+        CommunityMessage.objects.select_related("sender"),
+        id=message_id, room__community=community, sender=request.user,
+    )
+
+    content = request.data.get("content")
+    content = content.strip() if isinstance(content, str) else ""
+    if not content and not message.media_url:
+        return Response({"error": "Message cannot be empty"}, status=status.HTTP_400_BAD_REQUEST)
+
+    message.content = content
+    message.is_edited = True
+    message.edited_at = timezone.now()
+    message.save(update_fields=["content", "is_edited", "edited_at"])
+
+    data = CommunityMessageSyncSerializer(message).data
+    async_to_sync(get_channel_layer().group_send)(
+        f"community_{community.chat_room.uuid}",
+        {"type": "message_edited", "frames": preencode({"type": "message_edited", "message": data})},
+    )
+    return Response(data)
+
+
 # ✅ 4. Mark message as read
 # @api_view(["POST"])
 # @permission_classes([permissions.IsAuthenticated])
@@ -159,20 +236,48 @@ def send_community_message(request, community_id):
 
 #     return Response({"success": True, "message": "All messages marked as read"})
 
+def _message_timestamp(room, message_id):
+    """Timestamp of one of the room's messages, saved or still in the write-behind stream."""
+    timestamp = CommunityMessage.objects.filter(room=room, id=message_id).values_list("timestamp", flat=True).first()
+    if timestamp is None and settings.CHAT_WRITE_BEHIND:
+        timestamp = next(
+            (
+                parse_datetime(message["timestamp"])
+                for message in write_behind.buffered_messages(room.id)
+                if message["id"] == str(message_id)
+            ),
+            None,
+        )
+    return timestamp
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def mark_as_read(request, room_uuid):
+    """
+    Mark the room read up to ``last_message_id``, the newest message the
+    client has shown, so messages that arrived after it stay unread.
+    Without it, everything sent so far is marked read.
+    """
     room = get_object_or_404(CommunityChatRoom, uuid=room_uuid)
-    CommunityMessageRead.objects.filter(
-        user=request.user,
-        message__room=room
-    ).delete()  # avoid duplicates
-
-    messages = CommunityMessage.objects.filter(room=room)
-    CommunityMessageRead.objects.bulk_create(
-        CommunityMessageRead(message=m, user=request.user)
-        for m in messages
+    last_message_id = request.data.get("last_message_id")
+    if last_message_id is None:
+        read_at = None
+    else:
+        try:
+            read_at = _message_timestamp(room, uuid.UUID(str(last_message_id)))
+        except ValueError:
+            read_at = None
+        if read_at is None:
+            return Response({"error": "Unknown message"}, status=status.HTTP_400_BAD_REQUEST)
+    # One upsert of the user's read mark, however long the room history is.
+    CommunityReadState.objects.bulk_create(
+        [CommunityReadState(room=room, user=request.user, last_read_at=read_at or timezone.now())],
+        update_conflicts=True,
+        unique_fields=["room", "user"],
+        update_fields=["last_read_at"],
     )
+    unread_counters.mark_room_read(room.id, request.user.id, read_at=read_at)
     return Response({"status": "ok"})
 
 
@@ -180,12 +285,26 @@ def mark_as_read(request, room_uuid):
 @permission_classes([IsAuthenticated])
 def unread_message_count(request, room_uuid):
     room = get_object_or_404(CommunityChatRoom, uuid=room_uuid)
-    unread = room.messages.exclude(
-        reads__user=request.user
-    ).count()
+    unread = unread_counters.unread_counts(request.user, [room.id])[room.id]
     return Response({"unread_count": unread})
 
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def unread_message_counts(request):
+    """Unread counts for every chat room the user belongs to, keyed by room uuid."""
+    user = request.user
+    rooms = dict(
+        CommunityChatRoom.objects
+        .filter(Q(community__creator=user) | Q(community__members=user))
+        .order_by()
+        .distinct()
+        .values_list("id", "uuid")
+    )
+    counts = unread_counters.unread_counts(user, rooms)
+    return Response({str(rooms[room_id]): unread for room_id, unread in counts.items()})
+
+
 # ✅ 5. List community chat members
 class CommunityChatMembersView(generics.ListAPIView):
     serializer_class = UserSerializer
@@ -196,14 +315,26 @@ class CommunityChatMembersView(generics.ListAPIView):
         community = get_object_or_404(Community, id=community_id)
 
         user = self.request.user
-        if not (community.creator == user or community.members.filter(id=user.id).exists()):
+        if not membership.is_member(community.id, user.id):
             return User.objects.none()
 
         return User.objects.filter(
-            Q(id=community.creator.id) | Q(id__in=community.members.all())
+            Q(id=community.creator_id) | Q(id__in=community.members.all())
         ).distinct()
 
 
+class CommunityOnlineMembersView(APIView):
+    """Members currently connected to the community chat, from Redis presence."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, community_id):
+        if not membership.is_member(community_id, request.user.id):
+            return Response({"error": "Not a member of this community"}, status=status.HTTP_403_FORBIDDEN)
+        room = get_object_or_404(CommunityChatRoom.objects.only("id"), community_id=community_id)
+        online = User.objects.filter(id__in=presence.online_user_ids(room.id))
+        return Response({"online": UserSerializer(online, many=True).data})
+
+
 # In your Django views.py or wherever you have CreateMeetingRoomView
 
 
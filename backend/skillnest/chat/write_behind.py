@@ -0,0 +1,65 @@
+# chat/write_behind.py
+"""
+Write-behind persistence for chat messages (``CHAT_WRITE_BEHIND``).
+
+The consumer assigns the message UUID and timestamp, broadcasts at once
+and appends the row to the ``chat:messages:stream`` Redis stream.
+``chat.tasks.persist_chat_messages`` reads the stream through the
+``chat-writers`` consumer group, bulk-inserts each batch and only then
+XACKs it, so a worker that dies mid-batch leaves the entries pending to be
+claimed by the next run: delivery is at-least-once and the insert is
+idempotent on the message id. Entries that can never be inserted (bad
+JSON, a value the column rejects) are moved to ``chat:messages:dead`` and
+acknowledged, so they can't hold up the stream.
+"""
+import json
+
+from django.conf import settings
+from django_redis import get_redis_connection
+
+import logging
+logger = logging.getLogger(__name__)
+
+STREAM_KEY = "chat:messages:stream"
+GROUP = "chat-writers"
+FLUSH_SCHEDULED_KEY = "chat:messages:flush_scheduled"
+DEAD_LETTER_KEY = "chat:messages:dead"
+DEAD_LETTER_MAXLEN = 10_000
+# Newest stream entries ``buffered_messages`` looks through; the stream is
+# normally drained every flush window, so this only bounds a writer outage.
+BUFFER_SCAN_LIMIT = 5000
+
+
+def enqueue_message(message, redis=None):
+    """Append one serialized ``CommunityMessage`` row to the write-behind stream."""
+    redis = redis or get_redis_connection("default")
+    redis.xadd(STREAM_KEY, {"data": json.dumps(message)})
+    schedule_flush(redis)
+
+
+def buffered_messages(room_id, redis=None):
+    """Serialized messages of ``room_id`` still in the stream, oldest first."""
+    redis = redis or get_redis_connection("default")
+    messages = []
+    for _, fields in redis.xrevrange(STREAM_KEY, count=BUFFER_SCAN_LIMIT):
+        try:
+            message = json.loads(fields[b"data"])
+        except (KeyError, ValueError):
+            continue
+        if message.get("room_id") == room_id:
+            messages.append(message)
+    return messages[::-1]
+
+
+def schedule_flush(redis=None):
+    from .tasks import persist_chat_messages
+
+    redis = redis or get_redis_connection("default")
+    window = settings.CHAT_WRITE_BEHIND_WINDOW
+    if redis.set(FLUSH_SCHEDULED_KEY, 1, nx=True, ex=window * 10):
+        try:
+            persist_chat_messages.apply_async(countdown=window)
+        except Exception:
+            # The periodic run in CELERY_BEAT_SCHEDULE drains the stream.
+            redis.delete(FLUSH_SCHEDULED_KEY)
+            logger.exception("Could not schedule chat message flush")
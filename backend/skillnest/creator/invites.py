@@ -0,0 +1,99 @@
+# creator/invites.py
+"""
+Bulk community invites.
+
+``invite_users`` invites any number of users in a fixed number of
+queries: one to find existing members, one to find existing invites, one
+UPDATE reopening declined (or accepted-then-left) invites and one INSERT
+... ON CONFLICT DO NOTHING for the rest, backed by the
+``unique_community_invite`` constraint. Only rows this call actually
+reopened or inserted count as invited; users who got a pending invite from
+a concurrent call meanwhile are reported as already invited. Invitees are
+notified through the notification outbox in a single batch once the
+transaction commits.
+"""
+import time
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from notification.utils import enqueue_notifications
+from .models import Community, CommunityInvite
+
+# RETURNING only yields the rows this statement inserted, unlike
+# bulk_create(ignore_conflicts=True), which can't tell them apart.
+_INSERT_INVITES = """
+INSERT INTO {table} (community_id, invited_by_id, invited_user_id, status, created_at)
+SELECT %s, %s, invited_user_id, 'pending', now()
+FROM unnest(%s::bigint[]) AS invited_user_id
+ON CONFLICT ON CONSTRAINT unique_community_invite DO NOTHING
+RETURNING invited_user_id
+"""
+
+
+def _insert_invites(community, invited_by, user_ids):
+    if not user_ids:
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            _INSERT_INVITES.format(table=connection.ops.quote_name(CommunityInvite._meta.db_table)),
+            [community.id, invited_by.id, list(user_ids)],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def invite_users(community, invited_by, users):
+    """
+    Invite ``users`` to ``community``. Returns a dict of user lists:
+    ``invited``, ``already_member`` (including the creator) and
+    ``already_invited`` (a pending invite exists).
+    """
+    users = {user.id: user for user in users}
+    member_ids = set(
+        Community.members.through.objects.filter(
+            community_id=community.id, user_id__in=users,
+        ).values_list("user_id", flat=True)
+    )
+    member_ids.add(community.creator_id)
+    candidates = [user_id for user_id in users if user_id not in member_ids]
+    statuses = dict(
+        CommunityInvite.objects.filter(
+            community=community, invited_user_id__in=candidates,
+        ).values_list("invited_user_id", "status")
+    )
+    closed = [user_id for user_id in candidates if statuses.get(user_id) not in (None, "pending")]
+    new = [user_id for user_id in candidates if user_id not in statuses]
+
+    with transaction.atomic():
+        reopened = []
+        if closed:
+            # Lock the rows so a concurrent call reopening the same invite
+            # waits and then sees it pending.
+            reopened = list(
+                CommunityInvite.objects.select_for_update()
+                .filter(community=community, invited_user_id__in=closed)
+                .exclude(status="pending")
+                .values_list("invited_user_id", flat=True)
+            )
+            CommunityInvite.objects.filter(community=community, invited_user_id__in=reopened).update(
+                status="pending", invited_by=invited_by, created_at=timezone.now(),
+            )
+        invited = set(reopened) | set(_insert_invites(community, invited_by, new))
+        queued_at = time.time()
+        transaction.on_commit(lambda: enqueue_notifications([
+            {
+                "sender_id": invited_by.id,
+                "recipient_id": user_id,
+                "notif_type": "invite",
+                "post_id": None,
+                "community_id": community.id,
+                "queued_at": queued_at,
+            }
+            for user_id in invited
+        ]))
+
+    return {
+        "invited": [users[user_id] for user_id in candidates if user_id in invited],
+        "already_member": [users[user_id] for user_id in users if user_id in member_ids],
+        "already_invited": [users[user_id] for user_id in candidates if user_id not in invited],
+    }
@@ -0,0 +1,88 @@
+# creator/membership.py
+"""
+Community access checks served from Redis.
+
+``community:members:<id>`` is a set of the user ids allowed into a
+community (its creator and its members). It is loaded from the database
+on first use and dropped by ``forget`` once a change to the community or
+its members commits (see ``creator.signals``), so chat connections and
+chat views answer "creator or member?" with one SISMEMBER.
+
+``forget`` also bumps ``community:members:<id>:version``. A load notes the
+version before reading the database and only stores its snapshot if the
+version is unchanged, so a check that read the rows before a membership
+change committed can't put the old set back afterwards.
+"""
+from django_redis import get_redis_connection
+
+from .models import Community
+
+MEMBERS_TTL = 24 * 60 * 60
+
+# Ids per SADD; unpacking every id of a large community at once would
+# overflow the Lua stack.
+SADD_CHUNK = 1000
+
+# KEYS: set, version. ARGV: version seen before the load, ttl, chunk size, member ids.
+_STORE_IF_CURRENT = """
+if (redis.call('get', KEYS[2]) or '') ~= ARGV[1] then
+    return 0
+end
+redis.call('del', KEYS[1])
+local chunk = tonumber(ARGV[3])
+for i = 4, #ARGV, chunk do
+    redis.call('sadd', KEYS[1], unpack(ARGV, i, math.min(i + chunk - 1, #ARGV)))
+end
+redis.call('expire', KEYS[1], ARGV[2])
+return 1
+"""
+
+
+def members_key(community_id):
+    return f"community:members:{community_id}"
+
+
+def version_key(community_id):
+    return f"community:members:{community_id}:version"
+
+
+def _load(community_id, redis):
+    version = redis.get(version_key(community_id)) or b""
+    community = Community.objects.filter(id=community_id).values_list("creator_id", flat=True).first()
+    if community is None:
+        return set()
+    member_ids = {community, *Community.members.through.objects.filter(
+        community_id=community_id
+    ).values_list("user_id", flat=True)}
+    redis.register_script(_STORE_IF_CURRENT)(
+        keys=[members_key(community_id), version_key(community_id)],
+        args=[version, MEMBERS_TTL, SADD_CHUNK, *member_ids],
+    )
+    return member_ids
+
+
+def is_member(community_id, user_id):
+    """True if ``user_id`` created or belongs to the community."""
+    redis = get_redis_connection("default")
+    pipe = redis.pipeline(transaction=False)
+    pipe.sismember(members_key(community_id), user_id)
+    pipe.exists(members_key(community_id))
+    is_cached_member, loaded = pipe.execute()
+    if loaded:
+        return bool(is_cached_member)
+    return user_id in _load(community_id, redis)
+
+
+def forget(community_ids, redis=None):
+    """
+    Drop cached sets; the next check reloads them from the database. Call
+    it once the change has committed (``transaction.on_commit``).
+    """
+    if not community_ids:
+        return
+    redis = redis or get_redis_connection("default")
+    pipe = redis.pipeline()
+    for community_id in community_ids:
+        pipe.incr(version_key(community_id))
+        pipe.delete(members_key(community_id))
+    pipe.execute()
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.4 on 2026-10-18 13:12
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def _like_total(through, fk_name):
+    return Coalesce(
+        Subquery(
+            through.objects.filter(**{fk_name: OuterRef('pk')}).order_by()
+            .values(fk_name).annotate(total=Count('*')).values('total')
+        ),
+        0,
+    )
+
+
+def backfill_like_count(apps, schema_editor):
+    Post = apps.get_model('creator', 'Post')
+    Comment = apps.get_model('creator', 'Comment')
+    Post.objects.update(like_count=_like_total(Post.likes.through, 'post_id'))
+    Comment.objects.update(like_count=_like_total(Comment.likes.through, 'comment_id'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('creator', '0014_post_post_feed_keyset_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_like_count, migrations.RunPython.noop),
+    ]
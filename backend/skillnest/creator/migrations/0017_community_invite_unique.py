@@ -0,0 +1,47 @@
+# Generated by Django 5.2.4 on 2026-10-18 13:40
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Case, Count, IntegerField, Value, When
+
+
+def dedupe_invites(apps, schema_editor):
+    """
+    Keep one invite per (community, user) before the constraint goes on:
+    an accepted one if any, else a pending one, else the newest.
+    """
+    CommunityInvite = apps.get_model('creator', 'CommunityInvite')
+    duplicated = (
+        CommunityInvite.objects.order_by()
+        .values('community_id', 'invited_user_id')
+        .annotate(n=Count('id'))
+        .filter(n__gt=1)
+    )
+    preference = Case(
+        When(status='accepted', then=Value(0)),
+        When(status='pending', then=Value(1)),
+        default=Value(2),
+        output_field=IntegerField(),
+    )
+    for pair in duplicated.iterator():
+        invites = CommunityInvite.objects.filter(
+            community_id=pair['community_id'], invited_user_id=pair['invited_user_id'],
+        )
+        keep = invites.annotate(preference=preference).order_by('preference', '-id').values_list('id', flat=True)[0]
+        invites.exclude(id=keep).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('creator', '0016_search_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_invites, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='communityinvite',
+            constraint=models.UniqueConstraint(fields=('community', 'invited_user'), name='unique_community_invite'),
+        ),
+    ]
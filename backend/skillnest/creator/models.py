@@ -1,22 +1,85 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.db import models
+from django.db.models import Count, Exists, OuterRef, Prefetch, Subquery, Value
+from django.db.models.functions import Coalesce
 from django.shortcuts import get_object_or_404
 from accounts.models import Creator, User
 import datetime
 
+
+def _viewer_in(through, fk_name, viewer):
+    """Exists() subquery telling whether ``viewer`` has a ``through`` row (a like, a membership) for the outer row."""
+    if viewer is None or not viewer.is_authenticated:
+        return Value(False)
+    return Exists(through.objects.filter(**{fk_name: OuterRef('pk'), 'user_id': viewer.pk}))
+
+
+class CommentQuerySet(models.QuerySet):
+    def with_like_state(self, viewer=None):
+        """
+        Annotate ``viewer_has_liked`` in SQL and load the author, so
+        serializing a list of comments costs a fixed number of queries.
+        """
+        return (
+            self.select_related('user')
+            .annotate(
+                viewer_has_liked=_viewer_in(Comment.likes.through, 'comment_id', viewer),
+            )
+            .prefetch_related(Prefetch('likes', queryset=User.objects.only('id')))
+        )
+
+
+class PostQuerySet(models.QuerySet):
+    def for_feed(self, viewer=None):
+        """
+        Feed query layer used by the post list/detail views.
+
+        Like counts come from the denormalized ``like_count`` column and the
+        viewer's like state from an Exists annotation; comments are prefetched
+        with their authors and like state, so a page of N posts takes a
+        constant number of queries.
+        """
+        return (
+            self.select_related('user')
+            .annotate(
+                viewer_has_liked=_viewer_in(Post.likes.through, 'post_id', viewer),
+            )
+            .prefetch_related(
+                Prefetch('likes', queryset=User.objects.only('id')),
+                Prefetch('comments', queryset=Comment.objects.with_like_state(viewer)),
+            )
+        )
+
+
 class Post(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='posts')  
     image = models.URLField(blank=True, null=True,default=None)
     caption = models.TextField()
     created_at = models.DateTimeField(default=datetime.datetime.now)
     likes = models.ManyToManyField(User, blank=True, related_name='liked_posts')  
+    like_count = models.PositiveIntegerField(default=0)  # kept in sync by creator.signals
     is_course = models.BooleanField(default=False)
+    # Full-text search (api.views.SearchView); computed by Postgres on write.
+    search_vector = models.GeneratedField(
+        expression=SearchVector('caption', config='english'),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+
+    objects = PostQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Backs the keyset-paginated home feed ordered by (-created_at, -id).
+            models.Index(fields=['-created_at', '-id'], name='post_feed_keyset_idx'),
+            GinIndex(fields=['search_vector'], name='post_search_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         if self.user.user_type != "creator":
             raise ValueError("Only creators can create posts.")
         super().save(*args, **kwargs)
-    def like_count(self):
-        return self.likes.count()
 
     def __str__(self):
         return f"Creator: {self.caption}"
@@ -27,9 +90,10 @@ class Comment(models.Model):
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     likes = models.ManyToManyField(User, blank=True, related_name="liked_comments")
+    like_count = models.PositiveIntegerField(default=0)  # kept in sync by creator.signals
+
+    objects = CommentQuerySet.as_manager()
 
-    def like_count(self):
-        return self.likes.count()
     # # New: replies
     # parent = models.ForeignKey(
     #     "self",
@@ -72,6 +136,40 @@ class ReportPost(models.Model):
     def __str__(self):
         return f"Report by {self.reported_by.username} on Post {self.post.id}"
 
+class CommunityQuerySet(models.QuerySet):
+    def visible_to(self, user):
+        """Communities ``user`` created or belongs to, without a join that needs DISTINCT."""
+        return self.filter(
+            models.Q(creator=user)
+            | models.Q(id__in=Community.members.through.objects.filter(user=user).values('community_id'))
+        )
+
+    def for_listing(self, viewer=None, members_limit=0):
+        """
+        Lean listing query layer: creator and chat room joined in,
+        ``member_count`` and ``viewer_is_member`` annotated in SQL, and with
+        ``members_limit`` the first members of every community prefetched
+        into ``member_preview`` in one query, so a page of communities takes
+        two or three queries whatever its size.
+        """
+        through = Community.members.through
+        member_count = (
+            through.objects.filter(community_id=OuterRef('pk'))
+            .order_by().values('community_id').annotate(n=Count('*')).values('n')
+        )
+        queryset = self.select_related('creator', 'chat_room').annotate(
+            member_count=Coalesce(Subquery(member_count), 0),
+            viewer_is_member=_viewer_in(through, 'community_id', viewer),
+        )
+        if members_limit:
+            queryset = queryset.prefetch_related(Prefetch(
+                'members',
+                queryset=User.objects.only('id', 'username').order_by('id')[:members_limit],
+                to_attr='member_preview',
+            ))
+        return queryset
+
+
 # Community
 class Community(models.Model):
     creator = models.ForeignKey(
@@ -88,6 +186,22 @@ class Community(models.Model):
         blank=True
     )
     created_at = models.DateTimeField(auto_now_add=True)
+    # Full-text search (api.views.SearchView); computed by Postgres on write.
+    search_vector = models.GeneratedField(
+        expression=(
+            SearchVector('name', weight='A', config='english')
+            + SearchVector('description', weight='B', config='english')
+        ),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+
+    objects = CommunityQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_vector'], name='community_search_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -102,7 +216,13 @@ class CommunityInvite(models.Model):
         default="pending"
     )
     created_at = models.DateTimeField(auto_now_add=True)
-    
+
+    class Meta:
+        constraints = [
+            # One invite per user and community; re-inviting reopens it (creator.invites).
+            models.UniqueConstraint(fields=['community', 'invited_user'], name='unique_community_invite'),
+        ]
+
     def __str__(self):
         return f"Invite to {self.invited_user.email} for {self.community.name} by {self.invited_by.email}"
 
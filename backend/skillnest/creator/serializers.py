@@ -3,6 +3,7 @@ from .models import Post, Comment, Course,Feedback
 from accounts.models import User, Creator
 from .models import Community,CommunityInvite,ReportPost,Review
 from django.contrib.auth import get_user_model
+from .invites import invite_users
 import logging
 logger = logging.getLogger(__name__)
 
@@ -16,30 +17,38 @@ class UserSerializer(serializers.ModelSerializer):
 
 # --- Comment Serializer ---
 
-class CommentSerializer(serializers.ModelSerializer):
+class LikeStateMixin:
+    """
+    Reads the ``viewer_has_liked`` annotation added by ``Post.objects.for_feed``
+    and ``Comment.objects.with_like_state``. Falls back to a per-object query
+    for instances loaded without it.
+    """
+
+    def get_is_liked(self, obj):
+        viewer_has_liked = getattr(obj, 'viewer_has_liked', None)
+        if viewer_has_liked is not None:
+            return viewer_has_liked
+        request = self.context.get('request')
+        if request and request.user.is_authenticated:
+            return obj.likes.filter(id=request.user.id).exists()
+        return False
+
+
+class CommentSerializer(LikeStateMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
-    like_count = serializers.SerializerMethodField()
+    like_count = serializers.IntegerField(read_only=True)
     is_liked = serializers.SerializerMethodField()
     class Meta:
         model = Comment
         fields = ['id', 'user', 'content', 'created_at','likes',
                 'like_count', 'is_liked']
         read_only_fields = ['user', 'created_at', 'post', 'like_count', 'is_liked']
-        
-    def get_like_count(self, obj):
-        return obj.likes.count()
-
-    def get_is_liked(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return obj.likes.filter(id=request.user.id).exists()
-        return False
     
 # --- Post Serializer ---
-class PostSerializer(serializers.ModelSerializer):
+class PostSerializer(LikeStateMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     comments = CommentSerializer(many=True, read_only=True)
-    like_count = serializers.SerializerMethodField()
+    like_count = serializers.IntegerField(read_only=True)
     is_liked = serializers.SerializerMethodField()
 
     class Meta:
@@ -58,15 +67,6 @@ class PostSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['like_count', 'created_at', 'comments', 'is_liked']
 
-    def get_like_count(self, obj):
-        return obj.likes.count()
-
-    def get_is_liked(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return obj.likes.filter(id=request.user.id).exists()
-        return False
-
 # --- Course Serializer ---
 class CourseSerializer(serializers.ModelSerializer):
     post = PostSerializer(read_only=True)
@@ -77,19 +77,37 @@ class CourseSerializer(serializers.ModelSerializer):
 
 
 # community
+class UserIdsField(serializers.ManyRelatedField):
+    """``many=True`` user ids, looked up with one ``__in`` query instead of one per id."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+        try:
+            ids = {int(pk) for pk in data}
+        except (TypeError, ValueError):
+            self.child_relation.fail('incorrect_type', data_type='list item')
+        users = list(self.child_relation.get_queryset().filter(pk__in=ids))
+        missing = ids - {user.pk for user in users}
+        if missing:
+            self.child_relation.fail('does_not_exist', pk_value=min(missing))
+        return users
+
+
 class CommunitySerializer(serializers.ModelSerializer):
     creator_id = serializers.ReadOnlyField(source='creator.id')
     creator_username = serializers.ReadOnlyField(source='creator.username')
-    members = serializers.PrimaryKeyRelatedField(
-        many=True,
-        queryset=User.objects.all(),
+    members = UserIdsField(
+        child_relation=serializers.PrimaryKeyRelatedField(queryset=User.objects.all()),
         required=False
     )
     chat_room_uuid = serializers.SerializerMethodField()
 
     class Meta:
         model = Community
-        fields = ['id', 'creator', 'name', 'description', 'members', 'created_at','chat_room_uuid']
+        fields = ['id', 'creator', 'creator_id', 'creator_username', 'name', 'description', 'members', 'created_at','chat_room_uuid']
         read_only_fields = ['id', 'creator', 'created_at','chat_room_uuid']
 
     def create(self, validated_data):
@@ -108,18 +126,8 @@ class CommunitySerializer(serializers.ModelSerializer):
             description=validated_data.get('description', "")
         )
 
-        # ✅ 4. Create invite for each member
-        for invited_user in members:
-            # Prevent duplicate invites or self-invites
-            if invited_user == user:
-                continue
-            CommunityInvite.objects.get_or_create(
-                community=community,
-                invited_by=user,
-                invited_user=invited_user,
-                status='pending',
-                
-            )
+        # ✅ 4. Invite the members (self-invites and duplicates are skipped)
+        invite_users(community, user, members)
         return community
     def get_chat_room_uuid(self, obj):
         # return UUID only if chat room exists
@@ -127,6 +135,45 @@ class CommunitySerializer(serializers.ModelSerializer):
             return obj.chat_room.uuid
         return None
 
+
+MAX_MEMBERS_PREVIEW = 20
+
+
+def listing_options(request):
+    """
+    ``(lean, members_limit)`` from ``?lean=true&members=<n>``: lean listings
+    use ``CommunityListSerializer`` over ``Community.objects.for_listing``.
+    """
+    lean = request.query_params.get("lean", "").lower() in ("1", "true")
+    try:
+        members_limit = min(max(int(request.query_params.get("members", 0)), 0), MAX_MEMBERS_PREVIEW)
+    except ValueError:
+        members_limit = 0
+    return lean, members_limit
+
+
+class CommunityListSerializer(CommunitySerializer):
+    """
+    Lean listing form of a community: the member count and the viewer's
+    membership instead of every member id, plus up to ``members`` members
+    when asked for (the rest page through the members endpoint).
+    """
+    member_count = serializers.IntegerField(read_only=True)
+    is_member = serializers.BooleanField(source='viewer_is_member', read_only=True)
+    members_preview = serializers.SerializerMethodField()
+
+    class Meta(CommunitySerializer.Meta):
+        fields = [
+            'id', 'creator', 'creator_id', 'creator_username', 'name', 'description',
+            'member_count', 'is_member', 'members_preview', 'created_at', 'chat_room_uuid',
+        ]
+
+    def get_members_preview(self, obj):
+        preview = getattr(obj, 'member_preview', None)
+        if preview is None:
+            return None
+        return [{"id": user.id, "username": user.username} for user in preview]
+
 class CommunityInviteSerializer(serializers.ModelSerializer):
     community_name = serializers.CharField(source="community.name", read_only=True)
     invited_by_username = serializers.CharField(source="invited_by.username", read_only=True)
@@ -227,10 +274,10 @@ class FeedbackSerializer(serializers.ModelSerializer):
         validated_data.pop("community", None)
         return Feedback.objects.create(community=community, **validated_data)
 
-class PostDetailSerializer(serializers.ModelSerializer):
+class PostDetailSerializer(LikeStateMixin, serializers.ModelSerializer):
     author = UserSerializer(read_only=True)
     comments = CommentSerializer(many=True, read_only=True)
-    likes_count = serializers.IntegerField(source='likes.count', read_only=True)
+    likes_count = serializers.IntegerField(source='like_count', read_only=True)
     is_liked = serializers.SerializerMethodField()
     class Meta:
         model = Post
@@ -244,13 +291,4 @@ class PostDetailSerializer(serializers.ModelSerializer):
             'is_liked',
             'comments',
         ]
-        read_only_fields = ['id', 'author', 'created_at', 'likes_count', 'comments', 'is_liked']
-    
-    def get_like_count(self, obj):
-        return obj.likes.count()
-
-    def get_is_liked(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return obj.likes.filter(id=request.user.id).exists()
-        return False
\ No newline at end of file
+        read_only_fields = ['id', 'author', 'created_at', 'likes_count', 'comments', 'is_liked']
\ No newline at end of file
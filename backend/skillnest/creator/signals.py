@@ -1,40 +1,95 @@
-from creator.models import Community
-from django.db.models.signals import post_save, m2m_changed
+from creator.models import Community, Post, Comment
+from accounts.models import Creator
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_save, post_delete, m2m_changed
 from django.dispatch import receiver
 from chat.models import CommunityChatRoom
+from . import membership
 
 @receiver(post_save, sender=Community)
 def create_community_chatroom(sender, instance, created, **kwargs):
     """
     Automatically create a chat room when a new community is created.
+    Its members are the community's, so there is nothing to copy or sync.
     """
     if created:
-        chat_room = CommunityChatRoom.objects.create(
+        CommunityChatRoom.objects.create(
             community=instance,
             name=instance.name,
             description=instance.description,
             created_by=instance.creator
         )
-        # Add creator and initial members
-        chat_room.members.add(instance.creator, *instance.members.all())
 
 
 @receiver(m2m_changed, sender=Community.members.through)
-def sync_chatroom_members(sender, instance, action, pk_set, **kwargs):
+def sync_membership_cache(sender, instance, action, reverse, pk_set, **kwargs):
     """
-    Keep chatroom members in sync with community members.
+    Drop the Redis sets that ``creator.membership.is_member`` answers
+    access checks from once a membership change commits; a rolled-back
+    change leaves them alone.
     """
-    try:
-        chat_room = instance.chat_room
-    except CommunityChatRoom.DoesNotExist:
+    if reverse:
+        # user.communities.add/remove/clear(...): instance is the user.
+        if action == "pre_clear":
+            community_ids = list(instance.communities.values_list("id", flat=True))
+        elif action in ("post_add", "post_remove"):
+            community_ids = list(pk_set or ())
+        else:
+            return
+    elif action in ("post_add", "post_remove", "post_clear"):
+        community_ids = [instance.pk]
+    else:
         return
 
-    if action == "post_add":
-        # Add new members to chatroom
-        chat_room.members.add(*pk_set)
-    elif action == "post_remove":
-        # Remove members from chatroom
-        chat_room.members.remove(*pk_set)
-    elif action == "post_clear":
-        # Clear all members if community is cleared
-        chat_room.members.clear()
\ No newline at end of file
+    if community_ids:
+        transaction.on_commit(lambda: membership.forget(community_ids))
+
+
+@receiver(post_save, sender=Community)
+@receiver(post_delete, sender=Community)
+def drop_membership_cache(sender, instance, created=False, **kwargs):
+    # The creator is part of the cached set; reload it on any community change.
+    if not created:
+        transaction.on_commit(lambda: membership.forget([instance.pk]))
+
+
+def _update_counter(model, m2m_field, counter, instance, action, reverse, pk_set):
+    """
+    Apply an m2m add/remove/clear to a denormalized counter column with a
+    single F() UPDATE. Drift (e.g. removing a row that was never there) is
+    repaired by the ``reconcile_counters`` task.
+    """
+    decrement = Greatest(F(counter) - 1, 0)
+    if action == "pre_clear" and reverse:
+        # e.g. user.liked_posts.clear(): every related row loses one relation.
+        model.objects.filter(**{m2m_field: instance}).update(**{counter: decrement})
+    elif action == "post_clear" and not reverse:
+        model.objects.filter(pk=instance.pk).update(**{counter: 0})
+    elif action in ("post_add", "post_remove") and pk_set:
+        if reverse:
+            rows = model.objects.filter(pk__in=pk_set)
+            delta = 1
+        else:
+            rows = model.objects.filter(pk=instance.pk)
+            delta = len(pk_set)
+        if action == "post_add":
+            rows.update(**{counter: F(counter) + delta})
+        else:
+            rows.update(**{counter: Greatest(F(counter) - delta, 0)})
+
+
+@receiver(m2m_changed, sender=Post.likes.through)
+def update_post_like_count(sender, instance, action, reverse, pk_set, **kwargs):
+    _update_counter(Post, "likes", "like_count", instance, action, reverse, pk_set)
+
+
+@receiver(m2m_changed, sender=Comment.likes.through)
+def update_comment_like_count(sender, instance, action, reverse, pk_set, **kwargs):
+    _update_counter(Comment, "likes", "like_count", instance, action, reverse, pk_set)
+
+
+@receiver(m2m_changed, sender=Creator.followers.through)
+def update_follower_count(sender, instance, action, reverse, pk_set, **kwargs):
+    _update_counter(Creator, "followers", "follower_count", instance, action, reverse, pk_set)
@@ -0,0 +1,86 @@
+# creator/tasks.py
+from celery import shared_task
+from django.conf import settings
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django_redis import get_redis_connection
+
+from accounts.models import Creator
+from .models import Post, Comment
+from . import timelines
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def fan_out_post(post_id):
+    """Push a new post into its author's timeline and each follower's timeline."""
+    try:
+        post = Post.objects.only("id", "user_id", "created_at").get(id=post_id)
+    except Post.DoesNotExist:
+        return
+
+    redis = get_redis_connection("default")
+    timelines.push_to_author_timeline(post, redis=redis)
+
+    followers = timelines.follower_ids(post.user_id)
+    is_celebrity = followers.count() > settings.TIMELINE_FANOUT_MAX_FOLLOWERS
+    timelines.mark_celebrity(post.user_id, is_celebrity, redis=redis)
+    if is_celebrity:
+        # Followers pick this post up from the author timeline at read time.
+        timelines.push_to_timelines(post, [post.user_id], redis=redis)
+        return
+
+    batch = [post.user_id]
+    for follower_id in followers.iterator(chunk_size=settings.TIMELINE_FANOUT_BATCH_SIZE):
+        batch.append(follower_id)
+        if len(batch) >= settings.TIMELINE_FANOUT_BATCH_SIZE:
+            timelines.push_to_timelines(post, batch, redis=redis)
+            batch = []
+    if batch:
+        timelines.push_to_timelines(post, batch, redis=redis)
+
+
+@shared_task
+def follow_timeline(user_id, author_id):
+    timelines.add_author_posts(user_id, author_id)
+
+
+@shared_task
+def unfollow_timeline(user_id, author_id):
+    timelines.remove_author_posts(user_id, author_id)
+
+
+def _reconcile_counter(model, through, fk_name, counter):
+    """Rewrite ``counter`` for every row whose value differs from its m2m row count."""
+    actual = Coalesce(
+        Subquery(
+            through.objects
+            .filter(**{fk_name: OuterRef("pk")})
+            .order_by()
+            .values(fk_name)
+            .annotate(total=Count("*"))
+            .values("total")
+        ),
+        0,
+    )
+    drifted = list(
+        model.objects.annotate(actual=actual).exclude(**{counter: F("actual")}).values_list("pk", flat=True)
+    )
+    if drifted:
+        model.objects.filter(pk__in=drifted).update(**{counter: actual})
+    return len(drifted)
+
+
+@shared_task
+def reconcile_counters():
+    """Periodic job that repairs drift in the denormalized like/follower counters."""
+    repaired = {
+        "post_likes": _reconcile_counter(Post, Post.likes.through, "post_id", "like_count"),
+        "comment_likes": _reconcile_counter(Comment, Comment.likes.through, "comment_id", "like_count"),
+        "followers": _reconcile_counter(Creator, Creator.followers.through, "creator_id", "follower_count"),
+    }
+    if any(repaired.values()):
+        logger.warning("Repaired counter drift: %s", repaired)
+    return repaired
@@ -1,3 +1,385 @@
+import importlib
+from datetime import timedelta
+from unittest import mock
+
+from django.apps import apps
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django_redis import get_redis_connection
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from . import membership, toggles
+from .invites import invite_users
+from .models import Community, CommunityInvite, Post, Comment
+from .serializers import CommunitySerializer
+
+
+class PostFeedQueryCountTests(TestCase):
+    """The post feed must cost the same number of queries for any page size."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.creator = User.objects.create_user(
+            username="creator", email="creator@example.com", password="pass12345",
+            fullname="Creator", user_type="creator",
+        )
+        cls.learners = [
+            User.objects.create_user(
+                username=f"learner{i}", email=f"learner{i}@example.com", password="pass12345",
+                fullname=f"Learner {i}", user_type="learner",
+            )
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.learners[0])
+
+    def _create_posts(self, count):
+        for i in range(count):
+            post = Post.objects.create(user=self.creator, caption=f"post {i}")
+            post.likes.add(*self.learners)
+            for learner in self.learners:
+                comment = Comment.objects.create(post=post, user=learner, content="nice")
+                comment.likes.add(self.creator, learner)
+
+    def _count_feed_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("post-list-create"), {"limit": 50})
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response.data["results"]
+
+    def test_query_count_is_constant(self):
+        self._create_posts(2)
+        small_page_queries, _ = self._count_feed_queries()
+
+        self._create_posts(8)
+        large_page_queries, results = self._count_feed_queries()
+
+        self.assertEqual(len(results), 10)
+        self.assertEqual(small_page_queries, large_page_queries)
+
+    def test_annotations_match_like_state(self):
+        self._create_posts(1)
+        _, results = self._count_feed_queries()
+
+        post = results[0]
+        self.assertEqual(post["like_count"], 3)
+        self.assertTrue(post["is_liked"])
+        self.assertEqual(len(post["comments"]), 3)
+        for comment in post["comments"]:
+            self.assertEqual(comment["like_count"], 2)
+            self.assertEqual(comment["is_liked"], comment["user"]["id"] == self.learners[0].id)
+
+
+class MembershipCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.creator = User.objects.create_user(
+            username="creator", email="creator@example.com", password="pass12345", user_type="creator",
+        )
+        cls.members = [
+            User.objects.create_user(username=f"member{i}", email=f"member{i}@example.com", password="pass12345")
+            for i in range(5)
+        ]
+        cls.outsider = User.objects.create_user(username="outsider", email="outsider@example.com", password="pass12345")
+        cls.community = Community.objects.create(creator=cls.creator, name="Community")
+        cls.community.members.add(*cls.members)
+
+    def setUp(self):
+        self.redis = get_redis_connection("default")
+        self.addCleanup(self.redis.delete, membership.members_key(self.community.id))
+        membership.forget([self.community.id], self.redis)
+
+    def test_load_stores_every_member_in_chunks(self):
+        with mock.patch.object(membership, "SADD_CHUNK", 2):
+            self.assertTrue(membership.is_member(self.community.id, self.creator.id))
+
+        cached = {int(user_id) for user_id in self.redis.smembers(membership.members_key(self.community.id))}
+        self.assertEqual(cached, {self.creator.id, *(member.id for member in self.members)})
+        self.assertFalse(membership.is_member(self.community.id, self.outsider.id))
+
+    def test_load_racing_a_change_is_not_stored(self):
+        real_filter = Community.members.through.objects.filter
+
+        def filter_then_change(*args, **kwargs):
+            membership.forget([self.community.id], self.redis)
+            return real_filter(*args, **kwargs)
+
+        with mock.patch.object(Community.members.through.objects, "filter", side_effect=filter_then_change):
+            membership.is_member(self.community.id, self.creator.id)
+        self.assertFalse(self.redis.exists(membership.members_key(self.community.id)))
+
+
+class ToggleTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.creator = User.objects.create_user(
+            username="creator", email="creator@example.com", password="pass12345", user_type="creator",
+        )
+        cls.fans = [
+            User.objects.create_user(username=f"fan{i}", email=f"fan{i}@example.com", password="pass12345")
+            for i in range(2)
+        ]
+        cls.post = Post.objects.create(user=cls.creator, caption="post")
+
+    def _like_count(self):
+        return Post.objects.values_list("like_count", flat=True).get(pk=self.post.pk)
+
+    def _row_version(self):
+        """The post row's ctid, which any UPDATE of it moves."""
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT ctid::text FROM {Post._meta.db_table} WHERE id = %s", [self.post.pk])
+            return cursor.fetchone()[0]
+
+    def test_toggle_adds_then_removes(self):
+        on = toggles.toggle_post_like(self.post.id, self.fans[0].id)
+        self.assertEqual(on, toggles.ToggleResult(active=True, changed=True, count=1))
+        self.assertTrue(self.post.likes.filter(pk=self.fans[0].pk).exists())
+
+        off = toggles.toggle_post_like(self.post.id, self.fans[0].id)
+        self.assertEqual(off, toggles.ToggleResult(active=False, changed=True, count=0))
+        self.assertFalse(self.post.likes.exists())
+
+    def test_explicit_modes_are_idempotent(self):
+        toggles.toggle_post_like(self.post.id, self.fans[0].id, toggles.SET_ON)
+        again = toggles.toggle_post_like(self.post.id, self.fans[0].id, toggles.SET_ON)
+        self.assertEqual(again, toggles.ToggleResult(active=True, changed=False, count=1))
+
+        toggles.toggle_post_like(self.post.id, self.fans[0].id, toggles.SET_OFF)
+        again = toggles.toggle_post_like(self.post.id, self.fans[0].id, toggles.SET_OFF)
+        self.assertEqual(again, toggles.ToggleResult(active=False, changed=False, count=0))
+        self.assertEqual(self._like_count(), 0)
+
+    def test_counter_follows_each_user(self):
+        for fan in self.fans:
+            toggles.toggle_post_like(self.post.id, fan.id)
+        self.assertEqual(self._like_count(), 2)
+        self.assertEqual(toggles.toggle_post_like(self.post.id, self.fans[0].id).count, 1)
+        self.assertEqual(self._like_count(), self.post.likes.count())
+
+    def test_no_op_leaves_the_counter_row_alone(self):
+        toggles.toggle_post_like(self.post.id, self.fans[0].id)
+        # A drifted counter is reported as is, not rewritten by a no-op.
+        Post.objects.filter(pk=self.post.pk).update(like_count=7)
+        version = self._row_version()
+        result = toggles.toggle_post_like(self.post.id, self.fans[0].id, toggles.SET_ON)
+        self.assertEqual(result, toggles.ToggleResult(active=True, changed=False, count=7))
+        self.assertEqual(self._row_version(), version)
+
+    def test_counter_never_goes_negative(self):
+        self.post.likes.through.objects.create(post=self.post, user=self.fans[0])
+        Post.objects.filter(pk=self.post.pk).update(like_count=0)
+        self.assertEqual(toggles.toggle_post_like(self.post.id, self.fans[0].id).count, 0)
+
+
+class InviteUsersTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.creator = User.objects.create_user(
+            username="creator", email="creator@example.com", password="pass12345", user_type="creator",
+        )
+        cls.learners = [
+            User.objects.create_user(username=f"learner{i}", email=f"learner{i}@example.com", password="pass12345")
+            for i in range(4)
+        ]
+        cls.community = Community.objects.create(creator=cls.creator, name="Community")
+
+    def setUp(self):
+        patcher = mock.patch("creator.invites.enqueue_notifications")
+        self.enqueue = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _invite(self, users):
+        with self.captureOnCommitCallbacks(execute=True):
+            return invite_users(self.community, self.creator, users)
+
+    def _notified(self):
+        return sorted(entry["recipient_id"] for call in self.enqueue.call_args_list for entry in call.args[0])
+
+    def test_new_invites_are_inserted_and_notified_once_committed(self):
+        first, second = self.learners[:2]
+        with self.captureOnCommitCallbacks() as callbacks:
+            result = invite_users(self.community, self.creator, [first, second, first])
+        self.enqueue.assert_not_called()
+        for callback in callbacks:
+            callback()
+
+        self.assertCountEqual(result["invited"], [first, second])
+        self.assertEqual(
+            set(CommunityInvite.objects.values_list("invited_user_id", "status")),
+            {(first.id, "pending"), (second.id, "pending")},
+        )
+        self.assertEqual(self._notified(), sorted([first.id, second.id]))
+        self.assertEqual(self.enqueue.call_count, 1)
+
+    def test_creator_and_members_are_not_invited(self):
+        member = self.learners[0]
+        self.community.members.add(member)
+
+        result = self._invite([self.creator, member])
+
+        self.assertCountEqual(result["already_member"], [self.creator, member])
+        self.assertEqual(result["invited"], [])
+        self.assertFalse(CommunityInvite.objects.exists())
+        self.assertEqual(self._notified(), [])
+
+    def test_pending_invite_is_not_sent_again(self):
+        learner = self.learners[0]
+        self._invite([learner])
+        self.enqueue.reset_mock()
+
+        result = self._invite([learner])
+
+        self.assertEqual(result["already_invited"], [learner])
+        self.assertEqual(CommunityInvite.objects.count(), 1)
+        self.assertEqual(self._notified(), [])
+
+    def test_declined_invite_is_reopened(self):
+        learner, other_inviter = self.learners[0], self.learners[1]
+        invite = CommunityInvite.objects.create(
+            community=self.community, invited_by=other_inviter, invited_user=learner, status="declined",
+        )
+
+        result = self._invite([learner])
+
+        self.assertEqual(result["invited"], [learner])
+        invite.refresh_from_db()
+        self.assertEqual((invite.status, invite.invited_by_id), ("pending", self.creator.id))
+        self.assertEqual(CommunityInvite.objects.count(), 1)
+        self.assertEqual(self._notified(), [learner.id])
+
+    def test_query_count_does_not_grow_with_invitees(self):
+        CommunityInvite.objects.create(
+            community=self.community, invited_by=self.creator, invited_user=self.learners[0], status="declined",
+        )
+        # Members, invites, savepoint, lock, reopen, insert, release.
+        with self.assertNumQueries(7):
+            invite_users(self.community, self.creator, self.learners)
+
+
+class UserIdsFieldTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.creator = User.objects.create_user(
+            username="creator", email="creator@example.com", password="pass12345", user_type="creator",
+        )
+        cls.learners = [
+            User.objects.create_user(username=f"learner{i}", email=f"learner{i}@example.com", password="pass12345")
+            for i in range(3)
+        ]
+
+    def _validate(self, members):
+        serializer = CommunitySerializer(data={"name": "Community", "members": members})
+        serializer.is_valid()
+        return serializer
+
+    def test_ids_are_looked_up_together(self):
+        ids = [learner.id for learner in self.learners]
+        field = CommunitySerializer().fields["members"]
+        with self.assertNumQueries(1):
+            users = field.to_internal_value(ids + [str(ids[0])])
+        self.assertCountEqual(users, self.learners)
+
+    def test_missing_id_is_rejected(self):
+        missing = max(learner.id for learner in self.learners) + 1000
+        serializer = self._validate([self.learners[0].id, missing])
+        self.assertIn(str(missing), str(serializer.errors["members"]))
+
+    def test_non_list_and_bad_ids_are_rejected(self):
+        self.assertIn("members", self._validate("1,2").errors)
+        self.assertIn("members", self._validate(["abc"]).errors)
+
+
+class DedupeInvitesMigrationTests(TestCase):
+    """``dedupe_invites`` from migration 0017, run with the constraint dropped (rolled back after)."""
+
+    def setUp(self):
+        migration = importlib.import_module("creator.migrations.0017_community_invite_unique")
+        self.dedupe_invites = migration.dedupe_invites
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"ALTER TABLE {CommunityInvite._meta.db_table} DROP CONSTRAINT unique_community_invite"
+            )
+        self.creator = User.objects.create_user(
+            username="creator", email="creator@example.com", password="pass12345", user_type="creator",
+        )
+        self.community = Community.objects.create(creator=self.creator, name="Community")
+        self.learners = [
+            User.objects.create_user(username=f"learner{i}", email=f"learner{i}@example.com", password="pass12345")
+            for i in range(3)
+        ]
+
+    def _invite(self, learner, status):
+        return CommunityInvite.objects.create(
+            community=self.community, invited_by=self.creator, invited_user=learner, status=status,
+        )
+
+    def test_keeps_accepted_then_pending_then_newest(self):
+        self._invite(self.learners[0], "pending")
+        accepted = self._invite(self.learners[0], "accepted")
+        self._invite(self.learners[0], "declined")
+        pending = self._invite(self.learners[1], "pending")
+        self._invite(self.learners[1], "declined")
+        self._invite(self.learners[2], "declined")
+        newest = self._invite(self.learners[2], "declined")
+        single = CommunityInvite.objects.create(
+            community=Community.objects.create(creator=self.creator, name="Other"),
+            invited_by=self.creator, invited_user=self.learners[0],
+        )
+
+        self.dedupe_invites(apps, None)
+
+        self.assertCountEqual(
+            CommunityInvite.objects.values_list("id", flat=True), [accepted.id, pending.id, newest.id, single.id],
+        )
+
+
+class FeedPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.creator = User.objects.create_user(
+            username="creator", email="creator@example.com", password="pass12345", user_type="creator",
+        )
+        now = timezone.now()
+        # Two runs of posts sharing a created_at, which an offset among equal values would straddle.
+        cls.posts = [
+            Post.objects.create(user=cls.creator, caption=f"post {i}", created_at=now - timedelta(minutes=i // 3))
+            for i in range(7)
+        ]
+
+    def _walk(self, page_size):
+        seen, url = [], reverse("post-feed")
+        params = {"page_size": page_size}
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data["results"]), page_size)
+            seen += [post["id"] for post in response.data["results"]]
+            url, params = response.data["next"], None
+        return seen
+
+    def test_pages_follow_created_at_then_id(self):
+        expected = [post.id for post in sorted(self.posts, key=lambda p: (p.created_at, p.id), reverse=True)]
+        for page_size in (1, 2, 4):
+            self.assertEqual(self._walk(page_size), expected)
+
+    def test_post_added_while_paging_does_not_shift_pages(self):
+        expected = self._walk(7)
+        first = self.client.get(reverse("post-feed"), {"page_size": 3}).data
+        Post.objects.create(user=self.creator, caption="newer")
+        second = self.client.get(first["next"]).data
+        self.assertEqual([post["id"] for post in second["results"]], expected[3:6])
 
-# Create your tests here.
+    def test_invalid_cursor_is_not_found(self):
+        response = self.client.get(reverse("post-feed"), {"cursor": "garbage"})
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,162 @@
+# creator/timelines.py
+"""
+Personalized follower timelines stored in Redis sorted sets.
+
+Every post id is pushed (fan-out-on-write) into the timeline of each
+follower of its author, scored by the post's creation time. Authors with
+more than ``TIMELINE_FANOUT_MAX_FOLLOWERS`` followers are not fanned out;
+their posts are merged in from their author timeline at read time
+(fan-out-on-read), so a single post never costs millions of writes.
+
+A user timeline that has been built from the database holds a sentinel
+member, ``ready``, at score +inf (never trimmed, never returned in a
+page). A timeline without it (new account, evicted key) is rebuilt on the
+next read, so readiness can't outlive the timeline it describes.
+"""
+from django.conf import settings
+from django_redis import get_redis_connection
+
+from accounts.models import Creator
+from .models import Post
+
+CELEBRITIES_KEY = "timeline:celebrities"
+READY_MEMBER = "ready"
+
+
+def user_timeline_key(user_id):
+    return f"timeline:user:{user_id}"
+
+
+def author_timeline_key(author_id):
+    return f"timeline:author:{author_id}"
+
+
+def _score(post):
+    return post.created_at.timestamp()
+
+
+def follower_ids(author_id):
+    return (
+        Creator.followers.through.objects
+        .filter(creator__user_id=author_id)
+        .values_list("user_id", flat=True)
+    )
+
+
+def push_to_author_timeline(post, redis=None):
+    redis = redis or get_redis_connection("default")
+    key = author_timeline_key(post.user_id)
+    pipe = redis.pipeline(transaction=False)
+    pipe.zadd(key, {post.id: _score(post)})
+    pipe.zremrangebyrank(key, 0, -settings.TIMELINE_MAX_LENGTH - 1)
+    pipe.execute()
+
+
+def push_to_timelines(post, user_ids, redis=None):
+    """Add ``post`` to each user's timeline, trimming every timeline to its max length."""
+    redis = redis or get_redis_connection("default")
+    score = _score(post)
+    pipe = redis.pipeline(transaction=False)
+    for user_id in user_ids:
+        key = user_timeline_key(user_id)
+        pipe.zadd(key, {post.id: score})
+        pipe.zremrangebyrank(key, 0, -settings.TIMELINE_MAX_LENGTH - 1)
+    pipe.execute()
+
+
+def mark_celebrity(author_id, is_celebrity, redis=None):
+    redis = redis or get_redis_connection("default")
+    if is_celebrity:
+        redis.sadd(CELEBRITIES_KEY, author_id)
+    else:
+        redis.srem(CELEBRITIES_KEY, author_id)
+
+
+def add_author_posts(user_id, author_id, redis=None):
+    """Backfill a new follower's timeline with the author's recent posts."""
+    redis = redis or get_redis_connection("default")
+    entries = redis.zrevrange(
+        author_timeline_key(author_id), 0, settings.TIMELINE_MAX_LENGTH - 1, withscores=True
+    )
+    if not entries:
+        return
+    key = user_timeline_key(user_id)
+    pipe = redis.pipeline(transaction=False)
+    pipe.zadd(key, dict(entries))
+    pipe.zremrangebyrank(key, 0, -settings.TIMELINE_MAX_LENGTH - 1)
+    pipe.execute()
+
+
+def remove_author_posts(user_id, author_id, redis=None):
+    redis = redis or get_redis_connection("default")
+    post_ids = redis.zrange(author_timeline_key(author_id), 0, -1)
+    if post_ids:
+        redis.zrem(user_timeline_key(user_id), *post_ids)
+
+
+def rebuild_timeline(user_id, redis=None):
+    """
+    Cold-start path for a user whose timeline is missing from Redis (new
+    account or evicted key). Runs once, then reads are served from Redis.
+    """
+    redis = redis or get_redis_connection("default")
+    posts = (
+        Post.objects
+        .filter(user__creator_profile__followers__id=user_id)
+        .order_by("-created_at")
+        .values_list("id", "created_at")[:settings.TIMELINE_MAX_LENGTH]
+    )
+    key = user_timeline_key(user_id)
+    pipe = redis.pipeline()
+    pipe.delete(key)
+    pipe.zadd(key, {
+        READY_MEMBER: float("inf"),
+        **{post_id: created_at.timestamp() for post_id, created_at in posts},
+    })
+    pipe.execute()
+
+
+def read_timeline(user, before=None, count=10):
+    """
+    Return ``(post_ids, next_cursor)`` for one page of ``user``'s timeline.
+
+    Pages are ordered by (score, post id), newest first. ``before`` is the
+    exclusive ``(score, post_id)`` of the last post on the previous page,
+    as parsed from ``next_cursor`` (``"<score>:<post_id>"``). Each page is
+    a bounded ZREVRANGEBYSCORE, plus a read of the posts sharing the
+    cursor's score, on the user's timeline and on each followed
+    high-follower author's; posts are never joined with follows.
+    """
+    redis = get_redis_connection("default")
+    if redis.zscore(user_timeline_key(user.id), READY_MEMBER) is None:
+        rebuild_timeline(user.id, redis=redis)
+
+    celebrity_ids = [int(author_id) for author_id in redis.smembers(CELEBRITIES_KEY)]
+    followed_celebrities = []
+    if celebrity_ids:
+        followed_celebrities = list(
+            Creator.objects
+            .filter(followers=user, user_id__in=celebrity_ids)
+            .values_list("user_id", flat=True)
+        )
+
+    before_score, before_id = before if before is not None else (float("inf"), None)
+    keys = [user_timeline_key(user.id)] + [author_timeline_key(a) for a in followed_celebrities]
+    pipe = redis.pipeline(transaction=False)
+    for key in keys:
+        if before is not None:
+            # Posts sharing the cursor's score may not all have made the last page.
+            pipe.zrangebyscore(key, before_score, before_score, withscores=True)
+        pipe.zrevrangebyscore(key, f"({before_score}", "-inf", start=0, num=count, withscores=True)
+
+    merged = {}
+    for entries in pipe.execute():
+        for post_id, score in entries:
+            post_id = int(post_id)
+            if score == before_score and post_id >= before_id:
+                continue
+            merged[post_id] = score
+    page = sorted(merged.items(), key=lambda item: (item[1], item[0]), reverse=True)[:count]
+
+    next_cursor = f"{page[-1][1]!r}:{page[-1][0]}" if len(page) == count else None
+    return [post_id for post_id, _ in page], next_cursor
@@ -0,0 +1,94 @@
+# creator/toggles.py
+"""
+Single-statement like/follow toggles.
+
+Each toggle is one Postgres statement on the M2M through table: a
+``DELETE ... RETURNING`` and an ``INSERT ... ON CONFLICT DO NOTHING``
+chained in data-modifying CTEs, plus the counter-column update, which
+only touches the row when one of them did something. The statement
+reports whether a row was really added or removed, so callers get the new
+state and count in one round trip and can notify only on a real
+transition. Concurrent double-taps collapse on the unique index instead
+of racing an exists() check.
+"""
+from collections import namedtuple
+
+from django.db import connection
+
+from accounts.models import Creator
+from .models import Post, Comment
+
+ToggleResult = namedtuple("ToggleResult", ["active", "changed", "count"])
+
+# Optional "action" values accepted by the toggle views; anything else toggles.
+TOGGLE = "toggle"
+SET_ON = "on"
+SET_OFF = "off"
+
+_SQL = """
+WITH removed AS (
+    DELETE FROM {through}
+    WHERE {source_col} = %(target)s AND {user_col} = %(user)s AND %(allow_remove)s
+    RETURNING 1
+), added AS (
+    INSERT INTO {through} ({source_col}, {user_col})
+    SELECT %(target)s, %(user)s
+    WHERE %(allow_add)s AND NOT EXISTS (SELECT 1 FROM removed)
+    ON CONFLICT ({source_col}, {user_col}) DO NOTHING
+    RETURNING 1
+), changed AS (
+    SELECT * FROM added UNION ALL SELECT * FROM removed
+), counted AS (
+    UPDATE {table}
+    SET {counter} = GREATEST({counter} + (SELECT count(*) FROM added) - (SELECT count(*) FROM removed), 0)
+    WHERE {pk_col} = %(target)s AND EXISTS (SELECT 1 FROM changed)
+    RETURNING {counter}
+)
+SELECT (SELECT count(*) FROM added), (SELECT count(*) FROM removed),
+       COALESCE((SELECT {counter} FROM counted), (SELECT {counter} FROM {table} WHERE {pk_col} = %(target)s))
+"""
+
+
+def _build_sql(model, m2m_name, counter):
+    qn = connection.ops.quote_name
+    field = model._meta.get_field(m2m_name)
+    return _SQL.format(
+        through=qn(field.remote_field.through._meta.db_table),
+        source_col=qn(field.m2m_column_name()),
+        user_col=qn(field.m2m_reverse_name()),
+        table=qn(model._meta.db_table),
+        pk_col=qn(model._meta.pk.column),
+        counter=qn(counter),
+    )
+
+
+_POST_LIKE_SQL = _build_sql(Post, "likes", "like_count")
+_COMMENT_LIKE_SQL = _build_sql(Comment, "likes", "like_count")
+_FOLLOW_SQL = _build_sql(Creator, "followers", "follower_count")
+
+
+def _run(sql, target_id, user_id, mode):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, {
+            "target": target_id,
+            "user": user_id,
+            "allow_add": mode != SET_OFF,
+            "allow_remove": mode != SET_ON,
+        })
+        added, removed, count = cursor.fetchone()
+    # Nothing changed in toggle/on mode means a concurrent request already
+    # inserted the row (ON CONFLICT), so the relation is active.
+    active = bool(added) or (not removed and mode != SET_OFF)
+    return ToggleResult(active=active, changed=bool(added or removed), count=count or 0)
+
+
+def toggle_post_like(post_id, user_id, mode=TOGGLE):
+    return _run(_POST_LIKE_SQL, post_id, user_id, mode)
+
+
+def toggle_comment_like(comment_id, user_id, mode=TOGGLE):
+    return _run(_COMMENT_LIKE_SQL, comment_id, user_id, mode)
+
+
+def toggle_follow(creator_id, user_id, mode=TOGGLE):
+    return _run(_FOLLOW_SQL, creator_id, user_id, mode)
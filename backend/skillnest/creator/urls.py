@@ -1,12 +1,14 @@
 from django.urls import path
 from .views import PostView, PostDetailView, CommentListCreateView, CommentDetailView,CreatorPostsView,CreatorCoursesView,CommunityMembersView,FeedbackDetailView,PostAllDetailView
 from .views import ToggleFollowView,ToggleLikeView,ReplyListCreateView,toggle_comment_like,CommunityListCreateView,CommunityDetailView,UserListView,FeedbackListCreateView
-from .views import PendingInvitesView,RespondToInviteView,ReportPostView,CommunityDeleteView,AllFollowersListView,CreatorReviewListCreateView,CreatorFollowersView
+from .views import FeedView,TimelineView,PendingInvitesView,BulkInviteView,RespondToInviteView,ReportPostView,CommunityDeleteView,AllFollowersListView,CreatorReviewListCreateView,CreatorFollowersView
 
 
 
 urlpatterns = [
     path('posts/', PostView.as_view(), name='post-list-create'),
+    path('posts/feed/', FeedView.as_view(), name='post-feed'),
+    path('timeline/', TimelineView.as_view(), name='timeline'),
     path('posts/<int:pk>/', PostDetailView.as_view(), name='post-detail'),
     path('posts/<int:post_id>/comments/', CommentListCreateView.as_view(), name='comment-list-create'),
     path('comments/<int:pk>/', CommentDetailView.as_view(), name='comment-detail'),
@@ -24,6 +26,7 @@ urlpatterns = [
     path("users/", UserListView.as_view(), name="user-list"),
     path("all-followers/", AllFollowersListView.as_view(), name="all-user-list"),
     path("communities/<int:pk>/members/", CommunityMembersView.as_view(),name="community-members"),
+    path("communities/<int:pk>/invites/", BulkInviteView.as_view(), name="community-bulk-invite"),
     path("invites/", PendingInvitesView.as_view(), name="pending-invites"),
     path("invites/<int:pk>/", RespondToInviteView.as_view(), name="respond-invite"),
     path("post/<int:post_id>/reports/", ReportPostView.as_view(), name="report-posts"),
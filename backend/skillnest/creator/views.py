@@ -1,6 +1,7 @@
 from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly,AllowAny
 from rest_framework.generics import ListCreateAPIView, RetrieveUpdateDestroyAPIView
 from .serializers import PostSerializer,CommentSerializer,CommunitySerializer,CourseSerializer,UserSerializer,CommunityInviteSerializer,ReportPostSerializer,ReviewSerializer,FeedbackSerializer,PostDetailSerializer
+from .serializers import CommunityListSerializer, listing_options
 from .models import Post,Comment,Community,Course,Review,Feedback
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
@@ -12,10 +13,21 @@ from accounts.authentication import JWTCookieAuthentication
 from rest_framework.views import APIView
 from rest_framework import generics, permissions
 from accounts.models import User
+from accounts.directory import resolve_identifiers
+from .invites import invite_users
 from rest_framework.decorators import action
 from django.shortcuts import get_object_or_404
 from notification.utils import create_notification
-from django.db.models import Q
+from django.db.models import Prefetch, Q
+from django.db import transaction
+from rest_framework.pagination import BasePagination, LimitOffsetPagination, _positive_int
+from rest_framework.exceptions import NotFound
+from rest_framework.utils.urls import replace_query_param
+from django.utils.dateparse import parse_datetime
+from .tasks import fan_out_post, follow_timeline, unfollow_timeline
+from . import toggles
+from .timelines import read_timeline
+import base64
 import logging
 logger = logging.getLogger(__name__)
 
@@ -23,20 +35,127 @@ logger = logging.getLogger(__name__)
 
 class PostView(ListCreateAPIView):
     permission_classes = [AllowAny] 
-    queryset = Post.objects.all().order_by('-created_at')
     serializer_class = PostSerializer
 
+    def get_queryset(self):
+        return Post.objects.for_feed(self.request.user).order_by('-created_at')
+
     def perform_create(self, serializer):
         # Save post with logged-in creator
-        serializer.save(user=self.request.user.creator)
+        post = serializer.save(user=self.request.user)
+        transaction.on_commit(lambda: fan_out_post.delay(post.id))
+
+
+class FeedCursorPagination(BasePagination):
+    """
+    Keyset pagination on (created_at, id) so deep pages cost the same as page
+    one. The cursor is the last post's (created_at, id), and the next page
+    starts strictly after it, so posts sharing a created_at are neither
+    skipped nor repeated. DRF's CursorPagination keys on created_at alone and
+    falls back to an offset among equal values.
+    """
+    page_size = 6
+    page_size_query_param = 'page_size'
+    max_page_size = 50
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        queryset = queryset.order_by('-created_at', '-id')
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            created_at, post_id = self.decode_cursor(cursor)
+            queryset = queryset.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=post_id),
+                created_at__lte=created_at,
+            )
+        page = list(queryset[:page_size + 1])
+        self.has_next = len(page) > page_size
+        self.page = page[:page_size]
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param], strict=True, cutoff=self.max_page_size,
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def encode_cursor(self, post):
+        raw = f"{post.created_at.isoformat()}|{post.id}"
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    def decode_cursor(self, cursor):
+        try:
+            created_at, post_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+            created_at, post_id = parse_datetime(created_at), int(post_id)
+        except (TypeError, ValueError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if created_at is None:
+            raise NotFound(self.invalid_cursor_message)
+        return created_at, post_id
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'results': data})
+
+
+class FeedView(ListAPIView):
+    """
+    Home feed for infinite scroll. Returns a stable ``next`` cursor instead
+    of a limit/offset, backed by the ``post_feed_keyset_idx`` index.
+    """
+    permission_classes = [AllowAny]
+    serializer_class = PostSerializer
+    pagination_class = FeedCursorPagination
+
+    def get_queryset(self):
+        return Post.objects.for_feed(self.request.user)
+
+
+class TimelineView(APIView):
+    """
+    Personalized timeline of posts from creators the user follows.
+    GET /api/creator/timeline/?before=<next_cursor>&page_size=<n>
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        before = request.query_params.get('before')
+        try:
+            if before is not None:
+                score, post_id = before.split(':')
+                before = (float(score), int(post_id))
+            page_size = min(int(request.query_params.get('page_size', 10)), 50)
+        except ValueError:
+            return Response({"error": "Invalid cursor or page_size"}, status=status.HTTP_400_BAD_REQUEST)
+
+        post_ids, next_cursor = read_timeline(request.user, before=before, count=max(page_size, 1))
+        posts = Post.objects.for_feed(request.user).in_bulk(post_ids)
+        serializer = PostSerializer(
+            [posts[post_id] for post_id in post_ids if post_id in posts],
+            many=True,
+            context={'request': request},
+        )
+        return Response({"results": serializer.data, "next_cursor": next_cursor})
 
 
 # Retrieve, Update, Delete a single post
 class PostDetailView(RetrieveUpdateDestroyAPIView):
     permission_classes = [AllowAny]
-    queryset = Post.objects.all()
     serializer_class = PostSerializer
 
+    def get_queryset(self):
+        return Post.objects.for_feed(self.request.user)
+
     def perform_update(self, serializer):
         # post = self.get_object()
         # user = getattr(self.request.user, "creator", None)
@@ -55,11 +174,12 @@ class CreatorPostsView(ListCreateAPIView):
     permission_classes = [AllowAny]
     def get_queryset(self):
         creator_id = self.kwargs['creator_id']
-        return Post.objects.filter(user_id=creator_id).order_by('-created_at')
+        return Post.objects.for_feed(self.request.user).filter(user_id=creator_id).order_by('-created_at')
 
     def perform_create(self, serializer):
         creator_id = self.kwargs['creator_id']
-        serializer.save(user_id=creator_id)  
+        post = serializer.save(user_id=creator_id)
+        transaction.on_commit(lambda: fan_out_post.delay(post.id))
     
 class CreatorCoursesView(ListAPIView):
     serializer_class = PostSerializer
@@ -67,7 +187,7 @@ class CreatorCoursesView(ListAPIView):
 
     def get_queryset(self):
         creator_id = self.kwargs['creator_id']
-        return Post.objects.filter(user_id=creator_id, is_course=True).order_by("-created_at")
+        return Post.objects.for_feed(self.request.user).filter(user_id=creator_id, is_course=True).order_by("-created_at")
 
 # List all comments for a post / Create new comment
 class CommentListCreateView(ListCreateAPIView):
@@ -111,28 +231,32 @@ class ReplyListCreateView(ListCreateAPIView):
             parent_id=self.kwargs['comment_id'],
             post_id=self.kwargs['post_id']
         )
+def _toggle_mode(request, on_action, off_action):
+    """Map an optional ``action`` field to an idempotent set; default is a toggle."""
+    return {
+        on_action: toggles.SET_ON,
+        off_action: toggles.SET_OFF,
+    }.get(request.data.get("action"), toggles.TOGGLE)
+
+
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
 def toggle_comment_like(request, post_id, comment_id):
     try:
-        post = get_object_or_404(Post, id=post_id)
-        comment = Comment.objects.get(id=comment_id, post_id=post_id)
+        comment = Comment.objects.select_related("post__user").get(id=comment_id, post_id=post_id)
     except Comment.DoesNotExist:
         return Response({"error": "Comment not found"}, status=404)
 
     user = request.user
-    if user in comment.likes.all():
-        comment.likes.remove(user)
-        liked = False
-    else:
-        comment.likes.add(user)
-        liked = True
+    result = toggles.toggle_comment_like(comment.id, user.id, _toggle_mode(request, "like", "unlike"))
+    if result.changed and result.active:
+        post = comment.post
         create_notification(sender=user, recipient=post.user, notif_type='comment_like', post=post)
 
     return Response({
         "success": True,
-        "liked": liked,
-        "like_count": comment.likes.count()
+        "liked": result.active,
+        "like_count": result.count
     })
 
 # Retrieve, Update, Delete a comment
@@ -159,50 +283,43 @@ class ToggleFollowView(APIView):
 
     def post(self, request, creator_id, *args, **kwargs):
         try:
-            creator = Creator.objects.get(user=creator_id)
+            creator = Creator.objects.select_related('user').get(user=creator_id)
         except Creator.DoesNotExist:
             return Response({'error': 'Creator not found'}, status=status.HTTP_404_NOT_FOUND)
 
         user = request.user
+        result = toggles.toggle_follow(creator.id, user.id, _toggle_mode(request, 'follow', 'unfollow'))
 
-        if creator.followers.filter(id=user.id).exists():
-            # Already following → unfollow
-            creator.followers.remove(user)
-            following = False
-        else:
+        if result.changed and result.active:
             # Follow → notify creator.user
-            creator.followers.add(user)
-            following = True
+            transaction.on_commit(lambda: follow_timeline.delay(user.id, creator.user_id))
             create_notification(
                 sender=user,
                 recipient=creator.user,     # notify the creator (User model)
                 notif_type='follow'
             )
+        elif result.changed:
+            transaction.on_commit(lambda: unfollow_timeline.delay(user.id, creator.user_id))
 
         return Response({
             'success': True,
-            'following': following,
-            'follower_count': creator.followers.count()
+            'following': result.active,
+            'follower_count': result.count
         }, status=status.HTTP_200_OK)
+
 class ToggleLikeView(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request, post_id, *args, **kwargs):
         try:
-            post = Post.objects.get(id=post_id)
+            post = Post.objects.select_related('user').get(id=post_id)
         except Post.DoesNotExist:
             return Response({"error": "Post not found"}, status=status.HTTP_404_NOT_FOUND)
 
         user = request.user
-        if post.likes.filter(id=user.id).exists():
-            # Already liked → unlike
-            post.likes.remove(user)
-            liked = False
-        else:
-            # Not liked → like
-            post.likes.add(user)
-            liked = True
-        if user != post.user:  # don’t notify yourself
+        result = toggles.toggle_post_like(post.id, user.id, _toggle_mode(request, 'like', 'unlike'))
+        # Only a real unliked → liked transition notifies, and never yourself.
+        if result.changed and result.active and user != post.user:
             create_notification(
                 sender=user,
                 recipient=post.user,
@@ -211,8 +328,8 @@ class ToggleLikeView(APIView):
             )
         return Response({
             "success": True,
-            "liked": liked,
-            "like_count": post.likes.count()
+            "liked": result.active,
+            "like_count": result.count
         }, status=status.HTTP_200_OK)
 
 class UserListView(generics.ListAPIView):
@@ -240,9 +357,19 @@ class CommunityListCreateView(generics.ListCreateAPIView):
 
     def get_queryset(self):
         user = self.request.user
-        return Community.objects.filter(
-            Q(creator=user) | Q(members=user)
-        ).distinct().order_by('-created_at')
+        queryset = Community.objects.visible_to(user).order_by('-created_at')
+        lean, members_limit = listing_options(self.request)
+        if lean:
+            return queryset.for_listing(user, members_limit)
+        return queryset.select_related('creator', 'chat_room').prefetch_related(
+            Prefetch('members', queryset=User.objects.only('id'))
+        )
+
+    def get_serializer_class(self):
+        if self.request.method == 'GET' and listing_options(self.request)[0]:
+            return CommunityListSerializer
+        return CommunitySerializer
+
     def perform_create(self, serializer):
         serializer.save(creator=self.request.user)
     
@@ -275,11 +402,12 @@ class CommunityMembersView(APIView):
 
     def get(self, request, pk):
         community = get_object_or_404(Community, pk=pk)
-        data = [
-            {"id": u.id, "username": u.username, "email": u.email}
-            for u in community.members.all()
-        ]
-        return Response({"members": data}, status=status.HTTP_200_OK)
+        members = community.members.order_by('id').values("id", "username", "email")
+        if "limit" in request.query_params:
+            # Paged: {"count", "next", "previous", "results"}
+            paginator = LimitOffsetPagination()
+            return paginator.get_paginated_response(paginator.paginate_queryset(members, request, view=self))
+        return Response({"members": list(members)}, status=status.HTTP_200_OK)
 
     def patch(self, request, pk):
         return self._update_members(request, pk)
@@ -304,36 +432,21 @@ class CommunityMembersView(APIView):
             )
 
         # find user by username or email
-        try:
-            user = (
-                User.objects.get(username=identifier)
-                if "@" not in identifier
-                else User.objects.get(email=identifier)
-            )
-        except User.DoesNotExist:
+        user = resolve_identifiers([identifier]).get(identifier)
+        if user is None:
             return Response(
                 {"error": f"User {identifier} not found"},
                 status=status.HTTP_404_NOT_FOUND
             )
 
         if action_type == "add":
-            # Check if user is already in community
-            if user in community.members.all():
+            # Create (or reopen) an invite instead of adding directly
+            result = invite_users(community, request.user, [user])
+            if result["already_member"]:
                 return Response({"message": "User already a member"}, status=status.HTTP_400_BAD_REQUEST)
-
-            # Check if invite already exists
-            existing_invite = CommunityInvite.objects.filter(
-                community=community, invited_user=user, status="pending"
-            ).first()
-            if existing_invite:
+            if result["already_invited"]:
                 return Response({"message": "Invite already sent"}, status=status.HTTP_400_BAD_REQUEST)
-
-            # Create invite instead of adding directly
-            invite = CommunityInvite.objects.create(
-                community=community,
-                invited_by=request.user,
-                invited_user=user,
-            )
+            invite = CommunityInvite.objects.only("id").get(community=community, invited_user=user)
 
             return Response(
                 {"message": f"Invitation sent to {user.username}", "invite_id": invite.id},
@@ -355,6 +468,39 @@ class CommunityMembersView(APIView):
             )
 
 
+class BulkInviteView(APIView):
+    """
+    POST /api/creator/communities/<pk>/invites/ {"members": [username or email, ...]}
+    Invites everyone found in a fixed number of queries (creator.invites).
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    max_members = 1000
+
+    def post(self, request, pk):
+        community = get_object_or_404(Community, pk=pk)
+        if community.creator_id != request.user.id:
+            return Response({"error": "Only the community creator can invite"}, status=status.HTTP_403_FORBIDDEN)
+
+        identifiers = request.data.get("members")
+        if not isinstance(identifiers, list) or not identifiers or not all(isinstance(i, str) for i in identifiers):
+            return Response({"error": "members must be a non-empty list"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(identifiers) > self.max_members:
+            return Response(
+                {"error": f"At most {self.max_members} members per request"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        identifiers = list(dict.fromkeys(i.strip() for i in identifiers if i.strip()))
+        found = resolve_identifiers(identifiers)
+        result = invite_users(community, request.user, found.values())
+        return Response({
+            "invited": [user.username for user in result["invited"]],
+            "already_member": [user.username for user in result["already_member"]],
+            "already_invited": [user.username for user in result["already_invited"]],
+            "not_found": [i for i in identifiers if i not in found],
+        }, status=status.HTTP_200_OK)
+
+
 class PendingInvitesView(generics.ListAPIView):
     """GET: List pending invites for the logged-in learner"""
     serializer_class = CommunityInviteSerializer
@@ -504,6 +650,8 @@ class FeedbackDetailView(APIView):
     
 
 class PostAllDetailView(RetrieveAPIView):
-    queryset = Post.objects.all()
     serializer_class = PostDetailSerializer
-    permission_classes = [IsAuthenticated]
\ No newline at end of file
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return Post.objects.for_feed(self.request.user)
@@ -1,7 +1,9 @@
 from django.shortcuts import render
+from django.db.models import Prefetch
 from rest_framework import generics, permissions
+from accounts.models import User
 from creator.models import Community
-from creator.serializers import CommunitySerializer
+from creator.serializers import CommunitySerializer, CommunityListSerializer, listing_options
 
 # List communities where logged-in user is a member (learner)
 class CommunityMemberListView(generics.ListAPIView):
@@ -10,4 +12,15 @@ class CommunityMemberListView(generics.ListAPIView):
 
     def get_queryset(self):
         # Only list communities where the logged-in user is a member
-        return Community.objects.filter(members=self.request.user).order_by("-created_at")
\ No newline at end of file
+        queryset = Community.objects.filter(members=self.request.user).order_by("-created_at")
+        lean, members_limit = listing_options(self.request)
+        if lean:
+            return queryset.for_listing(self.request.user, members_limit)
+        return queryset.select_related("creator", "chat_room").prefetch_related(
+            Prefetch("members", queryset=User.objects.only("id"))
+        )
+
+    def get_serializer_class(self):
+        if listing_options(self.request)[0]:
+            return CommunityListSerializer
+        return CommunitySerializer
@@ -1,4 +1,5 @@
 from django.contrib import admin
-from .models import Notification
+from .models import Notification, NotificationArchive
 # Register your models here.
 admin.site.register(Notification)
+admin.site.register(NotificationArchive)
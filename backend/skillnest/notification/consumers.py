@@ -1,12 +1,27 @@
 # your_app/consumers.py
-import json
+from urllib.parse import parse_qs
+from asgiref.sync import sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from django.contrib.auth.models import AnonymousUser
+from skillnest.frames import FramedConsumerMixin
+from .utils import missed_notifications
 import logging
 logger = logging.getLogger(__name__)
 
-class NotificationConsumer(AsyncWebsocketConsumer):
+
+def _frame(content):
+    return {
+        'id': content["id"],
+        'sender': content["sender"],
+        'type': content["type"],
+        'post_id': content["post_id"],
+        'actor_count': content.get("actor_count", 1),
+        'timestamp': content["created_at"],
+    }
+
+
+class NotificationConsumer(FramedConsumerMixin, AsyncWebsocketConsumer):
     async def connect(self):
         self.user = self.scope['user']
         # Reject connection if user is not authenticated
@@ -22,13 +37,32 @@ class NotificationConsumer(AsyncWebsocketConsumer):
             self.channel_name
         )
         
-        await self.accept()
+        await self.accept_framed()
         
         # Send a welcome message
-        await self.send(text_data=json.dumps({
+        await self.send_event({
             'type': 'connection_established',
             'message': 'Connected to notifications'
-        }))
+        })
+        await self.replay_missed()
+
+    async def replay_missed(self):
+        """
+        ``?last_seen_id=<id>`` on connect: send everything pushed since that
+        notification in a single ``missed_notifications`` frame.
+        """
+        query = parse_qs(self.scope.get('query_string', b'').decode())
+        try:
+            last_seen_id = int(query['last_seen_id'][0])
+        except (KeyError, ValueError):
+            return
+
+        missed, truncated = await sync_to_async(missed_notifications)(self.user.id, last_seen_id)
+        await self.send_event({
+            'type': 'missed_notifications',
+            'notifications': [_frame(content) for content in missed],
+            'truncated': truncated,
+        })
 
     async def disconnect(self, close_code):
         # Leave the group
@@ -38,24 +72,20 @@ class NotificationConsumer(AsyncWebsocketConsumer):
                 self.channel_name
             )
 
-    async def receive(self, text_data):
+    async def receive(self, text_data=None, bytes_data=None):
         # Handle incoming WebSocket messages (optional)
-        text_data_json = json.loads(text_data)
+        text_data_json = self.decode_frame(text_data, bytes_data)
+        if not isinstance(text_data_json, dict):
+            return
         message_type = text_data_json.get('type', '')
         
         if message_type == 'ping':
-            await self.send(text_data=json.dumps({
+            await self.send_event({
                 'type': 'pong',
                 'message': 'Connection alive'
-            }))
+            })
 
     # Handle notification messages sent from Django views
     async def send_notification(self, event):
         # Send notification to WebSocket
-        await self.send(text_data=json.dumps({
-        'id': event["content"]["id"],
-        'sender': event["content"]["sender"],
-        'type': event["content"]["type"],
-        'post_id': event["content"]["post_id"],
-        'timestamp': event["content"]["created_at"],
-    }))
+        await self.send_event(_frame(event["content"]))
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.4 on 2026-10-18 13:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('creator', '0017_community_invite_unique'),
+        ('notification', '0006_notification_invite_type'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='community',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='creator.community'),
+        ),
+        migrations.AddField(
+            model_name='notificationarchive',
+            name='community_id',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
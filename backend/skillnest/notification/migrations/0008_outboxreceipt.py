@@ -0,0 +1,20 @@
+# Generated by Django 5.2.4 on 2026-10-18 14:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notification', '0007_notification_community'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxReceipt',
+            fields=[
+                ('entry_id', models.CharField(max_length=41, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+        ),
+    ]
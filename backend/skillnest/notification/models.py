@@ -1,7 +1,7 @@
 # notifications/models.py
 from django.db import models
 from accounts.models import User
-from creator.models import Post
+from creator.models import Community, Post
 
 class Notification(models.Model):
     NOTIF_TYPES = (
@@ -9,15 +9,59 @@ class Notification(models.Model):
         ('comment', 'Comment'),
         ('follow', 'Follow'),
         ('comment_like', 'Comment Like'),
+        ('invite', 'Community Invite'),
     )
     recipient = models.ForeignKey(User, related_name='notifications', on_delete=models.CASCADE)
     sender = models.ForeignKey(User, on_delete=models.CASCADE)
     notif_type = models.CharField(max_length=15, choices=NOTIF_TYPES)
     post = models.ForeignKey(Post, null=True, blank=True, on_delete=models.CASCADE)
+    community = models.ForeignKey(Community, null=True, blank=True, on_delete=models.CASCADE)  # invites
     read = models.BooleanField(default=False)
+    actor_count = models.PositiveIntegerField(default=1)  # "N people liked your post"
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
-        ordering = ['-created_at']
+        # No default ordering: every query orders explicitly so none pays for a sort it doesn't need.
+        indexes = [
+            # Bell badge and unread filters: recipient's unread rows, newest first.
+            models.Index(fields=['recipient', 'read', '-created_at'], name='notif_recipient_read_idx'),
+            # Retention scan in archive_notifications: old read rows only.
+            models.Index(fields=['created_at'], condition=models.Q(read=True), name='notif_read_created_idx'),
+        ]
     def __str__(self):
-        return f"{self.sender.email} - {self.recipient} - {self.notif_type}"
\ No newline at end of file
+        return f"{self.sender.email} - {self.recipient} - {self.notif_type}"
+
+
+class OutboxReceipt(models.Model):
+    """
+    An outbox stream entry whose notification is committed, written in the
+    same transaction, so ``flush_notifications`` skips the entry if it is
+    delivered again. Pruned by ``archive_notifications``.
+    """
+    entry_id = models.CharField(max_length=41, primary_key=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+
+class NotificationArchive(models.Model):
+    """
+    Compact copy of a read notification moved out of the live table by
+    ``notification.tasks.archive_notifications``. Plain id columns, no
+    foreign keys, so archived rows never hold up user or post deletes.
+    """
+    notification_id = models.BigIntegerField(unique=True)
+    recipient_id = models.BigIntegerField()
+    sender_id = models.BigIntegerField()
+    notif_type = models.CharField(max_length=15)
+    post_id = models.BigIntegerField(null=True, blank=True)
+    community_id = models.BigIntegerField(null=True, blank=True)
+    actor_count = models.PositiveIntegerField(default=1)
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['recipient_id', '-created_at'], name='notif_archive_recipient_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.sender_id} - {self.recipient_id} - {self.notif_type} (archived)"
@@ -0,0 +1,62 @@
+# notification/partitions.py
+"""
+Optional monthly range partitioning of the live notification table.
+
+Django can't declare a partitioned table, and Postgres requires the
+partition key in the primary key, so turning ``notification_notification``
+into a table ``PARTITION BY RANGE (created_at)`` with a ``(id, created_at)``
+primary key is a one-off migration done by hand. Once it is partitioned,
+``ensure_partitions`` keeps the upcoming months' partitions created so
+inserts never fall outside a partition, and list queries (always bounded
+to recent rows by the ``-created_at`` index) stay on the hot partitions.
+On an ordinary table every function here is a no-op.
+"""
+from datetime import date
+
+from django.db import connection
+
+from .models import Notification
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+def _add_months(day, months):
+    month = day.month - 1 + months
+    return date(day.year + month // 12, month % 12 + 1, 1)
+
+
+def partition_name(month_start):
+    return f"{Notification._meta.db_table}_p{month_start:%Y%m}"
+
+
+def is_partitioned():
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table WHERE partrelid = %s::regclass",
+            [Notification._meta.db_table],
+        )
+        return cursor.fetchone() is not None
+
+
+def ensure_partitions(months_ahead, today=None):
+    """Create the current month's partition and the next ``months_ahead`` ones."""
+    if not is_partitioned():
+        return []
+    qn = connection.ops.quote_name
+    first = (today or date.today()).replace(day=1)
+    created = []
+    with connection.cursor() as cursor:
+        for offset in range(months_ahead + 1):
+            start, end = _add_months(first, offset), _add_months(first, offset + 1)
+            name = partition_name(start)
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {qn(name)} PARTITION OF {qn(Notification._meta.db_table)} "
+                f"FOR VALUES FROM (%s) TO (%s)",
+                [start, end],
+            )
+            created.append(name)
+    logger.info("Notification partitions ensured: %s", created)
+    return created
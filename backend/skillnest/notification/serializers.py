@@ -5,7 +5,9 @@ from .models import Notification
 class NotificationSerializer(serializers.ModelSerializer):
     post_id = serializers.IntegerField(source='post.id', read_only=True)
     sender = serializers.CharField(source='sender.email', read_only=True)
+    community_id = serializers.IntegerField(read_only=True)
+    community = serializers.CharField(source='community.name', read_only=True, default=None)
     
     class Meta:
         model = Notification
-        fields = ['id', 'sender', 'notif_type', 'post_id', 'read', 'created_at']
+        fields = ['id', 'sender', 'notif_type', 'post_id', 'community_id', 'community', 'actor_count', 'read', 'created_at']
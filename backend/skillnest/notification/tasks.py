@@ -0,0 +1,398 @@
+# notification/tasks.py
+import asyncio
+import json
+import socket
+from datetime import timedelta
+from pathlib import Path
+
+from asgiref.sync import async_to_sync
+from celery import shared_task
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import DataError, IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from django_redis import get_redis_connection
+from redis.exceptions import LockError, ResponseError
+
+from accounts.models import User
+from creator.models import Community
+from .models import Notification, NotificationArchive, OutboxReceipt
+from . import partitions
+from .utils import (
+    OUTBOX_KEY, OUTBOX_GROUP, OUTBOX_DEAD_LETTER_KEY, OUTBOX_DEAD_LETTER_MAXLEN, FLUSH_SCHEDULED_KEY,
+    FLUSH_LOCK_KEY, schedule_flush, adjust_unread_counts, append_to_streams,
+)
+
+import logging
+logger = logging.getLogger(__name__)
+
+# Storms of these collapse into one "N people liked your post" notification.
+AGGREGATED_TYPES = ("like", "comment_like")
+
+
+def actors_key(notification_id):
+    """Senders already counted in an aggregated notification's ``actor_count``."""
+    return f"notifications:actors:{notification_id}"
+
+
+def _ensure_group(redis):
+    try:
+        redis.xgroup_create(OUTBOX_KEY, OUTBOX_GROUP, id="0", mkstream=True)
+    except ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+
+def _read_batch(redis, size):
+    """
+    Entries a flush that died (or failed) left unacknowledged, once idle for
+    ``NOTIFICATION_CLAIM_IDLE_MS``; otherwise new ones.
+    """
+    consumer = socket.gethostname()
+    _, entries, *_ = redis.xautoclaim(
+        OUTBOX_KEY, OUTBOX_GROUP, consumer,
+        min_idle_time=settings.NOTIFICATION_CLAIM_IDLE_MS, start_id="0-0", count=size,
+    )
+    if entries:
+        return entries
+    response = redis.xreadgroup(OUTBOX_GROUP, consumer, {OUTBOX_KEY: ">"}, count=size)
+    return response[0][1] if response else []
+
+
+def _group(entries):
+    """
+    Collapse ``(entry_id, entry)`` pairs into one entry per notification to
+    write, with the ``entry_ids`` it came from. Aggregated types are keyed
+    by (recipient, type, post); everything else is only de-duplicated, per
+    post or community.
+    """
+    groups = {}
+    for entry_id, entry in entries:
+        if entry["notif_type"] in AGGREGATED_TYPES:
+            key = (entry["recipient_id"], entry["notif_type"], entry["post_id"])
+        else:
+            key = (
+                entry["recipient_id"], entry["notif_type"], entry["post_id"],
+                entry.get("community_id"), entry["sender_id"],
+            )
+        group = groups.setdefault(key, {"community_id": None, **entry, "sender_ids": [], "entry_ids": []})
+        group["entry_ids"].append(entry_id)
+        if entry["sender_id"] not in group["sender_ids"]:
+            group["sender_ids"].append(entry["sender_id"])
+        group["sender_id"] = entry["sender_id"]  # latest actor is shown
+    return list(groups.values())
+
+
+def _merge_into_recent(groups, redis):
+    """
+    Fold aggregated groups into an unread notification for the same
+    (recipient, type, post) created within the aggregation window; only
+    senders not yet counted in it (``actors_key``) raise its ``actor_count``.
+    Returns (updated notifications with their groups, groups that still
+    need a new row).
+    """
+    aggregated = [g for g in groups if g["notif_type"] in AGGREGATED_TYPES]
+    if not aggregated:
+        return [], groups
+
+    cutoff = timezone.now() - timedelta(seconds=settings.NOTIFICATION_AGGREGATION_WINDOW)
+    recent = {}
+    candidates = Notification.objects.filter(
+        read=False,
+        created_at__gte=cutoff,
+        notif_type__in=AGGREGATED_TYPES,
+        recipient_id__in={g["recipient_id"] for g in aggregated},
+        post_id__in={g["post_id"] for g in aggregated},
+    ).order_by("created_at")
+    for notification in candidates:
+        recent[(notification.recipient_id, notification.notif_type, notification.post_id)] = notification
+
+    matched, remaining = [], []
+    for group in groups:
+        notification = recent.get((group["recipient_id"], group["notif_type"], group["post_id"]))
+        if notification is None or group["notif_type"] not in AGGREGATED_TYPES:
+            remaining.append(group)
+        else:
+            matched.append((notification, group))
+
+    pipe = redis.pipeline(transaction=False)
+    for notification, group in matched:
+        for sender_id in group["sender_ids"]:
+            pipe.sismember(actors_key(notification.pk), sender_id)
+    counted = iter(pipe.execute())
+
+    updated = []
+    for notification, group in matched:
+        # e.g. like, unlike, like again: the same sender is one actor.
+        new_actors = sum(1 for _ in group["sender_ids"] if not next(counted))
+        Notification.objects.filter(pk=notification.pk).update(
+            sender_id=group["sender_id"],
+            actor_count=F("actor_count") + new_actors,
+        )
+        notification.sender_id = group["sender_id"]
+        notification.actor_count += new_actors
+        updated.append((notification, group))
+    return updated, remaining
+
+
+def _record_actors(pairs, redis):
+    """Remember the counted senders of aggregated notifications for the aggregation window."""
+    pipe = redis.pipeline(transaction=False)
+    for notification, group in pairs:
+        if notification.notif_type in AGGREGATED_TYPES:
+            pipe.sadd(actors_key(notification.pk), *group["sender_ids"])
+            pipe.expire(actors_key(notification.pk), settings.NOTIFICATION_AGGREGATION_WINDOW)
+    pipe.execute()
+
+
+def _payload(notification, usernames, community_names):
+    return {
+        "id": notification.id,
+        "sender": usernames.get(notification.sender_id),
+        "type": notification.notif_type,
+        "post_id": notification.post_id,
+        "community_id": notification.community_id,
+        "community": community_names.get(notification.community_id),
+        "actor_count": notification.actor_count,
+        "created_at": str(notification.created_at),
+    }
+
+
+async def _push(payloads):
+    channel_layer = get_channel_layer()
+    await asyncio.gather(*(
+        channel_layer.group_send(
+            f"notifications_{recipient_id}",
+            {"type": "send_notification", "content": content},
+        )
+        for recipient_id, content in payloads
+    ))
+
+
+def _write(groups, redis):
+    """
+    Merge or insert ``groups`` and record their outbox receipts in one
+    transaction. Returns ``(notification, group)`` pairs, updated and created.
+    """
+    with transaction.atomic():
+        updated, remaining = _merge_into_recent(groups, redis)
+        created = Notification.objects.bulk_create([
+            Notification(
+                sender_id=group["sender_id"],
+                recipient_id=group["recipient_id"],
+                notif_type=group["notif_type"],
+                post_id=group["post_id"],
+                community_id=group["community_id"],
+                actor_count=len(group["sender_ids"]),
+            )
+            for group in remaining
+        ])
+        OutboxReceipt.objects.bulk_create(
+            [OutboxReceipt(entry_id=entry_id) for group in groups for entry_id in group["entry_ids"]]
+        )
+    return updated, list(zip(created, remaining))
+
+
+def _write_batch(groups, redis):
+    """
+    Write all groups at once; if the database rejects a row (e.g. its post or
+    recipient was deleted after it was queued), write them one by one so the
+    rest still go through. Returns ``(updated, created, rejected)``, the
+    last being ``(group, error)`` pairs.
+    """
+    try:
+        return (*_write(groups, redis), [])
+    except (IntegrityError, DataError):
+        pass
+    updated, created, rejected = [], [], []
+    for group in groups:
+        try:
+            group_updated, group_created = _write([group], redis)
+        except (IntegrityError, DataError) as e:
+            rejected.append((group, e))
+            continue
+        updated += group_updated
+        created += group_created
+    return updated, created, rejected
+
+
+def _dead_letter(redis, items):
+    """Move ``(fields, error)`` outbox entries aside; the caller acknowledges them."""
+    if not items:
+        return
+    pipe = redis.pipeline(transaction=False)
+    for fields, error in items:
+        pipe.xadd(
+            OUTBOX_DEAD_LETTER_KEY,
+            {"data": fields.get(b"data", b""), "error": str(error)},
+            maxlen=OUTBOX_DEAD_LETTER_MAXLEN, approximate=True,
+        )
+    pipe.execute()
+
+
+@shared_task
+def flush_notifications():
+    """
+    Drain the notification outbox: bulk-insert one batch, aggregate like
+    storms, push every new/updated notification in one event loop, then
+    acknowledge the batch. A flush that fails or dies leaves its entries
+    pending for a later one; entries already committed are recognised by
+    their ``OutboxReceipt`` and only acknowledged. Entries the database
+    rejects go to ``notifications:outbox:dead``. One flush runs at a time,
+    so two can't both miss a recent notification and aggregate twice.
+    """
+    redis = get_redis_connection("default")
+    redis.delete(FLUSH_SCHEDULED_KEY)
+    lock = redis.lock(FLUSH_LOCK_KEY, timeout=settings.NOTIFICATION_FLUSH_LOCK_TIMEOUT, blocking=False)
+    if not lock.acquire():
+        # The running flush may have read its batch already; come back after it.
+        schedule_flush(redis)
+        return 0
+    try:
+        return _flush(redis)
+    finally:
+        try:
+            lock.release()
+        except LockError:
+            logger.warning("Notification flush outlived its lock")
+
+
+def _flush(redis):
+    _ensure_group(redis)
+    batch_size = settings.NOTIFICATION_BATCH_SIZE
+    batch = _read_batch(redis, batch_size)
+    if not batch:
+        return 0
+    fields_by_id = {entry_id.decode(): fields for entry_id, fields in batch}
+    done = set(OutboxReceipt.objects.filter(entry_id__in=fields_by_id).values_list("entry_id", flat=True))
+    entries, dead = [], []
+    for entry_id, fields in fields_by_id.items():
+        if entry_id in done:
+            continue
+        try:
+            entries.append((entry_id, json.loads(fields[b"data"])))
+        except (KeyError, ValueError) as e:
+            dead.append((fields, e))
+
+    updated, created, rejected = _write_batch(_group(entries), redis)
+    for group, error in rejected:
+        logger.warning("Dead-lettered notification outbox entries %s: %s", group["entry_ids"], error)
+        dead += [(fields_by_id[entry_id], error) for entry_id in group["entry_ids"]]
+    _dead_letter(redis, dead)
+    _record_actors(updated + created, redis)
+
+    new_unread = {}
+    for notification, _ in created:
+        new_unread[notification.recipient_id] = new_unread.get(notification.recipient_id, 0) + 1
+    adjust_unread_counts(new_unread, redis=redis)
+
+    notifications = [notification for notification, _ in updated + created]
+    usernames = dict(
+        User.objects.filter(id__in={n.sender_id for n in notifications}).values_list("id", "username")
+    )
+    community_names = dict(
+        Community.objects.filter(
+            id__in={n.community_id for n in notifications if n.community_id}
+        ).values_list("id", "name")
+    )
+    if notifications:
+        payloads = [(n.recipient_id, _payload(n, usernames, community_names)) for n in notifications]
+        append_to_streams(payloads, redis=redis)
+        async_to_sync(_push)(payloads)
+
+    entry_ids = list(fields_by_id)
+    pipe = redis.pipeline(transaction=False)
+    pipe.xack(OUTBOX_KEY, OUTBOX_GROUP, *entry_ids)
+    pipe.xdel(OUTBOX_KEY, *entry_ids)
+    pipe.execute()
+    if len(batch) == batch_size:
+        schedule_flush(redis)
+    return len(entries)
+
+
+_ARCHIVE_FIELDS = (
+    "id", "recipient_id", "sender_id", "notif_type", "post_id", "community_id", "actor_count", "created_at",
+)
+
+
+def _archive_to_table(rows):
+    NotificationArchive.objects.bulk_create(
+        [
+            NotificationArchive(
+                notification_id=row["id"],
+                recipient_id=row["recipient_id"],
+                sender_id=row["sender_id"],
+                notif_type=row["notif_type"],
+                post_id=row["post_id"],
+                community_id=row["community_id"],
+                actor_count=row["actor_count"],
+                created_at=row["created_at"],
+            )
+            for row in rows
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def _archive_to_jsonl(rows):
+    """Append rows to one JSONL file per month of ``created_at``."""
+    directory = Path(settings.NOTIFICATION_ARCHIVE_PATH)
+    directory.mkdir(parents=True, exist_ok=True)
+    by_month = {}
+    for row in rows:
+        by_month.setdefault(f"{row['created_at']:%Y-%m}", []).append(row)
+    for month, month_rows in by_month.items():
+        with open(directory / f"notifications-{month}.jsonl", "a", encoding="utf-8") as archive:
+            archive.writelines(json.dumps(row, default=str) + "\n" for row in month_rows)
+
+
+_ARCHIVE_BACKENDS = {
+    "table": _archive_to_table,
+    "jsonl": _archive_to_jsonl,
+    None: lambda rows: None,  # retention only, rows are dropped
+}
+
+
+@shared_task
+def archive_notifications():
+    """
+    Move read notifications older than ``NOTIFICATION_RETENTION_DAYS`` out of
+    the live table, one batch per transaction, so the table only holds the
+    hot set the bell and list views read. Unread rows are never archived.
+    Also prunes outbox receipts past ``NOTIFICATION_RECEIPT_RETENTION_HOURS``.
+    """
+    archive = _ARCHIVE_BACKENDS[settings.NOTIFICATION_ARCHIVE_BACKEND]
+    cutoff = timezone.now() - timedelta(days=settings.NOTIFICATION_RETENTION_DAYS)
+    batch_size = settings.NOTIFICATION_ARCHIVE_BATCH_SIZE
+    archived = 0
+
+    for _ in range(settings.NOTIFICATION_ARCHIVE_MAX_BATCHES):
+        with transaction.atomic():
+            rows = list(
+                Notification.objects
+                .filter(read=True, created_at__lt=cutoff)
+                .order_by("created_at")
+                .values(*_ARCHIVE_FIELDS)[:batch_size]
+            )
+            if not rows:
+                break
+            archive(rows)
+            Notification.objects.filter(id__in=[row["id"] for row in rows]).delete()
+        archived += len(rows)
+        if len(rows) < batch_size:
+            break
+
+    OutboxReceipt.objects.filter(
+        created_at__lt=timezone.now() - timedelta(hours=settings.NOTIFICATION_RECEIPT_RETENTION_HOURS)
+    ).delete()
+
+    if archived:
+        logger.info("Archived %s notifications older than %s", archived, cutoff)
+    return archived
+
+
+@shared_task
+def maintain_notification_partitions():
+    """Keep the next months' partitions created when the live table is partitioned."""
+    return partitions.ensure_partitions(settings.NOTIFICATION_PARTITION_MONTHS_AHEAD)
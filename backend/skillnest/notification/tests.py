@@ -1,3 +1,167 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.test import TestCase, TransactionTestCase
+from django_redis import get_redis_connection
+
+from accounts.models import User
+from creator.models import Post
+from .models import Notification, OutboxReceipt
+from .tasks import actors_key, flush_notifications
+from .utils import (
+    OUTBOX_KEY, OUTBOX_GROUP, OUTBOX_DEAD_LETTER_KEY, FLUSH_LOCK_KEY, FLUSH_SCHEDULED_KEY, create_notification,
+    append_to_streams, floor_key, missed_notifications, stream_key,
+)
+
+
+class OutboxTestMixin:
+    """Runs flushes against the real outbox stream with scheduling and pushes stubbed out."""
+
+    def setUp(self):
+        self.redis = get_redis_connection("default")
+        self._clear_redis()
+        self.addCleanup(self._clear_redis)
+        for target in (
+            "notification.utils.schedule_flush", "notification.tasks.schedule_flush", "notification.tasks._push",
+        ):
+            patcher = mock.patch(target)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.creator = User.objects.create_user(
+            username="creator", email="creator@example.com", password="pass12345", user_type="creator",
+        )
+        self.fans = [
+            User.objects.create_user(username=f"fan{i}", email=f"fan{i}@example.com", password="pass12345")
+            for i in range(3)
+        ]
+        self.post = Post.objects.create(user=self.creator, caption="post")
+
+    def _clear_redis(self):
+        self.redis.delete(OUTBOX_KEY, OUTBOX_DEAD_LETTER_KEY, FLUSH_LOCK_KEY, FLUSH_SCHEDULED_KEY)
+        for key in self.redis.scan_iter("notifications:actors:*"):
+            self.redis.delete(key)
+
+
+class FlushNotificationsTests(OutboxTestMixin, TestCase):
+
+    def test_repeated_likes_count_each_sender_once(self):
+        create_notification(self.fans[0], self.creator, "like", self.post)
+        flush_notifications()
+        for fan in (self.fans[0], self.fans[1], self.fans[0]):
+            create_notification(fan, self.creator, "like", self.post)
+        flush_notifications()
+
+        notification = Notification.objects.get(notif_type="like")
+        self.assertEqual(notification.actor_count, 2)
+        self.assertEqual(self.redis.scard(actors_key(notification.pk)), 2)
+        self.assertEqual(self.redis.xlen(OUTBOX_KEY), 0)
+
+    def test_redelivered_entries_are_not_inserted_twice(self):
+        create_notification(self.fans[0], self.creator, "follow")
+        # Committed, then dies pushing, before acknowledging.
+        with mock.patch("notification.tasks.async_to_sync", side_effect=RuntimeError), self.assertRaises(RuntimeError):
+            flush_notifications()
+        self.assertEqual(OutboxReceipt.objects.count(), 1)
+
+        with self.settings(NOTIFICATION_CLAIM_IDLE_MS=0):
+            flush_notifications()
+        self.assertEqual(Notification.objects.filter(notif_type="follow").count(), 1)
+        self.assertEqual(self.redis.xpending(OUTBOX_KEY, OUTBOX_GROUP)["pending"], 0)
+
+    def test_flush_skips_while_another_holds_the_lock(self):
+        create_notification(self.fans[0], self.creator, "follow")
+        self.redis.set(FLUSH_LOCK_KEY, "other", ex=60)
+        self.assertEqual(flush_notifications(), 0)
+        self.assertFalse(Notification.objects.exists())
+
+        self.redis.delete(FLUSH_LOCK_KEY)
+        self.assertEqual(flush_notifications(), 1)
+
+
+class FlushNotificationsDeadLetterTests(OutboxTestMixin, TransactionTestCase):
+    """Foreign keys are only checked on commit, so these need real transactions."""
+
+    def test_rejected_entry_does_not_block_the_batch(self):
+        doomed = Post.objects.create(user=self.creator, caption="doomed")
+        create_notification(self.fans[0], self.creator, "like", doomed)
+        create_notification(self.fans[1], self.creator, "follow")
+        Post.objects.filter(pk=doomed.pk).delete()
+
+        flush_notifications()
+
+        self.assertEqual(list(Notification.objects.values_list("notif_type", flat=True)), ["follow"])
+        self.assertEqual(self.redis.xlen(OUTBOX_DEAD_LETTER_KEY), 1)
+        self.assertEqual(self.redis.xlen(OUTBOX_KEY), 0)
+
+    def test_malformed_entry_is_dead_lettered(self):
+        self.redis.xadd(OUTBOX_KEY, {"data": "not json"})
+        create_notification(self.fans[0], self.creator, "follow")
+
+        flush_notifications()
+
+        self.assertEqual(Notification.objects.count(), 1)
+        self.assertEqual(self.redis.xlen(OUTBOX_DEAD_LETTER_KEY), 1)
+
+
+class MissedNotificationsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="user", email="user@example.com", password="pass12345")
+        cls.others = [
+            User.objects.create_user(username=f"other{i}", email=f"other{i}@example.com", password="pass12345")
+            for i in range(2)
+        ]
+
+    def setUp(self):
+        self.redis = get_redis_connection("default")
+        for user in (self.user, *self.others):
+            self.redis.delete(stream_key(user.id), floor_key(user.id))
+            self.addCleanup(self.redis.delete, stream_key(user.id), floor_key(user.id))
+
+    def _push(self, recipient):
+        notification = Notification.objects.create(sender=self.others[0], recipient=recipient, notif_type="follow")
+        append_to_streams([(recipient.id, {"id": notification.id})], redis=self.redis)
+        return notification.id
+
+    def test_replays_after_last_seen(self):
+        ids = [self._push(self.user) for _ in range(3)]
+        missed, truncated = missed_notifications(self.user.id, ids[0])
+        self.assertEqual([content["id"] for content in missed], ids[1:])
+        self.assertFalse(truncated)
+
+    def test_other_users_ids_do_not_look_like_a_gap(self):
+        first = self._push(self.user)
+        for _ in range(5):
+            self._push(self.others[1])
+        self._push(self.user)
+        with self.settings(NOTIFICATION_STREAM_MAXLEN=2):
+            self._push(self.user)
+
+        # Only the user's own trimmed notifications count.
+        self.assertFalse(missed_notifications(self.user.id, first)[1])
+        self.assertTrue(missed_notifications(self.user.id, first - 1)[1])
+
+    def test_trimmed_past_last_seen_is_truncated(self):
+        with self.settings(NOTIFICATION_STREAM_MAXLEN=2):
+            ids = [self._push(self.user) for _ in range(4)]
+        self.assertEqual(self.redis.xlen(stream_key(self.user.id)), 2)
+
+        missed, truncated = missed_notifications(self.user.id, ids[0])
+        self.assertEqual([content["id"] for content in missed], ids[2:])
+        self.assertTrue(truncated)
+        self.assertFalse(missed_notifications(self.user.id, ids[1])[1])
+
+    def test_expired_stream_is_truncated(self):
+        seen = self._push(self.user)
+        lost = self._push(self.user)
+        self.redis.delete(stream_key(self.user.id), floor_key(self.user.id))
+
+        self.assertEqual(missed_notifications(self.user.id, seen), ([], True))
+        self.assertFalse(missed_notifications(self.user.id, lost)[1])
+
+        # Pushing again starts a new stream that knows ``lost`` is missing from it.
+        latest = self._push(self.user)
+        missed, truncated = missed_notifications(self.user.id, seen)
+        self.assertEqual([content["id"] for content in missed], [latest])
+        self.assertTrue(truncated)
+        self.assertFalse(missed_notifications(self.user.id, lost)[1])
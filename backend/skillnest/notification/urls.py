@@ -1,6 +1,9 @@
 from django.urls import path
-from . views import NotificationListView
+from . views import NotificationListView, NotificationUpdateView, UnreadCountView, MarkReadView
 
 urlpatterns = [
     path("list/", NotificationListView.as_view(), name="list-notification"),
+    path("<int:pk>/", NotificationUpdateView.as_view(), name="update-notification"),
+    path("unread-count/", UnreadCountView.as_view(), name="unread-notification-count"),
+    path("mark-read/", MarkReadView.as_view(), name="mark-notifications-read"),
 ]
@@ -1,30 +1,208 @@
 # notifications/utils.py
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
+import json
+import time
+
+from django.conf import settings
+from django.db.models import Max
+from django_redis import get_redis_connection
 from .models import Notification
 import logging
 logger = logging.getLogger(__name__)
 
-def create_notification(sender, recipient, notif_type, post=None):
-    notification = Notification.objects.create(
-        sender=sender,
-        recipient=recipient,
-        notif_type=notif_type,
-        post=post
-    )
-    channel_layer = get_channel_layer()
-    async_to_sync(channel_layer.group_send)(
-        f'notifications_{recipient.id}',
-        {
-            'type': 'send_notification',
-            'content': {
-                'id': notification.id,
-                'sender': sender.username,
-                'type': notif_type,
-                'post_id': post.id if post else None,
-                'created_at': str(notification.created_at)
-            }
-        }
+OUTBOX_KEY = "notifications:outbox:stream"
+OUTBOX_GROUP = "notification-writers"
+OUTBOX_DEAD_LETTER_KEY = "notifications:outbox:dead"
+OUTBOX_DEAD_LETTER_MAXLEN = 10_000
+FLUSH_LOCK_KEY = "notifications:flush_lock"
+FLUSH_SCHEDULED_KEY = "notifications:flush_scheduled"
+STREAM_TTL = 7 * 24 * 60 * 60
+UNREAD_TTL = 60 * 60  # bounds drift from a count racing a concurrent insert
+
+# Adjust a cached unread counter only if it is already cached, clamping at
+# zero; a missing key is recomputed from the database on the next read.
+_ADJUST_IF_CACHED = """
+if redis.call('exists', KEYS[1]) == 0 then return nil end
+local value = redis.call('incrby', KEYS[1], ARGV[1])
+if value < 0 then redis.call('set', KEYS[1], 0, 'KEEPTTL') value = 0 end
+return value
+"""
+
+# Append one pushed notification to a user's stream, trimming it to
+# ARGV[2] entries. The highest notification id trimmed away is kept in the
+# stream's floor key (see ``missed_notifications``). Returns 1 if the
+# stream had to be created.
+# KEYS: stream, floor. ARGV: payload JSON, maxlen, ttl.
+_APPEND_TO_STREAM = """
+local fresh = redis.call('exists', KEYS[1]) == 0
+redis.call('xadd', KEYS[1], '*', 'data', ARGV[1])
+local excess = redis.call('xlen', KEYS[1]) - tonumber(ARGV[2])
+if excess > 0 then
+    local floor = tonumber(redis.call('get', KEYS[2]) or '0')
+    for _, entry in ipairs(redis.call('xrange', KEYS[1], '-', '+', 'COUNT', excess)) do
+        floor = math.max(floor, cjson.decode(entry[2][2]).id)
+    end
+    redis.call('xtrim', KEYS[1], 'MAXLEN', ARGV[2])
+    redis.call('set', KEYS[2], floor)
+end
+redis.call('expire', KEYS[1], ARGV[3])
+redis.call('expire', KEYS[2], ARGV[3])
+if fresh then return 1 end
+return 0
+"""
+
+# KEYS: floor. ARGV: id, ttl.
+_RAISE_FLOOR = """
+if tonumber(ARGV[1]) > tonumber(redis.call('get', KEYS[1]) or '0') then
+    redis.call('set', KEYS[1], ARGV[1])
+end
+redis.call('expire', KEYS[1], ARGV[2])
+"""
+
+
+def create_notification(sender, recipient, notif_type, post=None, community=None):
+    """
+    Queue a notification instead of writing it inside the request.
+
+    The entry goes onto a Redis outbox stream; ``flush_notifications``
+    reads it in batches through a consumer group, bulk-inserts the rows and
+    pushes them to the recipients' ``notifications_<id>`` groups from the
+    Celery worker, and only then acknowledges the entries.
+    """
+    enqueue_notifications([{
+        "sender_id": sender.id,
+        "recipient_id": recipient.id,
+        "notif_type": notif_type,
+        "post_id": post.id if post else None,
+        "community_id": community.id if community else None,
+        "queued_at": time.time(),
+    }])
+
+
+def enqueue_notifications(entries):
+    if not entries:
+        return
+    redis = get_redis_connection("default")
+    pipe = redis.pipeline(transaction=False)
+    for entry in entries:
+        pipe.xadd(OUTBOX_KEY, {"data": json.dumps(entry)})
+    pipe.execute()
+    schedule_flush(redis)
+
+
+def schedule_flush(redis=None):
+    """Schedule one flush per batch window, however many notifications arrive in it."""
+    from .tasks import flush_notifications
+
+    redis = redis or get_redis_connection("default")
+    window = settings.NOTIFICATION_BATCH_WINDOW
+    if redis.set(FLUSH_SCHEDULED_KEY, 1, nx=True, ex=window * 10):
+        try:
+            flush_notifications.apply_async(countdown=window)
+        except Exception:
+            # The periodic flush in CELERY_BEAT_SCHEDULE picks the outbox up.
+            redis.delete(FLUSH_SCHEDULED_KEY)
+            logger.exception("Could not schedule notification flush")
+
+
+def unread_key(user_id):
+    return f"notifications:unread:{user_id}"
+
+
+def get_unread_count(user_id):
+    """Cached unread badge count; falls back to one indexed count on a miss."""
+    redis = get_redis_connection("default")
+    cached = redis.get(unread_key(user_id))
+    if cached is not None:
+        return int(cached)
+    count = Notification.objects.filter(recipient_id=user_id, read=False).count()
+    redis.set(unread_key(user_id), count, ex=UNREAD_TTL, nx=True)
+    return count
+
+
+def adjust_unread_counts(deltas, redis=None):
+    """Apply ``{user_id: delta}`` to the cached unread counters in one pipeline."""
+    deltas = {user_id: delta for user_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    redis = redis or get_redis_connection("default")
+    script = redis.register_script(_ADJUST_IF_CACHED)
+    pipe = redis.pipeline(transaction=False)
+    for user_id, delta in deltas.items():
+        script(keys=[unread_key(user_id)], args=[delta], client=pipe)
+    pipe.execute()
+
+
+def stream_key(user_id):
+    return f"notifications:stream:{user_id}"
+
+
+def floor_key(user_id):
+    return f"notifications:stream:{user_id}:floor"
+
+
+def append_to_streams(payloads, redis=None):
+    """
+    Record pushed notifications in each recipient's bounded Redis stream so a
+    reconnecting socket can replay what it missed. ``payloads`` is a list of
+    ``(recipient_id, content)`` as sent to the ``notifications_<id>`` group.
+
+    Each stream has a floor: the highest id of the recipient's notifications
+    that are not in it, because they were trimmed off or pushed before the
+    stream (re)started, e.g. after it expired.
+    """
+    if not payloads:
+        return
+    redis = redis or get_redis_connection("default")
+    append = redis.register_script(_APPEND_TO_STREAM)
+    pipe = redis.pipeline(transaction=False)
+    for recipient_id, content in payloads:
+        append(
+            keys=[stream_key(recipient_id), floor_key(recipient_id)],
+            args=[json.dumps(content), settings.NOTIFICATION_STREAM_MAXLEN, STREAM_TTL],
+            client=pipe,
+        )
+    fresh = {recipient_id for (recipient_id, _), created in zip(payloads, pipe.execute()) if created}
+    if not fresh:
+        return
+    # A new stream holds none of the recipient's earlier notifications.
+    floors = (
+        Notification.objects.filter(recipient_id__in=fresh)
+        .exclude(id__in={content["id"] for _, content in payloads})
+        .order_by()
+        .values("recipient_id")
+        .annotate(floor=Max("id"))
+        .values_list("recipient_id", "floor")
     )
+    raise_floor = redis.register_script(_RAISE_FLOOR)
+    pipe = redis.pipeline(transaction=False)
+    for recipient_id, floor in floors:
+        raise_floor(keys=[floor_key(recipient_id)], args=[floor, STREAM_TTL], client=pipe)
+    pipe.execute()
 
 
+def missed_notifications(user_id, last_seen_id):
+    """
+    Notifications pushed to ``user_id`` after notification ``last_seen_id``,
+    oldest first, from the user's stream. Returns ``(notifications, truncated)``;
+    ``truncated`` means some of the user's notifications after
+    ``last_seen_id`` are not in the stream (it was trimmed past it, or
+    expired) and the client should reload the list over REST.
+    """
+    redis = get_redis_connection("default")
+    pipe = redis.pipeline(transaction=False)
+    pipe.xrange(stream_key(user_id))
+    pipe.get(floor_key(user_id))
+    entries, floor = pipe.execute()
+    missed = {}
+    for _, fields in entries:
+        content = json.loads(fields[b"data"])
+        if content["id"] > last_seen_id:
+            # An aggregated notification can appear more than once; keep the latest.
+            missed.pop(content["id"], None)
+            missed[content["id"]] = content
+    if entries:
+        truncated = int(floor or 0) > last_seen_id
+    else:
+        # No stream: nothing pushed within STREAM_TTL, or it never existed.
+        truncated = Notification.objects.filter(recipient_id=user_id, id__gt=last_seen_id).exists()
+    return list(missed.values()), truncated
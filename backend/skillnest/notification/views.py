@@ -1,44 +1,61 @@
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
 from .models import Notification
-from rest_framework import generics, permissions
+from rest_framework import generics, permissions, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from .serializers import NotificationSerializer
+from .utils import get_unread_count, adjust_unread_counts
 import logging
 logger = logging.getLogger(__name__)
 
-def create_notification(sender, recipient, notif_type, post=None):
-    notification = Notification.objects.create(
-        sender=sender,
-        recipient=recipient,
-        notif_type=notif_type,
-        post=post
-    )
-    # Send real-time via channel layer
-    
-    channel_layer = get_channel_layer()
-    async_to_sync(channel_layer.group_send)(
-        f'notifications_{recipient.id}',
-        {
-            'type': 'send_notification',
-            'content': {
-                'id': notification.id,
-                'sender': sender.username,
-                'type': notif_type,
-                'post_id': post.id if post else None,
-                'created_at': str(notification.created_at)
-            }
-        }
-    )
-
 class NotificationListView(generics.ListAPIView):
     serializer_class = NotificationSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        data=Notification.objects.filter(recipient=self.request.user)
-        return Notification.objects.filter(recipient=self.request.user)
+        queryset = Notification.objects.filter(recipient=self.request.user).select_related('sender', 'community')
+        read = self.request.query_params.get('read')
+        if read in ('true', 'false'):
+            queryset = queryset.filter(read=read == 'true')
+        return queryset.order_by('-created_at')
     
 class NotificationUpdateView(generics.UpdateAPIView):
     serializer_class = NotificationSerializer
     permission_classes = [permissions.IsAuthenticated]
-    queryset = Notification.objects.all()
\ No newline at end of file
+
+    def get_queryset(self):
+        return Notification.objects.filter(recipient=self.request.user)
+
+    def perform_update(self, serializer):
+        was_read = serializer.instance.read
+        notification = serializer.save()
+        if was_read != notification.read:
+            adjust_unread_counts({notification.recipient_id: 1 if was_read else -1})
+
+
+class UnreadCountView(APIView):
+    """GET: unread badge count, served from the cached per-user counter."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        return Response({"unread_count": get_unread_count(request.user.id)})
+
+
+class MarkReadView(APIView):
+    """
+    POST {"up_to_id": X}: mark every unread notification with id <= X as read
+    in a single UPDATE. Without ``up_to_id`` all notifications are marked read.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        up_to_id = request.data.get("up_to_id")
+        queryset = Notification.objects.filter(recipient=request.user, read=False)
+        if up_to_id is not None:
+            try:
+                queryset = queryset.filter(id__lte=int(up_to_id))
+            except (TypeError, ValueError):
+                return Response({"error": "up_to_id must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+
+        marked = queryset.update(read=True)
+        adjust_unread_counts({request.user.id: -marked})
+        return Response({"marked_read": marked, "unread_count": get_unread_count(request.user.id)})
@@ -2,7 +2,6 @@
 import os
 from django.core.asgi import get_asgi_application
 from channels.routing import ProtocolTypeRouter, URLRouter
-from channels.auth import AuthMiddlewareStack
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "skillnest.settings")
 
@@ -22,10 +21,9 @@ def get_application():
     websocket_patterns += chat_routing.websocket_urlpatterns
     return ProtocolTypeRouter({
         "http": django_asgi_app,
+        # JWTAuthMiddleware sets scope["user"] itself; no session/cookie auth stack needed.
         "websocket": JWTAuthMiddleware(
-            AuthMiddlewareStack(
-                URLRouter(websocket_patterns)
-            )
+            URLRouter(websocket_patterns)
         ),
     })
 
@@ -0,0 +1,153 @@
+# skillnest/frames.py
+"""
+Negotiated WebSocket frame encodings shared by the chat and notification
+consumers.
+
+Clients that offer no subprotocol keep the original one-JSON-object-per-
+event frames. Clients that offer one of ``SUBPROTOCOLS`` get:
+
+* ``skillnest.msgpack.v1``: binary MessagePack frames,
+* ``skillnest.json.v1``: compact JSON (short keys, no whitespace),
+
+and in both cases every frame is an array of events. A socket that was
+idle sends an event at once; events that follow within
+``WS_FRAME_BATCH_WINDOW`` seconds are sent together, which also gives
+permessage-deflate a larger window to compress across. Keys listed in
+``COMPACT_KEYS`` are shortened at any depth; clients expand them with the
+same table. Frames sent by such clients may use either encoding and keep
+the verbose keys.
+
+Events broadcast to a whole group are encoded once by the sender with
+``preencode`` and passed through ``send_preencoded``, so a consumer only
+joins ready-made pieces instead of serializing the event again.
+"""
+import asyncio
+import json
+
+import msgpack
+from django.conf import settings
+
+MSGPACK = "skillnest.msgpack.v1"
+COMPACT_JSON = "skillnest.json.v1"
+SUBPROTOCOLS = (MSGPACK, COMPACT_JSON)
+LEGACY = "json"
+
+COMPACT_KEYS = {
+    "type": "t",
+    "message": "m",
+    "id": "i",
+    "content": "c",
+    "message_type": "mt",
+    "media_url": "u",
+    "sender": "s",
+    "username": "n",
+    "timestamp": "ts",
+    "user_id": "ui",
+    "status": "st",
+    "users": "us",
+    "is_typing": "it",
+    "post_id": "p",
+    "actor_count": "ac",
+    "notifications": "ns",
+    "truncated": "tr",
+    "messages": "ms",
+    "edited": "ed",
+    "cursor": "cu",
+    "has_more": "hm",
+    "is_edited": "ie",
+    "edited_at": "ea",
+}
+
+
+def compact(value):
+    if isinstance(value, dict):
+        return {COMPACT_KEYS.get(key, key): compact(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [compact(item) for item in value]
+    return value
+
+
+def encode(event, subprotocol):
+    """One event as sent on a ``subprotocol`` socket (``None``: no subprotocol)."""
+    if subprotocol is None:
+        return json.dumps(event)
+    if subprotocol == MSGPACK:
+        return msgpack.packb(compact(event))
+    return json.dumps(compact(event), separators=(",", ":"))
+
+
+def preencode(event):
+    """Encode a broadcast event in every encoding; put the result in the ``group_send`` message."""
+    return {protocol or LEGACY: encode(event, protocol) for protocol in (None, *SUBPROTOCOLS)}
+
+
+def join(pieces, subprotocol):
+    """Join encoded events into one array frame, as ``(text_data, bytes_data)``."""
+    if subprotocol == MSGPACK:
+        return None, msgpack.Packer().pack_array_header(len(pieces)) + b"".join(pieces)
+    return "[" + ",".join(pieces) + "]", None
+
+
+class FramedConsumerMixin:
+    """
+    For ``AsyncWebsocketConsumer``s: ``accept_framed`` negotiates the
+    encoding, ``send_event`` / ``send_preencoded`` send (or batch) one
+    event, ``decode_frame`` parses an incoming frame in either encoding.
+    """
+    subprotocol = None
+
+    async def accept_framed(self):
+        offered = self.scope.get("subprotocols") or []
+        self.subprotocol = next((p for p in offered if p in SUBPROTOCOLS), None)
+        self.pending_events = []
+        self.flush_events_task = None
+        await self.accept(subprotocol=self.subprotocol)
+
+    async def send_event(self, event):
+        await self._send_encoded(encode(event, self.subprotocol))
+
+    async def send_preencoded(self, frames):
+        await self._send_encoded(frames[self.subprotocol or LEGACY])
+
+    async def _send_encoded(self, piece):
+        if self.subprotocol is None:
+            await self.send(text_data=piece)
+            return
+        self.pending_events.append(piece)
+        if self.flush_events_task is None:
+            # Idle: send right away, then hold whatever follows for a window.
+            await self.flush_events()
+            self.flush_events_task = asyncio.create_task(self._flush_later())
+        elif len(self.pending_events) >= settings.WS_FRAME_BATCH_MAX:
+            await self.flush_events()
+
+    async def _flush_later(self):
+        try:
+            while True:
+                await asyncio.sleep(settings.WS_FRAME_BATCH_WINDOW)
+                if not self.pending_events:
+                    return
+                await self.flush_events()
+        finally:
+            self.flush_events_task = None
+
+    async def flush_events(self):
+        pieces, self.pending_events = self.pending_events, []
+        if pieces:
+            text_data, bytes_data = join(pieces, self.subprotocol)
+            await self.send(text_data=text_data, bytes_data=bytes_data)
+
+    async def websocket_disconnect(self, message):
+        # The socket is gone; events still waiting for the batch window are dropped.
+        if getattr(self, "flush_events_task", None) is not None:
+            self.flush_events_task.cancel()
+        await super().websocket_disconnect(message)
+
+    def decode_frame(self, text_data=None, bytes_data=None):
+        """Parse an incoming frame; returns None if it can't be decoded."""
+        try:
+            if bytes_data is not None:
+                return msgpack.unpackb(bytes_data)
+            return json.loads(text_data)
+        except (ValueError, TypeError, msgpack.ExtraData, msgpack.FormatError, msgpack.StackError):
+            return None
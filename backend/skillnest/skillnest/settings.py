@@ -45,6 +45,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     # Third-party
     'rest_framework',
     'rest_framework_simplejwt',
@@ -250,6 +251,75 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
+CELERY_BEAT_SCHEDULE = {
+    'reconcile-counters': {
+        'task': 'creator.tasks.reconcile_counters',
+        'schedule': timedelta(hours=1),
+    },
+    'flush-notifications': {
+        # Safety net; flushes are normally scheduled as notifications are queued.
+        'task': 'notification.tasks.flush_notifications',
+        'schedule': timedelta(seconds=30),
+    },
+    'archive-notifications': {
+        'task': 'notification.tasks.archive_notifications',
+        'schedule': timedelta(hours=6),
+    },
+    'persist-chat-messages': {
+        # Safety net for CHAT_WRITE_BEHIND; flushes are normally scheduled per message burst.
+        'task': 'chat.tasks.persist_chat_messages',
+        'schedule': timedelta(seconds=30),
+    },
+    'snapshot-presence': {
+        'task': 'chat.tasks.snapshot_presence',
+        'schedule': timedelta(minutes=1),
+    },
+    'notification-partitions': {
+        'task': 'notification.tasks.maintain_notification_partitions',
+        'schedule': timedelta(days=1),
+    },
+}
+
+# Follower timelines (creator.timelines)
+TIMELINE_MAX_LENGTH = 800               # post ids kept per timeline
+TIMELINE_FANOUT_MAX_FOLLOWERS = 10000   # above this, followers read the author timeline instead
+TIMELINE_FANOUT_BATCH_SIZE = 1000       # followers written per Redis pipeline
+
+# Notification pipeline (notification.tasks)
+NOTIFICATION_BATCH_WINDOW = 2             # seconds notifications are buffered before a flush
+NOTIFICATION_BATCH_SIZE = 500             # outbox entries written per flush
+NOTIFICATION_CLAIM_IDLE_MS = 60_000       # outbox entries a dead flush left pending are re-claimed after this
+NOTIFICATION_FLUSH_LOCK_TIMEOUT = 120     # seconds; one flush runs at a time
+NOTIFICATION_RECEIPT_RETENTION_HOURS = 24 # outbox receipts kept to skip redelivered entries
+NOTIFICATION_AGGREGATION_WINDOW = 10 * 60 # likes on one post within this many seconds collapse
+NOTIFICATION_STREAM_MAXLEN = 200          # pushed notifications kept per user for reconnect replay
+NOTIFICATION_RETENTION_DAYS = 90          # read notifications older than this are archived
+NOTIFICATION_ARCHIVE_BACKEND = 'table'    # 'table' (NotificationArchive), 'jsonl', or None to just delete
+NOTIFICATION_ARCHIVE_PATH = BASE_DIR / 'archive' / 'notifications'  # used by the 'jsonl' backend
+NOTIFICATION_ARCHIVE_BATCH_SIZE = 1000    # rows moved per transaction
+NOTIFICATION_ARCHIVE_MAX_BATCHES = 100    # per run, bounds how long one run holds a worker
+NOTIFICATION_PARTITION_MONTHS_AHEAD = 2   # only used once the table is partitioned (notification.partitions)
+
+# Chat write-behind (chat.write_behind): broadcast first, persist in batches
+CHAT_WRITE_BEHIND = False                 # opt-in; off keeps the synchronous INSERT per message
+CHAT_WRITE_BEHIND_WINDOW = 1              # seconds messages are buffered before a flush
+CHAT_WRITE_BEHIND_BATCH_SIZE = 500        # stream entries inserted per bulk_create
+CHAT_WRITE_BEHIND_CLAIM_IDLE_MS = 60_000  # pending entries older than this are re-claimed
+CHAT_SYNC_LIMIT = 500                     # new messages per delta sync response (chat.sync)
+CHAT_SYNC_SETTLE = 5                      # seconds a row must be old before delta sync moves past it
+
+# Chat presence (chat.presence)
+PRESENCE_HEARTBEAT_INTERVAL = 20          # seconds between heartbeats of an open chat socket
+PRESENCE_TTL = 60                         # a user is offline this long after their last heartbeat
+
+# Typing indicators (chat.typing)
+TYPING_MIN_INTERVAL = 1                   # seconds; faster "is typing" events from one user are dropped
+TYPING_FLUSH_INTERVAL = 0.5               # seconds between coalesced typing frames per room
+TYPING_TIMEOUT = 5                        # seconds after the last event a user stops typing
+
+# WebSocket frames (skillnest.frames): only for clients that negotiate a subprotocol
+WS_FRAME_BATCH_WINDOW = 0.05              # seconds events are held to share one frame
+WS_FRAME_BATCH_MAX = 50                   # events per frame; a full batch is sent at once
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = 'smtp.gmail.com'
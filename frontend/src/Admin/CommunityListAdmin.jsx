@@ -82,7 +82,7 @@ useEffect(() => {
                 <TableCell className="font-medium">{c.name}</TableCell>
                 <TableCell>{c.description}</TableCell>
                 <TableCell>{c.creator}</TableCell>
-                <TableCell>{c.members.length}</TableCell>
+                <TableCell>{c.member_count}</TableCell>
                 <TableCell>
                   <Dialog>
                     <DialogTrigger asChild>
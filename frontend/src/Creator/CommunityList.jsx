@@ -149,7 +149,7 @@ const createdByMe = communities.filter(
 
 
 const memberOf = communities.filter(
-  (c) => c.creator !== user.username && c.members.includes(user.id)
+  (c) => c.creator !== user.username && c.is_member
 );
 
 
@@ -215,7 +215,7 @@ if (filter === "mine") {
       <h2 className="text-lg font-semibold">{community.name}</h2>
       <p className="text-sm text-gray-600">{community.description}</p>
       <p className="text-xs text-gray-400">
-        Members: {community.members?.length || 0}
+        Members: {community.member_count || 0}
       </p>
     </CardContent>
     <div className="flex gap-2 p-2">
@@ -299,19 +299,10 @@ useEffect(() => {
 
 
   chatService.on("typing", (data) => {
-    const { user_id, username, is_typing } = data;
-
-    if (user_id === userId) return; // ignore yourself
-    setTypingUsers((prev) => {
-      if (is_typing) {
-        // add user if not already in list
-        if (!prev.includes(username)) return [...prev, username];
-        return prev;
-      } else {
-        // remove user
-        return prev.filter((u) => u !== username);
-      }
-    });
+    // One coalesced frame per room listing everyone currently typing
+    setTypingUsers(new Set(
+      data.users.filter((u) => u.id !== userId).map((u) => u.username)
+    ));
   });
 
   // chatService.on("typing", (data) => {
@@ -85,7 +85,7 @@ export const CommunityListLearner = () => {
                 <h2 className="text-lg font-semibold">{community.name}</h2>
                 <p className="text-sm text-gray-600">{community.description}</p>
                 <p className="text-xs text-gray-400">
-                  Members: {community.members?.length || 0}
+                  Members: {community.member_count || 0}
                 </p>
 
                 {unreadCounts[community.chat_room_uuid] > 0 && (
@@ -54,6 +54,8 @@ const CreatorLayout = ({ children }) => {
         notif_type: n.notif_type || n.type,
         created_at: n.created_at || n.timestamp,
         post_id: n.post_id, 
+        community_id: n.community_id,
+        community: n.community,
         read: n.read || false,
     }));
 
@@ -63,6 +65,8 @@ const CreatorLayout = ({ children }) => {
     notif_type: n.notif_type || n.type,
     created_at: n.created_at || n.timestamp,
     post_id: n.post_id,     
+    community_id: n.community_id,
+    community: n.community,
     read: false,
 }));
 
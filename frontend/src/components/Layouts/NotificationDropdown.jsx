@@ -45,6 +45,8 @@ export function NotificationDropdown({ notifications, onNotificationClick }) {
                   ? "liked comment on your post"
                   : n.notif_type === "follow"
                   ? "followed you"
+                  : n.notif_type === "invite"
+                  ? `invited you to join ${n.community || "a community"}`
                   : ""}
 
                 <div className="text-xs text-gray-400">
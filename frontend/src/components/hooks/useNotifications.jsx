@@ -17,6 +17,8 @@ export const useNotifications=()=> {
         sender: data.sender,
         notif_type: data.type,     // <-- FIX
         post_id: data.post_id,     // <-- OK
+        community_id: data.community_id,
+        community: data.community,
         created_at: data.timestamp // <-- FIX
       };
       setNotifications((prev) => [normalized, ...prev]);
@@ -24,6 +26,9 @@ export const useNotifications=()=> {
       if (data.type === 'follow') {
         toast.info(`${data.sender} ${data.type} you`, {
         icon: "🔔",})
+      } else if (data.type === 'invite') {
+        toast.info(`${data.sender} invited you to join ${data.community || "a community"}`, {
+        icon: "🔔",})
       } else{
       toast.info(`${data.sender} ${data.type} your post`, {
         icon: "🔔",})
@@ -204,7 +204,7 @@ export const get_course = async (userId)=>{
 export const fetchCommunities = async (limit = 6, offset = 0) => {
   try {
     // Add the ?page= query parameter
-    const res = await apiClient.get(`creator/communities/?limit=${limit}&offset=${offset}`);
+    const res = await apiClient.get(`creator/communities/?lean=true&limit=${limit}&offset=${offset}`);
     return res.data;  // { count, next, previous, results }
   } catch (err) {
     console.error("Error fetching communities:", err);
@@ -286,7 +286,7 @@ export const fetchMembers = (communityId) =>
 
 export const fetchLearnerCommunities = async (limit = 6, offset = 0) => {
   try {
-    const res = await apiClient.get(`/learner/communities/?limit=${limit}&offset=${offset}`); // make sure leading slash
+    const res = await apiClient.get(`/learner/communities/?lean=true&limit=${limit}&offset=${offset}`); // make sure leading slash
     return res.data;
   } catch (err) {
     if (err.response) {
@@ -344,7 +344,7 @@ export const searchUsers = async (query) => {
 export const getCommunities = async () => {
   try {
     
-    const res = await apiClient.get(`/admin/communities/`);
+    const res = await apiClient.get(`/admin/communities/?lean=true`);
     return res.data;
 
   } catch (err) {
@@ -831,9 +831,11 @@ export const fetchUnreadCount = async (roomUuid) => {
     return { success: false, error: err };
   }
 };
-export const markAsRead = async (roomUuid) => {
+export const markAsRead = async (roomUuid, lastMessageId) => {
   try {
-  const res = await apiClient.post(`chat/community/${roomUuid}/mark_as_read/`);
+  // Without lastMessageId, everything sent so far is marked read.
+  const body = lastMessageId ? { last_message_id: lastMessageId } : {};
+  const res = await apiClient.post(`chat/community/${roomUuid}/mark_as_read/`, body);
   return { success: true, data: res.data };
   } catch (err) {
     console.error("Error marked as  read:", err);